@@ -1,18 +1,23 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Awaitable, Generator
 from typing import Annotated, Tuple, Callable
 from uuid import UUID
 
 import jwt
-from fastapi import Depends, HTTPException, Path, status
+from fastapi import Depends, HTTPException, Path, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session, select
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User, UserProjectRole, Role
+from app.core.db import async_engine, engine, replica_router
+from app.core.pagination import CountMode
+from app.core.principal_cache import Principal, principal_cache
+from app.core.rbac import project_rank_cache
+from app.models import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -24,21 +29,76 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Chỉ dùng cho route đọc; ghi vẫn đi qua SessionDep trong giai đoạn chuyển đổi
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session chỉ đọc trên replica do `replica_router` chọn (primary nếu không có replica dùng được,
+    hoặc user vừa ghi). Không dùng để nạp các bộ nhớ đệm: dữ liệu trễ sẽ bị giữ tới hết TTL.
+    """
+    read_engine = replica_router.engine_for_read(subject_from_request(request))
+    session = AsyncSession(read_engine, expire_on_commit=False)
+    if read_engine is not async_engine:
+        try:
+            await session.connection()
+        except DBAPIError as e:
+            # Replica không kết nối được: đọc request này từ primary
+            replica_router.report_failure(read_engine, e)
+            await session.close()
+            session = AsyncSession(async_engine, expire_on_commit=False)
+    async with session:
+        try:
+            yield session
+        except DBAPIError as e:
+            if e.connection_invalidated and session.bind is not async_engine:
+                replica_router.report_failure(session.bind, e)
+            raise
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
+# Tham số phân trang keyset dùng chung cho các endpoint danh sách (skip/limit vẫn dùng được)
+CursorQuery = Annotated[
+    str | None, Query(description="Cursor `next_cursor` của trang trước; khi có thì bỏ qua skip")
+]
+CountQuery = Annotated[
+    CountMode, Query(description="exact: COUNT(*); estimated: ước lượng từ thống kê Postgres; none: không đếm")
+]
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+
+def subject_from_request(request: Request) -> str | None:
+    """User id trong bearer token nếu hợp lệ, không báo lỗi (dùng để định tuyến, không để xác thực)."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]).get("sub") or "") or None
+    except InvalidTokenError:
+        return None
+
+
+def decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+
+
+def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    token_data = decode_token(token)
     user = session.get(User, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -48,73 +108,155 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
+
+# ================== Cached Principal ==================
+def decode_user_id(token: str) -> UUID:
+    token_data = decode_token(token)
+    try:
+        return UUID(str(token_data.sub))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+
+
+def get_current_principal(session: SessionDep, token: TokenDep) -> Principal:
+    """
+    Như `get_current_user` nhưng đọc từ `principal_cache`: chỉ truy vấn DB khi cache hết hạn
+    hoặc user vừa được sửa/xoá. Dùng cho các dependency chỉ cần đọc thông tin phân quyền;
+    route cần sửa chính bản ghi User thì dùng `CurrentUser`.
+    """
+    user_id = decode_user_id(token)
+    principal = principal_cache.get_or_load(str(user_id), lambda: session.get(User, user_id))
+    if not principal:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
 # ================== Superuser Check ==================
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentPrincipal) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Chưa được xác thực")
     return current_user
 
 # ================== Active User Check ==================
-def get_current_active_user(current_user: CurrentUser) -> User:
+def check_active(current_user: Principal) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Tài khoản bị vô hiệu hoá")
     return current_user
 
 
+def get_current_active_user(current_user: CurrentPrincipal) -> Principal:
+    return check_active(current_user)
+
+
 # ================== User's Role In Project ==================
 def get_current_user_role_in_project(
     project_id: UUID, 
     session: SessionDep,
-    current_user: CurrentUser
-) -> Tuple[User, UUID, int]:  # User, role_id, rank
+    current_user: CurrentPrincipal
+) -> Tuple[Principal, UUID, int]:  # Principal, project_id, rank
     
     if current_user.is_superuser:
         return current_user, project_id, 1
     
-    result = session.exec(
-        select(UserProjectRole.role_id, Role.rank)
-        .join(Role, Role.id == UserProjectRole.role_id)
-        .where(
-            UserProjectRole.user_id == current_user.id,
-            UserProjectRole.project_id == project_id
-        )
-    ).first()
+    rank = project_rank_cache.rank_in_project(session, current_user.id, project_id)
+    return check_project_access(current_user, project_id, rank)
 
-    if not result:
+
+def check_project_access(current_user: Principal, project_id: UUID, rank: int | None) -> Tuple[Principal, UUID, int]:
+    if rank is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Bạn không có quyền truy cập dự án này.",
         )
 
-    rank = result
     return current_user, project_id, rank
 
-ProjectAccessInfo = Annotated[Tuple[User, UUID, int], Depends(get_current_user_role_in_project)]
+ProjectAccessInfo = Annotated[Tuple[Principal, UUID, int], Depends(get_current_user_role_in_project)]
 
 # ================== Rank Check Middleware ==================
 def verify_rank_in_project(allowed_ranks: list[int]):
-    def checker_rank(info: ProjectAccessInfo) -> Tuple[User, UUID, int]:
-        current_user, project_id, rank = info
+    def checker_rank(info: ProjectAccessInfo) -> Tuple[Principal, UUID, int]:
+        return check_rank(info, allowed_ranks)
+
+    return checker_rank
 
-        if current_user.is_superuser:
-            return current_user, project_id, 1  # superuser luôn pass
 
-        if rank not in allowed_ranks:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Bạn cần có quyền với rank nằm trong {allowed_ranks} để thực hiện hành động này.",
-            )
+def check_rank(info: Tuple[Principal, UUID, int], allowed_ranks: list[int]) -> Tuple[Principal, UUID, int]:
+    current_user, project_id, rank = info
 
-        return current_user, project_id, rank
+    if current_user.is_superuser:
+        return current_user, project_id, 1  # superuser luôn pass
+
+    if rank not in allowed_ranks:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Bạn cần có quyền với rank nằm trong {allowed_ranks} để thực hiện hành động này.",
+        )
+
+    return current_user, project_id, rank
+
+def verify_system_rank_in(allowed_ranks: list[int]) -> Callable[[CurrentPrincipal], None]:
+    def checker_system_rank(current_user: CurrentPrincipal) -> None:
+        check_system_rank(current_user, allowed_ranks)
+
+    return checker_system_rank
+
+
+def check_system_rank(current_user: Principal, allowed_ranks: list[int]) -> None:
+    if current_user.system_rank is None or current_user.system_rank not in allowed_ranks:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Bạn cần có system_rank nằm trong {allowed_ranks} để thực hiện hành động này.",
+        )
+
+
+# ================== Async (route chỉ đọc) ==================
+# Cùng các kiểm tra như trên nhưng đọc qua AsyncSessionDep, để route async không phải
+# chuyển sang threadpool cho dependency. Cache principal/rank dùng chung với nhánh đồng bộ.
+async def get_current_principal_async(session: AsyncSessionDep, token: TokenDep) -> Principal:
+    user_id = decode_user_id(token)
+    principal = await principal_cache.get_or_load_async(str(user_id), lambda: session.get(User, user_id))
+    if not principal:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+AsyncCurrentPrincipal = Annotated[Principal, Depends(get_current_principal_async)]
+
+
+async def get_current_active_user_async(current_user: AsyncCurrentPrincipal) -> Principal:
+    return check_active(current_user)
+
+
+async def get_current_user_role_in_project_async(
+    project_id: UUID,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentPrincipal,
+) -> Tuple[Principal, UUID, int]:
+    if current_user.is_superuser:
+        return current_user, project_id, 1
+
+    rank = await project_rank_cache.rank_in_project_async(session, current_user.id, project_id)
+    return check_project_access(current_user, project_id, rank)
+
+
+AsyncProjectAccessInfo = Annotated[Tuple[Principal, UUID, int], Depends(get_current_user_role_in_project_async)]
+
+
+def verify_rank_in_project_async(allowed_ranks: list[int]):
+    async def checker_rank(info: AsyncProjectAccessInfo) -> Tuple[Principal, UUID, int]:
+        return check_rank(info, allowed_ranks)
 
     return checker_rank
 
-def verify_system_rank_in(allowed_ranks: list[int]) -> Callable[[CurrentUser], None]:
-    def checker_system_rank(current_user: CurrentUser) -> None:
-        if current_user.system_rank is None or current_user.system_rank not in allowed_ranks:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Bạn cần có system_rank nằm trong {allowed_ranks} để thực hiện hành động này.",
-            )
+
+def verify_system_rank_in_async(allowed_ranks: list[int]) -> Callable[[AsyncCurrentPrincipal], Awaitable[None]]:
+    async def checker_system_rank(current_user: AsyncCurrentPrincipal) -> None:
+        check_system_rank(current_user, allowed_ranks)
 
     return checker_system_rank
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, private, users, utils, projects, role, req, UserProjectRole, system, ecopark
+from app.api.routes import login, private, users, utils, projects, role, req, UserProjectRole, system, ecopark, mqtt, static_img
 from app.core.config import settings
 
 api_router = APIRouter()
@@ -13,6 +13,8 @@ api_router.include_router(req.router)
 api_router.include_router(UserProjectRole.router)
 api_router.include_router(system.router)
 api_router.include_router(ecopark.router)
+api_router.include_router(mqtt.router)
+api_router.include_router(static_img.router)
 # api_router.include_router(address.router)
 
 
@@ -1,13 +1,16 @@
+import json
+from collections.abc import Iterator
+
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func
-from sqlmodel import select
+from sqlmodel import Session, select
 from uuid import UUID
 from typing import Dict, List, Any, Optional
 
 from app.models import (
     ProjectList,
     ProjectsPublic,
-    User,
     UserProjectRole,
     UserProjectRoleCreate,
     UserProjectRoleUpdate,
@@ -15,7 +18,9 @@ from app.models import (
     Role,
 )
 from app.api.deps import (
+    CountQuery,
     CurrentUser,
+    CursorQuery,
     get_current_user,
     get_current_active_superuser,
     get_current_active_user,
@@ -24,6 +29,10 @@ from app.api.deps import (
     verify_system_rank_in,
 )
 import app.crud as crud
+from app.core.db import engine
+from app.core.pagination import CountMode
+from app.core.principal_cache import Principal
+from app.core.static_assets import static_manifest
 
 router = APIRouter(prefix="/UserProjectRole", tags=["UserProjectRole"])
 
@@ -35,7 +44,7 @@ def build_flat_image_url(request: Request, picture: Optional[str]) -> Optional[s
     if not picture:
         return None
     base = str(request.base_url).rstrip("/")
-    return f"{base}{STATIC_URL_PREFIX}/{PROJECT_FOLDER}/{picture}.jpg"
+    return f"{base}{STATIC_URL_PREFIX}/{static_manifest.url_path(f'{PROJECT_FOLDER}/{picture}.jpg')}"
 
 
 
@@ -52,36 +61,58 @@ def read_all_user_project_assignments(
     session: SessionDep,
     current_user: CurrentUser,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
+    project_id: Optional[UUID] = Query(None, description="Lọc theo dự án"),
+    user_id: Optional[UUID] = Query(None, description="Lọc theo user"),
+    role_id: Optional[UUID] = Query(None, description="Lọc theo vai trò"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
 ) -> Any:
     """
-    Đọc tất cả các bản phân quyền user-project-role.
+    Đọc các bản phân quyền user-project-role theo trang (dùng `next_cursor` để lấy trang sau).
     Chỉ cho phép superuser hoặc người có quyền admin hệ thống.
     Thông tin dự án được hiển thị theo ngôn ngữ được chỉ định.
+    Xuất toàn bộ: xem `/assignments/export`.
     """
-
-    statement = select(UserProjectRole, User, ProjectList, Role).join(User).join(ProjectList).join(Role)
-    
-    results = session.exec(statement).all()
-
-    assignments = []
-    for user_project_role, user, project, role in results:
-        assignment_info = {
-            "id": user_project_role.id,
-            "user_id": user.id,
-            "user_email": user.email,
-            "project_id": project.id,
-            "project_name": getattr(project, f'name_{lang}', None), # Ánh xạ tên dự án theo ngôn ngữ
-            "role_id": role.id,
-            "role_name": role.name,
-            "role_rank": role.rank,
-        }
-        assignments.append(assignment_info)
-
+    filters = dict(project_id=project_id, user_id=user_id, role_id=role_id)
+    assignments, next_cursor = crud.get_assignments(
+        session=session, lang=lang, skip=skip, limit=limit, cursor=cursor, **filters
+    )
     return {
         "assignments": assignments,
-        "total": len(assignments)
+        "total": crud.count_assignments(session=session, mode=count, **filters),
+        "next_cursor": next_cursor,
     }
 
+@router.get(
+    "/assignments/export",
+    dependencies=[
+        Depends(get_current_user),
+        Depends(verify_system_rank_in([1, 2]))
+    ]
+)
+def export_user_project_assignments(
+    lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
+    project_id: Optional[UUID] = Query(None, description="Lọc theo dự án"),
+    user_id: Optional[UUID] = Query(None, description="Lọc theo user"),
+    role_id: Optional[UUID] = Query(None, description="Lọc theo vai trò"),
+) -> StreamingResponse:
+    """
+    Xuất toàn bộ bản phân quyền dưới dạng NDJSON (mỗi dòng một bản phân quyền, sắp xếp theo id).
+    Dữ liệu được đọc theo lô nên bộ nhớ không tăng theo kích thước bảng.
+    """
+
+    def generate() -> Iterator[str]:
+        # Session riêng: session của dependency đã đóng khi response bắt đầu được stream
+        with Session(engine) as session:
+            for assignment in crud.iter_assignments(
+                session=session, lang=lang, project_id=project_id, user_id=user_id, role_id=role_id
+            ):
+                yield json.dumps(assignment, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get(
     "/{user_project_role_id}",
     response_model=Dict[str, Any],
@@ -95,32 +126,12 @@ def read_single_user_project_assignment(
     """
     Đọc một bản phân quyền User-Project-Role cụ thể dựa trên ID của nó.
     """
-    statement = (
-        select(UserProjectRole, User, ProjectList, Role)
-        .join(User)
-        .join(ProjectList)
-        .join(Role)
-        .where(UserProjectRole.id == user_project_role_id)
-    )
-    result = session.exec(statement).first()
-    if not result:
+    assignment_info = crud.get_assignment(session=session, user_project_role_id=user_project_role_id, lang=lang)
+    if not assignment_info:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy bản phân quyền."
         )
-    user_project_role, user, project, role = result
-    
-    assignment_info = {
-        "id": user_project_role.id,
-        "user_id": user.id,
-        "user_email": user.email,
-        "project_id": project.id,
-        "project_name": getattr(project, f'name_{lang}', None),
-        "role_id": role.id,
-        "role_name": role.name,
-        "role_rank": role.rank,
-    }
-    
     return assignment_info
 
 @router.post(
@@ -201,7 +212,7 @@ def update_user_role_in_project(
 def remove_user_project_role_by_id(
     user_project_role_id: UUID,
     session: SessionDep,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> dict:
     """
     Xoá một bản phân quyền UserProjectRole bằng ID của nó,
@@ -4,14 +4,15 @@ from typing import Annotated, Any, Dict, List, Optional
 from uuid import UUID
 import uuid
 
-from fastapi.responses import FileResponse, JSONResponse
-import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
+import hashlib
 from fastapi import APIRouter, Form, Path, UploadFile, File, Depends, HTTPException, Query, logger, status, Request
 from sqlalchemy import func, delete
 from sqlmodel import SQLModel, select
 
 from app import crud
-from app.models import DetalEcoRetreat, DetalEcoRetreatCreate, DetalEcoRetreatPublic, DetalEcoRetreatResponse, DetalEcoRetreatUpdate, Ecopark, EcoparkCreate, EcoparkUpdate, EcoparkPublic
+from app.models import EcoparkImportJob, EcoparkImportJobPublic, DetalEcoRetreat, DetalEcoRetreatCreate, DetalEcoRetreatPublic, DetalEcoRetreatResponse, DetalEcoRetreatUpdate, Ecopark, EcoparkCreate, EcoparkUpdate, EcoparkPublic
 from app.api.deps import get_current_user, SessionDep, verify_rank_in_project
 from app import crud
 from app.api import deps
@@ -19,16 +20,34 @@ import json
 import os
 import re
 from fastapi.staticfiles import StaticFiles
-from app.core.mqtt import publish
+from app.core.config import settings
+from app.core.ecopark_catalog import ecopark_catalog, notify_catalog_changed
+from app.core.ecopark_import import ExcelBatchReader, ImportFileError, import_ecopark_stream
+from app.core.import_jobs import (
+    TERMINAL_STATUSES,
+    job_public,
+    request_cancel,
+    stage_upload,
+    submit_job,
+    validate_workbook,
+)
+from app.core.mqtt import publish_light_channels
+from app.core.renditions import image_renditions
+from app.core.static_assets import static_manifest
+from app.core.uploads import gather_bounded, remove_file, save_upload
 from pathlib import Path as PPath
 
 from app.api.deps import (
+    AsyncProjectAccessInfo,
+    AsyncSessionDep,
+    ReadSessionDep,
     SessionDep,
     ProjectAccessInfo,
     CurrentUser,
     get_current_active_user,
     get_current_user,
     get_current_active_superuser,
+    verify_rank_in_project_async,
     verify_system_rank_in
 )
 
@@ -59,6 +78,8 @@ PHYSICAL_STATIC_DIR = APP_ROOT_DIR / "static"
 # Đường dẫn vật lý đầy đủ đến thư mục đích cuối cùng: backend/app/static/EcoRetreat/CHITIET/
 ECO_RETREAT_DETAIL_UPLOAD_DIR = PHYSICAL_STATIC_DIR / "EcoRetreat" / "CHITIET"
 
+ALLOWED_IMAGE_TYPES = ("image/jpeg", "image/png")
+
 
 # --- KIỂM TRA VÀ TẠO THƯ MỤC NẾU CHƯA TỒN TẠI ---
 try:
@@ -74,14 +95,30 @@ except Exception as e:
 def build_flat_image_detal_url(request: Request, filename: str) -> str:
     # Tiền tố mount của bạn: "/api/v1/static"
     # Tiếp theo là đường dẫn con bên trong thư mục 'static' nơi ảnh được lưu
-    return f"{request.url.scheme}://{request.url.netloc}/api/v1/static/EcoRetreat/CHITIET/{filename}"
+    # Tên có hash nội dung (khi đã biết) để client cache lâu dài
+    return f"{request.url.scheme}://{request.url.netloc}/api/v1/static/{static_manifest.url_path(f'EcoRetreat/CHITIET/{filename}')}"
+
+
+async def preload_detal_srcsets(filenames: List[str]) -> None:
+    # Đọc manifest của cả trang ngoài event loop, sau đó build_detal_srcset chỉ đọc bộ nhớ đệm
+    await image_renditions.preload(ECO_RETREAT_DETAIL_UPLOAD_DIR / filename for filename in filenames)
+
+
+def build_detal_srcset(request: Request, filename: str) -> Optional[Dict[str, str]]:
+    # Ảnh phái sinh (AVIF/WebP nhiều chiều rộng) được tạo nền sau khi upload
+    static_url = f"{request.url.scheme}://{request.url.netloc}{STATIC_URL_PREFIX}"
+    return image_renditions.srcset(ECO_RETREAT_DETAIL_UPLOAD_DIR / filename, static_url)
 
 
 def build_flat_image_url(request: Request, picture_name: Optional[str]) -> Optional[str]:
+    return flat_image_url(str(request.base_url).rstrip("/"), picture_name)
+
+
+def flat_image_url(base: str, picture_name: Optional[str]) -> Optional[str]:
+    # Dùng khi dựng nhiều URL trong một request: chỉ tính base_url một lần
     if not picture_name:
         return None
-    base = str(request.base_url).rstrip("/")
-    return f"{base}{STATIC_URL_PREFIX}/{PROJECT_FOLDER}/{picture_name}.png"
+    return f"{base}{STATIC_URL_PREFIX}/{static_manifest.url_path(f'{PROJECT_FOLDER}/{picture_name}.png')}"
 
 @router.get("/longanh")
 async def serve_index():
@@ -94,8 +131,8 @@ async def serve_index():
     return FileResponse(html_file_path)
 
 @router.get("/", response_model=Dict[str, Any])
-def get_all_ecopark_records(
-    session: SessionDep,
+async def get_all_ecopark_records(
+    session: AsyncSessionDep,
     request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1),
@@ -104,32 +141,9 @@ def get_all_ecopark_records(
     """
     Retrieves all Ecopark records, applies language translation, and returns a dictionary-based response.
     """
-    results = crud.get_all_ecopark(session=session, skip=skip, limit=limit)
-    
-    # 2. Prepare the list for the response items
-    items_for_response = []
-    
-    # 3. Apply the same manual translation logic as the amenity search API
-    for r in results:
-        # Convert the SQLModel object to a dictionary
-        translated_item = r.model_dump()
-        
-        # Apply the specific translation logic
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-        translated_item['description'] = translated_item.get(f'description_{lang}')
-        
-        # Clean up the original language-specific fields
-        # Creating a copy of keys to avoid RuntimeError
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-
-        # Validate and append the item
-        items_for_response.append(translated_item) 
+    # Bản dịch theo ngôn ngữ đã được dựng sẵn trong catalog, chỉ cần cắt trang
+    catalog = await ecopark_catalog.snapshot_async(session)
+    items_for_response = catalog.projected(lang, "full")[skip:skip + limit]
 
     # 4. Construct the final dictionary response
     # This matches the structure of your amenity search API
@@ -144,100 +158,103 @@ def get_all_ecopark_records(
 def upload_excel(
     *,
     session: SessionDep,
+    current_user: CurrentUser,
+    response: Response,
     project_id: UUID = Path(..., description="ID của dự án (chỉ dùng cho mục đích định tuyến/ủy quyền, không lưu vào Ecopark)"),
     file: UploadFile = File(...),
+    background: bool = Query(True, description="Nhập nền và trả về job_id (false: nhập ngay trong request như trước)"),
 ) -> Dict[str, Any]:
     # 1. Kiểm tra định dạng file
     if not file.filename.endswith(".xlsx"):
         raise HTTPException(status_code=400, detail="Chỉ hỗ trợ file định dạng .xlsx")
 
-    # 2. Đọc file Excel từ sheet "ECO PARK"
-    try:
-        # THAY ĐỔI TẠI ĐÂY: Thêm sheet_name='ECO PARK'
-        df = pd.read_excel(file.file, sheet_name='ECO PARK')
-        
-        # Đảm bảo cột 'port' tồn tại trong Excel
-        if 'port' not in df.columns:
-            raise HTTPException(status_code=400, detail="Sheet 'ECO PARK' trong file Excel phải chứa cột 'port'.")
-    except ValueError as ve:
-        # Bắt lỗi nếu sheet 'ECO PARK' không tồn tại
-        raise HTTPException(status_code=400, detail=f"Không tìm thấy sheet 'ECO PARK' trong file Excel. Vui lòng kiểm tra tên sheet: {ve}")
-    except Exception as e:
-        # Bắt các lỗi chung khi đọc file (ví dụ: file bị hỏng, định dạng sai)
-        raise HTTPException(status_code=400, detail=f"Không thể đọc file Excel. Vui lòng kiểm tra định dạng và nội dung: {e}")
+    if background:
+        # 2. Lưu file, kiểm tra nhanh sheet/cột 'port' rồi giao cho process nhập nền
+        staged_path = stage_upload(file.file)
+        try:
+            validate_workbook(staged_path)
+        except ImportFileError as e:
+            os.remove(staged_path)
+            raise HTTPException(status_code=400, detail=str(e))
+
+        job = EcoparkImportJob(
+            project_id=project_id,
+            created_by=current_user.id,
+            filename=file.filename,
+            staged_path=staged_path,
+        )
+        session.add(job)
+        session.commit()
+        submit_job(job.id)
 
-    processed_count = 0
-    failed_count = 0
-    errors = []
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Đã nhận file Excel, đang nhập dữ liệu nền.",
+            "job_id": str(job.id),
+            "status": job.status.value,
+        }
 
-    # 3. Duyệt qua từng hàng và xử lý
-    for index, row in df.iterrows():
-        row_number_in_excel = index + 2 # +2 để tính hàng header và index 0 của pandas thành số hàng trong Excel
-        
-        try:
-            row_port: Optional[int] = None
-            if "port" in row and not pd.isna(row["port"]):
-                try:
-                    row_port = int(row["port"])
-                except ValueError:
-                    errors.append(f"Hàng {row_number_in_excel}: Cột 'port' ('{row['port']}') không phải là số nguyên hợp lệ.")
-                    failed_count += 1
-                    continue
-            
-            if row_port is None:
-                errors.append(f"Hàng {row_number_in_excel}: Cột 'port' bị thiếu hoặc giá trị rỗng.")
-                failed_count += 1
-                continue
-
-            ecopark_data = EcoparkCreate(
-                port=row_port,
-                building_name=row.get("building_name") if "building_name" in row and not pd.isna(row.get("building_name")) else None,
-                picture_name=row.get("picture_name") if "picture_name" in row and not pd.isna(row.get("picture_name")) else None,
-                building_type_vi=row.get("building_type_vi") if "building_type_vi" in row and not pd.isna(row.get("building_type_vi")) else None,
-                building_type_en=row.get("building_type_en") if "building_type_en" in row and not pd.isna(row.get("building_type_en")) else None,
-                amenity_type_vi=row.get("amenity_type_vi") if "amenity_type_vi" in row and not pd.isna(row.get("amenity_type_vi")) else None,
-                amenity_type_en=row.get("amenity_type_en") if "amenity_type_en" in row and not pd.isna(row.get("amenity_type_en")) else None,
-                zone_name_vi=row.get("zone_name_vi") if "zone_name_vi" in row and not pd.isna(row.get("zone_name_vi")) else None,
-                zone_name_en=row.get("zone_name_en") if "zone_name_en" in row and not pd.isna(row.get("zone_name_en")) else None,
-                zone=row.get("zone") if "zone" in row and not pd.isna(row.get("zone")) else None,
-                amenity=row.get("amenity") if "amenity" in row and not pd.isna(row.get("amenity")) else None,
-                direction_vi=row.get("direction_vi") if "direction_vi" in row and not pd.isna(row.get("direction_vi")) else None,
-                
-                bedroom=int(row["bedroom"]) if "bedroom" in row and not pd.isna(row.get("bedroom")) else None,
-                price=int(row["price"]) if "price" in row and not pd.isna(row.get("price")) else None,
-                
-                status_vi=row.get("status_vi") if "status_vi" in row and not pd.isna(row.get("status_vi")) else None,
-                direction_en=row.get("direction_en") if "direction_en" in row and not pd.isna(row.get("direction_en")) else None,
-                status_en=row.get("status_en") if "status_en" in row and not pd.isna(row.get("status_en")) else None,
-                description_vi=row.get("description_vi") if "description_vi" in row and not pd.isna(row.get("description_vi")) else None,
-                description_en=row.get("description_en") if "description_en" in row and not pd.isna(row.get("description_en")) else None,
+    # 2. Đọc sheet "ECO PARK" theo lô (openpyxl read-only), chuẩn hoá/kiểm tra theo cột
+    #    rồi ghi theo khối (INSERT ... ON CONFLICT) trong một transaction
+    try:
+        with ExcelBatchReader(file.file, batch_rows=settings.ECOPARK_IMPORT_BATCH_ROWS) as reader:
+            result = import_ecopark_stream(
+                session,
+                reader,
+                chunk_size=settings.ECOPARK_IMPORT_CHUNK_SIZE,
+                max_failed_rows=settings.ECOPARK_IMPORT_MAX_FAILED_ROWS,
+                max_failed_ratio=settings.ECOPARK_IMPORT_MAX_FAILED_RATIO,
             )
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-            existing_ecopark = crud.get_by_port(session=session, port=row_port)
+    if result.processed_count > 0:
+        notify_catalog_changed()
 
-            if existing_ecopark:
-                ecopark_update_data = EcoparkUpdate(**ecopark_data.dict(exclude={"port"}))
-                crud.update_ecopark(session=session, db_ecopark=existing_ecopark, ecopark_in=ecopark_update_data)
-            else:
-                crud.create_ecopark(session=session, ecopark_in=ecopark_data)
-            
-            processed_count += 1
+    return result.as_response()
 
-        except Exception as e:
-            errors.append(f"Hàng {row_number_in_excel} (Port: {row.get('port', 'N/A')}): Lỗi - {e}")
-            failed_count += 1
 
-    if failed_count > 0:
-        return {
-            "message": f"Đã xử lý file Excel. Thành công: {processed_count}, Thất bại: {failed_count}.",
-            "errors": errors,
-            "status": "partial_success" if processed_count > 0 else "failed"
-        }
-    else:
-        return {
-            "message": f"Đã xử lý file Excel thành công. Tổng số bản ghi được xử lý: {processed_count}.",
-            "status": "success"
-        }
+def _get_import_job(session: SessionDep, project_id: UUID, job_id: UUID) -> EcoparkImportJob:
+    job = session.get(EcoparkImportJob, job_id)
+    if not job or job.project_id != project_id:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job nhập Excel")
+    return job
+
+
+@router.get(
+    "/{project_id}/imports/{job_id}",
+    response_model=EcoparkImportJobPublic,
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def get_import_job(
+    *,
+    session: SessionDep,
+    project_id: UUID = Path(...),
+    job_id: UUID = Path(...),
+) -> Any:
+    """Trạng thái job nhập Excel: số hàng đã xử lý, lỗi, tốc độ (hàng/giây) và thời gian còn lại ước tính."""
+    return job_public(_get_import_job(session, project_id, job_id))
+
+
+@router.post(
+    "/{project_id}/imports/{job_id}/cancel",
+    response_model=EcoparkImportJobPublic,
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def cancel_import_job(
+    *,
+    session: SessionDep,
+    project_id: UUID = Path(...),
+    job_id: UUID = Path(...),
+) -> Any:
+    """
+    Huỷ job nhập Excel. Job đang chờ bị huỷ ngay; job đang chạy dừng ở lô kế tiếp
+    và rollback toàn bộ dữ liệu đã ghi.
+    """
+    job = _get_import_job(session, project_id, job_id)
+    if job.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job đã kết thúc ({job.status.value})")
+    return job_public(request_cancel(session, job))
 
 
 @router.get(
@@ -245,77 +262,93 @@ def upload_excel(
     status_code=status.HTTP_200_OK,
     response_model=dict,
 )
-def get_filter_options(
+async def get_filter_options(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
+    request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Bộ lọc đang chọn, dùng cho 'counts'"),
+    direction: Optional[str] = Query(None),
+    building_type: Optional[str] = Query(None),
+    zone_name: Optional[str] = Query(None),
+    amenity_type: Optional[str] = Query(None),
+    bedroom: Optional[int] = Query(None),
+    min_price: Optional[int] = Query(None),
+    max_price: Optional[int] = Query(None),
     ) -> Any:
     """
-    Trả về danh sách giá trị không trùng lặp của các trường lọc trong Ecopark.
+    Trả về danh sách giá trị không trùng lặp của các trường lọc trong Ecopark,
+    kèm "counts": số bản ghi theo từng giá trị (theo các bộ lọc đang chọn, nếu có).
+
+    Kết quả được tính sẵn cho mỗi phiên bản catalog; hỗ trợ ETag / If-None-Match.
     """
-    def clean_values(column_for_lang: Any, numerical_column: Optional[Any] = None): 
-        invalids = {"", " ", "NaN", "nan", "null", "None", "N", "-", "--"}
-        
-        if numerical_column is not None:
-            column_to_query = numerical_column
-        else:
-            column_to_query = column_for_lang
+    catalog = await ecopark_catalog.snapshot_async(session)
+
+    active = {}
+    text_filters = {
+        "status": status_filter,
+        "direction": direction,
+        "building_type": building_type,
+        "zone_name": zone_name,
+        "amenity_type": amenity_type,
+    }
+    for facet, value in text_filters.items():
+        if value:
+            active[facet] = catalog.equals(f"{facet}_{lang}", value)
+    if bedroom is not None:
+        active["bedroom"] = catalog.equals("bedroom", bedroom)
+    if min_price is not None or max_price is not None:
+        active["price"] = catalog.price_between(min_price, max_price)
+
+    def build_payload() -> tuple[bytes, str]:
+        content = {
+            **catalog.facet_values(lang),
+            "counts": catalog.facet_counts(lang, active),
+        }
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
 
-        query_results = session.exec(select(column_to_query).distinct()).all()
-        results = [r for r in query_results if r is not None and str(r).strip() not in invalids]
-        
-        if numerical_column is not None: 
-            try:
-                return sorted([int(r) for r in results]) 
-            except ValueError:
-                return sorted(results)
-        return sorted(results)
-
-    status_col = Ecopark.status_vi if lang == 'vi' else Ecopark.status_en
-    direction_col = Ecopark.direction_vi if lang == 'vi' else Ecopark.direction_en
-    building_type_col = Ecopark.building_type_vi if lang == 'vi' else Ecopark.building_type_en
-    zone_name_col = Ecopark.zone_name_vi if lang == 'vi' else Ecopark.zone_name_en
-    amenity_type_col = Ecopark.amenity_type_vi if lang == 'vi' else Ecopark.amenity_type_en
+    if active:
+        body, etag = build_payload()
+    else:
+        body, etag = catalog.memo(("filter_options", lang), build_payload)
 
-    return {
-        "status": clean_values(status_col),
-        "price": clean_values(None, Ecopark.price), 
-        "bedroom": clean_values(None, Ecopark.bedroom), 
-        "direction": clean_values(direction_col),
-        "building_type": clean_values(building_type_col),
-        "zone_name": clean_values(zone_name_col),
-        "amenity_type": clean_values(amenity_type_col),
-    }
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post(
     "/{project_id}/filter",
     response_model=List[Dict[str, Any]],
 )
-def filter_ecopark_by_json(
+async def filter_ecopark_by_json(
     *,
     request: Request,
-    session: SessionDep,
+    session: AsyncSessionDep,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     payload: Dict[str, Any],
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
 ) -> List[Dict[str, Any]]:
     """
     Lọc ecopark theo điều kiện động từ JSON.
     """
-    query = select(Ecopark)
+    catalog = await ecopark_catalog.snapshot_async(session)
     conditions = []
     min_price = payload.get("min_price")
     max_price = payload.get("max_price")
 
     try:
-        if min_price is not None:
-            conditions.append(Ecopark.price >= int(min_price))
-        if max_price is not None:
-            conditions.append(Ecopark.price <= int(max_price))
+        if min_price is not None or max_price is not None:
+            conditions.append(catalog.price_between(
+                int(min_price) if min_price is not None else None,
+                int(max_price) if max_price is not None else None,
+            ))
     except ValueError:
         raise HTTPException(status_code=400, detail="min_price and max_price must be numeric")
 
@@ -335,69 +368,55 @@ def filter_ecopark_by_json(
         if not hasattr(Ecopark, col_name):
             raise HTTPException(status_code=400, detail=f"Invalid filter field: {key} for language {lang}")
 
-        col = getattr(Ecopark, col_name)
-
         if key == "price" and not skip_price_filter:
             if isinstance(value, str) and "-" in value:
                 try:
                     min_val, max_val = map(int, value.split("-"))
-                    conditions.append(Ecopark.price >= min_val)
-                    conditions.append(Ecopark.price <= max_val)
+                    conditions.append(catalog.price_between(min_val, max_val))
                 except ValueError:
                     raise HTTPException(status_code=400, detail="Invalid price range format")
             else:
                 try:
-                    conditions.append(col == int(value))
+                    conditions.append(catalog.equals(col_name, int(value)))
                 except ValueError:
                     raise HTTPException(status_code=400, detail="Price must be numeric")
         elif key == "bedroom":
-            conditions.append(getattr(Ecopark, key) == int(value)) 
+            conditions.append(catalog.equals(key, int(value)))
         else:
-            conditions.append(col == str(value))
+            conditions.append(catalog.equals(col_name, str(value)))
 
-    results = session.exec(query.where(*conditions)).all()
-    ids = [r.port for r in results if r.port]
+    positions = catalog.positions(conditions)
+    ids = [catalog.records[i]["port"] for i in positions if catalog.records[i]["port"]]
 
     if ids:
-        publish("ecopark_topic_one", {"channels": ids, "value": 1})
-
-    items_for_response = []
-    translatable_display_fields = ["zone_name", "building_type", "amenity_type", "direction", "status", "description"]
-    for r in results:
-        item_dict = r.model_dump() 
-    
-        processed_item = {}
-        processed_item['port'] = item_dict.get('port')
-        processed_item['building_name'] = item_dict.get('building_name')
-        processed_item['picture_name'] = item_dict.get('picture_name')
-        processed_item['zone'] = item_dict.get('zone')
-        processed_item['amenity'] = item_dict.get('amenity')
-        processed_item['bedroom'] = item_dict.get('bedroom')
-        processed_item['price'] = item_dict.get('price')
-        
-        for field_name in translatable_display_fields:
-            chosen_value = item_dict.get(f'{field_name}_{lang}')
-            if chosen_value is None:
-                chosen_value = item_dict.get(f'{field_name}_en')
-            processed_item[field_name] = chosen_value
+        publish_light_channels("ecopark_topic_one", ids)
 
-        processed_item['image_url'] = build_flat_image_url(request, processed_item.get('picture_name'))
-        items_for_response.append(processed_item)
+    base = str(request.base_url).rstrip("/")
+    projections = catalog.projected(lang, "filter")
+    items_for_response = [
+        {**projections[i], "image_url": flat_image_url(base, projections[i]["picture_name"])}
+        for i in positions
+    ]
 
     return items_for_response
 
-def search_and_publish(
-    session: SessionDep,
+async def search_and_publish(
+    session: AsyncSessionDep,
     request: Request,
     filters: Dict[str, str],
+    lang: str = "en",
 ) -> List[Dict[str, Any]]:
+    """
+    Tìm trong catalog, bật đèn các port tìm được và trả về bản ghi đã dịch theo `lang`.
+    Các dict trả về dùng chung giữa các request: sao chép trước khi thêm khoá.
+    """
     try:
+        catalog = await ecopark_catalog.snapshot_async(session)
         conditions = []
         for field, raw_value in filters.items():
             if not hasattr(Ecopark, field):
                 raise HTTPException(status_code=400, detail=f"Invalid filter field: {field}")
 
-            col = getattr(Ecopark, field)
             value: Any = raw_value.strip()
 
             if field.endswith("_id"):
@@ -410,22 +429,20 @@ def search_and_publish(
             elif value.lower() in ("true", "false"):
                 value = value.lower() == "true"
 
+            # Tra chỉ mục trong bộ nhớ thay vì ILIKE '%...%' quét toàn bảng
             if isinstance(value, str):
-                conditions.append(col.ilike(f"%{value}%"))
+                conditions.append(catalog.ilike(field, value))
             else:
-                conditions.append(col == value)
+                conditions.append(catalog.equals(field, value))
 
-        stmt = select(Ecopark).where(*conditions)
-        results = session.exec(stmt).all() 
+        results = catalog.select_projected(conditions, lang, "summary")
 
         # Gửi dữ liệu MQTT nếu có kết quả
-        ids = [r.port for r in results if r.port]
+        ids = [r["port"] for r in results if r["port"]]
         if ids:
-            publish(ECO_PARK_TOPIC_ONE, {"channels": ids, "value": 1})
-
-        processed_results = [item.model_dump() for item in results]
+            publish_light_channels(ECO_PARK_TOPIC_ONE, ids)
 
-        return processed_results
+        return results
 
     except HTTPException:
         raise
@@ -437,12 +454,12 @@ def search_and_publish(
     "/{project_id}/amenity/{amenity}",
     response_model=Dict[str, Any],
 )
-def ecopark_search_by_amenity(
+async def ecopark_search_by_amenity(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     amenity: str,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (ví dụ: 'vi' hoặc 'en')"),
 ) -> Any:
@@ -450,22 +467,7 @@ def ecopark_search_by_amenity(
         'amenity': amenity,
     }
     
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r) 
-
-        translated_item = ecopark_public_item.model_dump() 
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-
-        items_for_response.append(translated_item) 
+    items_for_response = await search_and_publish(session, request, filters, lang)
 
     image_url = f"{str(request.base_url).rstrip('/')}/static/EcoRetreat/he_thong_tien_ich.png"
 
@@ -478,12 +480,12 @@ def ecopark_search_by_amenity(
     "/{project_id}/amenity/{amenity}/{amenity_type_path}",
     response_model=List[Dict[str, Any]], 
 )
-def ecopark_search_by_amenity_and_type(
+async def ecopark_search_by_amenity_and_type(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     amenity: str,
     amenity_type_path: str,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
@@ -492,25 +494,13 @@ def ecopark_search_by_amenity_and_type(
         f'amenity_type_{lang}': amenity_type_path,
     }
 
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
+    results: List[Dict[str, Any]] = await search_and_publish(session, request, filters, lang)
 
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r)
-        translated_item = ecopark_public_item.model_dump()
-        
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-        
-        translated_item["image_url"] = build_flat_image_url(request, translated_item.get('picture_name'))
-        items_for_response.append(translated_item)
+    base = str(request.base_url).rstrip("/")
+    items_for_response = [
+        {**item, "image_url": flat_image_url(base, item["picture_name"])}
+        for item in results
+    ]
 
     return items_for_response
 
@@ -518,12 +508,12 @@ def ecopark_search_by_amenity_and_type(
     "/{project_id}/zone/{zone_param}",
     response_model=List[Dict[str, Any]], 
 )
-def ecopark_search_by_zone(
+async def ecopark_search_by_zone(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     zone_param: str,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
 ) -> List[Dict[str, Any]]:
@@ -531,28 +521,15 @@ def ecopark_search_by_zone(
         'zone': zone_param, 
     }
 
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
+    results: List[Dict[str, Any]] = await search_and_publish(session, request, filters, lang)
 
     base_url = str(request.base_url).rstrip("/")
     default_image_url = f"{base_url}/static/EcoRetreat/pk.png"
 
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r)
-        translated_item = ecopark_public_item.model_dump()
-        
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-        
-        translated_item["image_url"] = build_flat_image_url(request, translated_item.get('picture_name')) or default_image_url
-        items_for_response.append(translated_item)
+    items_for_response = [
+        {**item, "image_url": flat_image_url(base_url, item["picture_name"]) or default_image_url}
+        for item in results
+    ]
 
     return items_for_response
 
@@ -579,12 +556,12 @@ def normalize_building_type(building_type_str: str) -> str:
     "/{project_id}/zone/{zone_param}/{zone_name_path}",
     response_model=List[Dict[str, Any]], 
 )
-def ecopark_search_by_zone_and_name(
+async def ecopark_search_by_zone_and_name(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     zone_param: str,
     zone_name_path: str,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
@@ -593,29 +570,17 @@ def ecopark_search_by_zone_and_name(
         'zone': zone_param,
         f'zone_name_{lang}': zone_name_path, 
     }
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
+    results: List[Dict[str, Any]] = await search_and_publish(session, request, filters, lang)
 
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r)
-        translated_item = ecopark_public_item.model_dump()
-        
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-        
-        zone_number = extract_zone_number(zone_name_path)
-        filename = f"pk_{zone_number}.png" if zone_number else "pk.png"
-        image_url = f"{str(request.base_url).rstrip('/')}/static/EcoRetreat/{filename}"
-        
-        translated_item["image_url"] = build_flat_image_url(request, translated_item.get('picture_name')) or image_url
-        items_for_response.append(translated_item)
+    base = str(request.base_url).rstrip("/")
+    zone_number = extract_zone_number(zone_name_path)
+    filename = f"pk_{zone_number}.png" if zone_number else "pk.png"
+    image_url = f"{base}/static/EcoRetreat/{filename}"
+
+    items_for_response = [
+        {**item, "image_url": flat_image_url(base, item["picture_name"]) or image_url}
+        for item in results
+    ]
 
     return items_for_response
 
@@ -623,12 +588,12 @@ def ecopark_search_by_zone_and_name(
     "/{project_id}/zone/{zone_param}/{zone_name_path}/{building_type_path}",
     response_model=List[Dict[str, Any]],
 )
-def ecopark_search_by_zone_name_type(
+async def ecopark_search_by_zone_name_type(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     zone_param: str,
     zone_name_path: str,
     building_type_path: str,
@@ -640,29 +605,14 @@ def ecopark_search_by_zone_name_type(
         f'building_type_{lang}': building_type_path,
     }
 
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
-
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r)
-        translated_item = ecopark_public_item.model_dump()
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-        
-        zone_number = extract_zone_number(zone_name_path)
-        building_code = normalize_building_type(building_type_path)
-        image_name = f"{zone_number}_{building_code}.png" if zone_number and building_code != "unknown" else "pk.png"
-        image_url = f"{str(request.base_url).rstrip('/')}/api/v1/static/EcoRetreat/{image_name}"
-        
-        translated_item["image_url"] = image_url
-        items_for_response.append(translated_item)
+    results: List[Dict[str, Any]] = await search_and_publish(session, request, filters, lang)
+
+    zone_number = extract_zone_number(zone_name_path)
+    building_code = normalize_building_type(building_type_path)
+    image_name = f"{zone_number}_{building_code}.png" if zone_number and building_code != "unknown" else "pk.png"
+    image_url = f"{str(request.base_url).rstrip('/')}/api/v1/static/{static_manifest.url_path(f'EcoRetreat/{image_name}')}"
+
+    items_for_response = [{**item, "image_url": image_url} for item in results]
 
     return items_for_response
 
@@ -670,12 +620,12 @@ def ecopark_search_by_zone_name_type(
     "/{project_id}/zone/{zone_param}/{zone_name_path}/{building_type_path}/{building_name_param}",
     response_model=List[Dict[str, Any]], 
 )
-def ecopark_search_by_full_path(
+async def ecopark_search_by_full_path(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     request: Request,
     project_id: UUID = Path(...),
-    info: Annotated[ProjectAccessInfo, Depends(verify_rank_in_project([1, 2, 3]))],
+    info: Annotated[AsyncProjectAccessInfo, Depends(verify_rank_in_project_async([1, 2, 3]))],
     zone_param: str,
     zone_name_path: str,
     building_type_path: str,
@@ -689,24 +639,13 @@ def ecopark_search_by_full_path(
         'building_name': building_name_param,
     }
 
-    results: List[Dict[str, Any]] = search_and_publish(session, request, filters)
-
-    items_for_response = []
-    for r in results:
-        ecopark_public_item = EcoparkPublic(**r)
-        translated_item = ecopark_public_item.model_dump()
-        translated_item['zone_name'] = translated_item.get(f'zone_name_{lang}')
-        translated_item['building_type'] = translated_item.get(f'building_type_{lang}')
-        translated_item['amenity_type'] = translated_item.get(f'amenity_type_{lang}')
-        translated_item['direction'] = translated_item.get(f'direction_{lang}')
-        translated_item['status'] = translated_item.get(f'status_{lang}')
-
-        for key in list(translated_item.keys()):
-            if key.endswith('_vi') or key.endswith('_en'):
-                del translated_item[key]
-        
-        translated_item["image_url"] = build_flat_image_url(request, translated_item.get('picture_name'))
-        items_for_response.append(translated_item)
+    results: List[Dict[str, Any]] = await search_and_publish(session, request, filters, lang)
+
+    base = str(request.base_url).rstrip("/")
+    items_for_response = [
+        {**item, "image_url": flat_image_url(base, item["picture_name"])}
+        for item in results
+    ]
 
     return items_for_response
 
@@ -746,75 +685,71 @@ async def add_multiple_detal_images_for_building(
             detail="Số lượng file ảnh, mô tả tiếng Việt và mô tả tiếng Anh phải khớp nhau."
         )
 
-    results: List[DetalEcoRetreatPublic] = []
     error_details = []
 
-    for i, file in enumerate(files):
-        current_description_vi = description_vi[i]
-        current_description_en = description_en[i]
-
+    async def save_one(i: int) -> DetalEcoRetreatCreate:
+        file = files[i]
         logger.info(f"Processing file {i+1}/{num_files}: '{file.filename}'")
-        logger.info(f"  Desc VI: '{current_description_vi}', Desc EN: '{current_description_en}'")
-
         # --- Kiểm tra loại file ---
-        allowed_mime_types = ["image/jpeg", "image/png"]
-        if file.content_type not in allowed_mime_types:
-            error_details.append(
-                f"File '{file.filename}' (index {i}): Loại file không hợp lệ. Chỉ chấp nhận JPG/JPEG và PNG."
-            )
+        if file.content_type not in ALLOWED_IMAGE_TYPES:
             logger.warning(f"Invalid file type for '{file.filename}': {file.content_type}")
-            continue
+            raise ValueError("Loại file không hợp lệ. Chỉ chấp nhận JPG/JPEG và PNG.")
 
-        # --- Tạo tên file duy nhất và đường dẫn lưu trữ ---
-        file_extension = PPath(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
+        # --- Tạo tên file duy nhất, ghi theo khối vào file tạm rồi đổi tên ---
+        unique_filename = f"{uuid.uuid4()}{PPath(file.filename or '').suffix}"
         file_path = ECO_RETREAT_DETAIL_UPLOAD_DIR / unique_filename
-
-        logger.info(f"  Generated unique filename: {unique_filename}")
-        logger.info(f"  Attempting to save file to: {file_path.resolve()}")
-
-        # --- Lưu file vào hệ thống ---
         try:
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            logger.info(f"  File '{unique_filename}' saved SUCCESSFULLY to '{file_path.resolve()}'.")
+            await save_upload(file, file_path)
         except Exception as e:
-            error_details.append(
-                f"File '{file.filename}' (index {i}): Không thể lưu file do lỗi hệ thống: {e}"
-            )
-            logger.exception(f"  FAILED to save file '{file.filename}' to '{file_path.resolve()}'. An error occurred:")
-            continue
+            logger.exception(f"  FAILED to save file '{file.filename}' to '{file_path}'. An error occurred:")
+            raise ValueError(f"Không thể lưu file do lỗi hệ thống: {e}") from e
+        logger.info(f"  File '{unique_filename}' saved SUCCESSFULLY to '{file_path}'.")
 
-        detal_create_data = DetalEcoRetreatCreate(
-            port=port, 
+        return DetalEcoRetreatCreate(
+            port=port,
             picture=unique_filename,
-            description_vi=current_description_vi,
-            description_en=current_description_en
+            description_vi=description_vi[i],
+            description_en=description_en[i],
         )
-        logger.info(f"  DetalEcoRetreatCreate object prepared with picture='{unique_filename}'.")
-        try:
-            db_detal = crud.create_detal_eco_retreat_record(session, detal_create_data)
-            logger.info(f"  Database record created successfully with ID: {db_detal.id}, picture name: {db_detal.picture}")
 
-            # --- Chuẩn bị phản hồi cho từng ảnh ---
-            detal_public = DetalEcoRetreatPublic.model_validate(db_detal)
-            detal_public.image_url = build_flat_image_detal_url(request, db_detal.picture)
-            logger.info(f"  Generated image URL for response: {detal_public.image_url}")
+    # Các file được lưu đồng thời (giới hạn UPLOAD_CONCURRENCY), kết quả giữ thứ tự upload
+    saved: List[DetalEcoRetreatCreate] = []
+    for i, outcome in enumerate(await gather_bounded(range(num_files), save_one)):
+        if isinstance(outcome, BaseException):
+            error_details.append(f"File '{files[i].filename}' (index {i}): {outcome}")
+        else:
+            saved.append(outcome)
 
-            chosen_description = getattr(db_detal, f'description_{lang}', None)
-            if chosen_description is None:
-                chosen_description = db_detal.description_en
+    # Một giao dịch cho tất cả bản ghi; lỗi thì xoá các file vừa lưu để tránh rác
+    try:
+        db_detals = await run_in_threadpool(crud.create_detal_eco_retreat_records, session, saved)
+    except Exception as e:
+        logger.exception("FAILED to create database records for uploaded images. An error occurred:")
+        await run_in_threadpool(session.rollback)
+        for detal_in in saved:
+            await remove_file(ECO_RETREAT_DETAIL_UPLOAD_DIR / detal_in.picture)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi khi tạo bản ghi database: {e}"
+        )
 
-            detal_public.description = chosen_description
-            results.append(detal_public)
+    for detal_in in saved:
+        image_renditions.submit(ECO_RETREAT_DETAIL_UPLOAD_DIR / detal_in.picture)
 
-        except Exception as e:
-            error_details.append(
-                f"File '{file.filename}' (index {i}): Lỗi khi tạo bản ghi database: {e}"
-            )
-            logger.exception(f"  FAILED to create database record for '{unique_filename}'. An error occurred:")
-            continue
+    await preload_detal_srcsets([db_detal.picture for db_detal in db_detals])
+    results: List[DetalEcoRetreatPublic] = []
+    for db_detal in db_detals:
+        # --- Chuẩn bị phản hồi cho từng ảnh ---
+        detal_public = DetalEcoRetreatPublic.model_validate(db_detal)
+        detal_public.image_url = build_flat_image_detal_url(request, db_detal.picture)
+        detal_public.srcset = build_detal_srcset(request, db_detal.picture)
+
+        chosen_description = getattr(db_detal, f'description_{lang}', None)
+        if chosen_description is None:
+            chosen_description = db_detal.description_en
+
+        detal_public.description = chosen_description
+        results.append(detal_public)
 
     if error_details:
         logger.error(f"Completed processing with {len(error_details)} errors and {len(results)} successes.")
@@ -860,6 +795,7 @@ def update_ecopark_details(
         db_ecopark=db_ecopark,
         ecopark_in=ecopark_in
     )
+    notify_catalog_changed()
     
     return updated_ecopark
 
@@ -868,9 +804,9 @@ def update_ecopark_details(
     response_model=DetalEcoRetreatPublic,
     summary="Đọc thông tin một hình ảnh chi tiết theo ID"
 )
-def read_detal_image_by_id(
+async def read_detal_image_by_id(
     *,
-    session: SessionDep,
+    session: ReadSessionDep,
     request: Request,
     detal_id: uuid.UUID = Path(..., description="ID của hình ảnh chi tiết DetalEcoRetreat"),
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ cho mô tả"),
@@ -878,12 +814,14 @@ def read_detal_image_by_id(
     """
     Truy xuất thông tin chi tiết của một bản ghi hình ảnh DetalEcoRetreat dựa trên ID duy nhất của nó.
     """
-    db_detal = crud.get_detal_eco_retreat_by_id(session, detal_id)
+    db_detal = await crud.get_detal_eco_retreat_by_id_async(session, detal_id)
     if not db_detal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hình ảnh chi tiết không tìm thấy.")
 
+    await preload_detal_srcsets([db_detal.picture])
     detal_public = DetalEcoRetreatPublic.model_validate(db_detal)
     detal_public.image_url = build_flat_image_detal_url(request, db_detal.picture)
+    detal_public.srcset = build_detal_srcset(request, db_detal.picture)
     
     chosen_description = getattr(db_detal, f'description_{lang}', None)
     if chosen_description is None:
@@ -898,9 +836,9 @@ def read_detal_image_by_id(
     response_model=DetalEcoRetreatResponse,
     summary="Đọc tất cả hình ảnh chi tiết cho nhiều 'port' cụ thể của 1 building_name" # Cập nhật summary
 )
-def read_detal_images_by_ports( # Đổi tên hàm cho rõ ràng
+async def read_detal_images_by_ports( # Đổi tên hàm cho rõ ràng
     *,
-    session: SessionDep,
+    session: ReadSessionDep,
     request: Request,
     port: List[int] = Query(..., description="Danh sách các số 'port' để lọc hình ảnh. Ví dụ: ?ports=8080&ports=8081"), # Thay đổi từ Path sang Query và List[int]
     skip: int = 0,
@@ -911,12 +849,14 @@ def read_detal_images_by_ports( # Đổi tên hàm cho rõ ràng
     Truy xuất danh sách tất cả các hình ảnh chi tiết thuộc về nhiều 'port' cụ thể.
     """
     # Gọi hàm CRUD mới để lấy dữ liệu theo danh sách ports
-    db_detals, total = crud.get_all_detal_eco_retreats_by_ports(session=session, port=port, skip=skip, limit=limit)
+    db_detals, total = await crud.get_all_detal_eco_retreats_by_ports_async(session=session, port=port, skip=skip, limit=limit)
     
+    await preload_detal_srcsets([db_detal.picture for db_detal in db_detals])
     response_items = [] 
     for db_detal in db_detals:
         detal_public = DetalEcoRetreatPublic.model_validate(db_detal)
         detal_public.image_url = build_flat_image_detal_url(request, db_detal.picture)
+        detal_public.srcset = build_detal_srcset(request, db_detal.picture)
 
         chosen_description = getattr(db_detal, f'description_{lang}', None)
         if chosen_description is None:
@@ -949,7 +889,7 @@ async def update_detal_image_by_id(
     """
     Cập nhật một bản ghi DetalEcoRetreat, bao gồm khả năng thay thế file ảnh và cập nhật mô tả.
     """
-    db_detal = crud.get_detal_eco_retreat_by_id(session, detal_id)
+    db_detal = await run_in_threadpool(crud.get_detal_eco_retreat_by_id, session, detal_id)
     if not db_detal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hình ảnh chi tiết không tìm thấy.")
 
@@ -960,61 +900,45 @@ async def update_detal_image_by_id(
     if description_en is not None: # Nếu mô tả tiếng Anh được cung cấp
         detal_update_data["description_en"] = description_en
 
-    old_picture_name = db_detal.picture
     new_picture_name = None
 
     # --- Xử lý file ảnh mới nếu được cung cấp ---
     if file:
-        allowed_mime_types = ["image/jpeg", "image/png"]
-        if file.content_type not in allowed_mime_types:
+        if file.content_type not in ALLOWED_IMAGE_TYPES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Loại file không hợp lệ cho '{file.filename}'. Chỉ chấp nhận JPG/JPEG và PNG."
             )
 
-        file_extension = PPath(file.filename).suffix
-        new_picture_name = f"{uuid.uuid4()}{file_extension}"
-        new_file_path = ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name
-
+        new_picture_name = f"{uuid.uuid4()}{PPath(file.filename or '').suffix}"
         try:
-            with open(new_file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            await save_upload(file, ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Không thể lưu file mới '{file.filename}' do lỗi hệ thống: {e}"
             )
-        
-        # 4. Cập nhật tên ảnh mới vào dữ liệu update
+        # Cập nhật tên ảnh mới vào dữ liệu update
         detal_update_data["picture"] = new_picture_name
-        # 5. Xóa file ảnh cũ nếu có
-        if old_picture_name:
-            old_file_path = ECO_RETREAT_DETAIL_UPLOAD_DIR / old_picture_name
-            if old_file_path.is_file():
-                try:
-                    os.remove(old_file_path)
-                    print(f"Đã xóa file cũ: {old_file_path}")
-                except OSError as e:
-                    print(f"Lỗi khi xóa file cũ '{old_file_path}': {e}") # Log lỗi, không chặn request
 
     try:
-        db_detal = crud.update_detal_eco_retreat_record(session, db_detal, detal_update_data)
+        db_detal = await run_in_threadpool(crud.update_detal_eco_retreat_record, session, db_detal, detal_update_data)
     except ValueError as e:
-        # Nếu có lỗi về mô tả (tiếng Việt/Anh bị thiếu)
-        # Đồng thời, nếu đã lưu file mới, hãy cố gắng xóa nó để tránh rác
-        if new_picture_name:
-            if (ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name).is_file():
-                try:
-                    os.remove(ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name)
-                    print(f"Đã xóa file mới do lỗi DB rollback: {new_picture_name}")
-                except OSError as rollback_e:
-                    print(f"Lỗi khi rollback xóa file mới: {rollback_e}")
+        # Nếu có lỗi về mô tả (tiếng Việt/Anh bị thiếu): xoá file mới đã lưu để tránh rác
+        if new_picture_name and await remove_file(ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name):
+            logger.info(f"Đã xóa file mới do lỗi DB rollback: {new_picture_name}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    
+
+    if new_picture_name:
+        image_renditions.submit(ECO_RETREAT_DETAIL_UPLOAD_DIR / new_picture_name)
+
+    # File ảnh cũ đã được ghi tombstone cùng giao dịch cập nhật, sweeper sẽ xoá (app.core.file_gc)
+
     # --- Chuẩn bị dữ liệu trả về ---
+    await preload_detal_srcsets([db_detal.picture])
     detal_public = DetalEcoRetreatPublic.model_validate(db_detal)
     detal_public.image_url = build_flat_image_detal_url(request, db_detal.picture)
+    detal_public.srcset = build_detal_srcset(request, db_detal.picture)
     
     # Lấy mô tả theo ngôn ngữ được yêu cầu
     chosen_description = getattr(db_detal, f'description_{lang}', None)
@@ -1037,7 +961,7 @@ def bulk_delete_detal_images_by_ids(
     detal_ids: List[uuid.UUID] = Query(..., description="Danh sách các ID của hình ảnh chi tiết cần xóa"),
 ) -> Dict[str, str]:
     """
-    Xóa nhiều bản ghi DetalEcoRetreat cùng lúc, bao gồm việc xóa các file ảnh vật lý.
+    Xóa nhiều bản ghi DetalEcoRetreat cùng lúc; các file ảnh vật lý được xoá nền ngay sau đó.
     """
     if not detal_ids:
         raise HTTPException(
@@ -1060,34 +984,13 @@ def bulk_delete_detal_images_by_ids(
         print(f"Cảnh báo: Không tìm thấy các ID sau để xóa: {missing_ids}")
         # Bạn có thể trả về một thông báo chi tiết hơn nếu muốn
 
-    pictures_to_delete = [d.picture for d in db_detals_to_delete if d.picture]
-
-    # Xóa các bản ghi khỏi cơ sở dữ liệu
-    # Hàm CRUD mới sẽ đảm bảo chỉ xóa những bản ghi đã tìm thấy.
+    # Xóa các bản ghi khỏi cơ sở dữ liệu; file ảnh được ghi tombstone trong cùng giao dịch
+    # và xoá nền theo lô (app.core.file_gc), request không phải chờ xoá file
     deleted_count = crud.delete_detal_eco_retreat_records_by_ids(session, [d.id for d in db_detals_to_delete])
 
-    # Xóa các file vật lý
-    files_deleted_count = 0
-    files_failed_to_delete = []
-
-    for picture_name in pictures_to_delete:
-        file_path_to_delete = ECO_RETREAT_DETAIL_UPLOAD_DIR / picture_name
-        if file_path_to_delete.is_file():
-            try:
-                os.remove(file_path_to_delete)
-                files_deleted_count += 1
-                print(f"Đã xóa file vật lý: {file_path_to_delete}")
-            except OSError as e:
-                print(f"Lỗi khi xóa file vật lý '{file_path_to_delete}': {e}")
-                files_failed_to_delete.append(picture_name)
-        else:
-            print(f"Cảnh báo: File '{file_path_to_delete}' không tồn tại để xóa.")
-
     message = f"Đã xóa thành công {deleted_count} bản ghi hình ảnh chi tiết."
     if missing_ids:
         message += f" Các ID không tìm thấy: {', '.join(missing_ids)}."
-    if files_failed_to_delete:
-        message += f" Không thể xóa được {len(files_failed_to_delete)} file ảnh: {', '.join(files_failed_to_delete)}."
 
     return {"message": message}
 
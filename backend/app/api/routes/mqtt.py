@@ -0,0 +1,41 @@
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_user, verify_system_rank_in
+from app.core.mqtt import message_store
+
+router = APIRouter(prefix="/mqtt", tags=["mqtt"])
+
+
+@router.get(
+    "/messages",
+    dependencies=[
+        Depends(get_current_user),
+        Depends(verify_system_rank_in([1, 2])),
+    ],
+)
+def read_mqtt_messages(
+    topic: Optional[str] = Query(None, description="Lọc theo topic (khớp chính xác)"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Thời điểm bắt đầu (ISO 8601)"),
+    to: Optional[datetime] = Query(None, description="Thời điểm kết thúc (ISO 8601)"),
+    limit: int = Query(10000, ge=1, le=1_000_000),
+) -> StreamingResponse:
+    """
+    Truy vấn các tin nhắn MQTT đã lưu theo topic và khoảng thời gian.
+    Kết quả được stream dưới dạng NDJSON (mỗi dòng một tin nhắn), sắp xếp theo thời gian.
+    """
+    from_ms = int(from_.timestamp() * 1000) if from_ else None
+    to_ms = int(to.timestamp() * 1000) if to else None
+    if from_ms is not None and to_ms is not None and from_ms > to_ms:
+        raise HTTPException(status_code=400, detail="'from' phải nhỏ hơn hoặc bằng 'to'")
+
+    def generate() -> Iterator[str]:
+        for message in message_store.query(topic=topic, from_ms=from_ms, to_ms=to_ms, limit=limit):
+            yield json.dumps(message.as_dict(), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
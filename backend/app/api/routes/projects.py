@@ -11,16 +11,25 @@ from app.models import (
     ProjectUpdate,
     ProjectPublic,
     ProjectsPublic,
-    Role,
-    UserProjectRole,
 )
 from app.api.deps import (
+    AsyncCurrentPrincipal,
+    AsyncSessionDep,
+    CountQuery,
+    CursorQuery,
+    ReadSessionDep,
     SessionDep,
+    get_current_principal,
+    get_current_principal_async,
     get_current_user,
     verify_rank_in_project,
-    CurrentUser,
-    verify_system_rank_in
+    CurrentPrincipal,
+    verify_system_rank_in,
+    verify_system_rank_in_async,
 )
+from app.core.pagination import CountMode, count_rows_async
+from app.core.rbac import project_rank_cache
+from app.core.static_assets import static_manifest
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -32,21 +41,24 @@ def build_flat_image_url(request: Request, picture: Optional[str]) -> Optional[s
     if not picture:
         return None
     base = str(request.base_url).rstrip("/")
-    return f"{base}{STATIC_URL_PREFIX}/{PROJECT_FOLDER}/{picture}.jpg"
+    return f"{base}{STATIC_URL_PREFIX}/{static_manifest.url_path(f'{PROJECT_FOLDER}/{picture}.jpg')}"
 
 
 @router.get("/",
         dependencies=[
-            Depends(get_current_user), 
-            Depends(verify_system_rank_in([1, 2, 3, 4, 5, 6])) # Kiểm tra system_rank, với 1 là rank của superuser
+            Depends(get_current_principal_async), 
+            Depends(verify_system_rank_in_async([1, 2, 3, 4, 5, 6])) # Kiểm tra system_rank, với 1 là rank của superuser
         ])
-def read_projects(
+async def read_projects(
     *,
-    session: SessionDep,
-    current_user: CurrentUser, 
+    session: ReadSessionDep,
+    primary: AsyncSessionDep,
+    current_user: AsyncCurrentPrincipal, 
     request: Request,
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
 ) -> Dict[str, Any]:
     """
@@ -54,39 +66,15 @@ def read_projects(
     Nếu người dùng chưa được gán rank cho dự án cụ thể, rank sẽ là null.
     """
 
-    projects_from_db: List[ProjectList] = []
-    count: int = 0
-
-    count_stmt = select(func.count()).select_from(ProjectList)
-    count = session.exec(count_stmt).one()
-    projects_from_db = crud.get_all_project_lists(session=session, skip=skip, limit=limit)
+    projects_from_db, next_cursor = await crud.get_all_project_lists_async(
+        session=session, skip=skip, limit=limit, cursor=cursor
+    )
+    total = await count_rows_async(session, ProjectList, count)
 
     user_project_ranks: Dict[UUID, int] = {}
     
     if not current_user.is_superuser:
-        project_ids_in_list = [project.id for project in projects_from_db]
-        
-        if project_ids_in_list: 
-            user_project_roles_results = session.exec(
-                select(UserProjectRole.project_id, UserProjectRole.role_id)
-                .where(UserProjectRole.user_id == current_user.id)
-                .where(UserProjectRole.project_id.in_(project_ids_in_list))
-            ).all()
-
-            role_ids_to_lookup = list(set([role_id for project_id, role_id in user_project_roles_results]))
-
-            role_id_to_rank: Dict[UUID, int] = {}
-            if role_ids_to_lookup:
-                ranks_from_roles = session.exec(
-                    select(Role.id, Role.rank)
-                    .where(Role.id.in_(role_ids_to_lookup))
-                ).all()
-                for role_id, rank in ranks_from_roles:
-                    role_id_to_rank[role_id] = rank
-            
-            for project_id, role_id in user_project_roles_results:
-                if role_id in role_id_to_rank:
-                    user_project_ranks[project_id] = role_id_to_rank[role_id]
+        user_project_ranks = await project_rank_cache.ranks_async(primary, current_user.id)
 
     items_for_response = [] 
     for project_obj in projects_from_db:
@@ -114,22 +102,24 @@ def read_projects(
 
     return {
         "data": items_for_response,
-        "count": count
+        "count": total,
+        "next_cursor": next_cursor,
     }
 
 @router.get(
     "/{project_id}",
     response_model=None,
     dependencies=[
-        Depends(get_current_user), 
-        Depends(verify_system_rank_in([1, 2, 3, 4, 5, 6]))
+        Depends(get_current_principal_async), 
+        Depends(verify_system_rank_in_async([1, 2, 3, 4, 5, 6]))
     ]
 )
-def read_project_by_id(
+async def read_project_by_id(
     *,
-    session: SessionDep,
+    session: ReadSessionDep,
+    primary: AsyncSessionDep,
     project_id: UUID,
-    current_user: CurrentUser,
+    current_user: AsyncCurrentPrincipal,
     request: Request,
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (e.g., 'vi' or 'en')"),
 ) -> Any:
@@ -138,7 +128,7 @@ def read_project_by_id(
     Dữ liệu trả về sẽ được dịch sang ngôn ngữ được chỉ định.
     Rank của người dùng hiện tại đối với dự án cũng được trả về.
     """
-    db_project = crud.get_project_list(session=session, project_id=project_id)
+    db_project = await crud.get_project_list_async(session=session, project_id=project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project không tồn tại")
 
@@ -146,16 +136,7 @@ def read_project_by_id(
     if current_user.is_superuser:
         user_rank = 1
     else:
-        user_project_role = session.exec(
-            select(UserProjectRole.role_id)
-            .where(UserProjectRole.user_id == current_user.id)
-            .where(UserProjectRole.project_id == project_id)
-        ).one_or_none()
-        
-        if user_project_role:
-            role = session.get(Role, user_project_role)
-            if role:
-                user_rank = role.rank
+        user_rank = await project_rank_cache.rank_in_project_async(primary, current_user.id, project_id)
 
     translated_item = {
         "id": db_project.id,
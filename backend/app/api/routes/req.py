@@ -2,7 +2,7 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import select
 from uuid import UUID
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 from app.models import (
@@ -12,20 +12,27 @@ from app.models import (
     RequestUpdate,
     RequestPublic,
     RequestsPublic,
+    RequestStatus,
     Role,
     UserProjectRoleCreate
 )
 from app.api.deps import (
+    AsyncProjectAccessInfo,
+    CountQuery,
+    CursorQuery,
+    ReadSessionDep,
     SessionDep,
     ProjectAccessInfo,
     CurrentUser,
     get_current_active_user,
+    get_current_active_user_async,
     get_current_user,
     get_current_active_superuser,
     verify_system_rank_in
 )
 from app.models import User
 import app.crud as crud
+from app.core.pagination import CountMode
 
 router = APIRouter(prefix="/req", tags=["Request"])
 
@@ -48,106 +55,71 @@ def translate_request_item(item_dict: Dict[str, Any], lang: str) -> Dict[str, An
     return item_dict
 
 @router.get("/{request_id}", response_model=RequestPublic)
-def get_request_by_id(
-    session: SessionDep,
-    project_info: ProjectAccessInfo,
+async def get_request_by_id(
+    session: ReadSessionDep,
+    project_info: AsyncProjectAccessInfo,
     request_id: uuid.UUID,
-    current_user=Depends(get_current_active_user),
+    current_user=Depends(get_current_active_user_async),
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (ví dụ: 'vi' hoặc 'en')"),
 ) -> Any:
     """
     Lấy một Request cụ thể theo ID, có kiểm tra quyền hạn.
     """
     user, project_id, user_rank = project_info
-        
-    if current_user.is_superuser:
-        request_obj = session.get(Request, request_id)
-        if request_obj and request_obj.project_id == project_id:
-            request_dict = request_obj.model_dump()
-            return translate_request_item(request_dict, lang)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không tìm thấy yêu cầu này trong dự án."
-            )
-
-    stmt = (
-        select(Request)
-        .join(Role, Request.role_id == Role.id)
-        .where(
-            Request.id == request_id,
-            Request.project_id == project_id,
-            Role.rank > user_rank
-        )
+
+    request_obj = await crud.get_project_request_async(
+        session=session,
+        project_id=project_id,
+        request_id=request_id,
+        viewer_rank=None if current_user.is_superuser else user_rank,
     )
-    request_obj = session.exec(stmt).first()
 
     if not request_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Không tìm thấy yêu cầu này hoặc bạn không có quyền xem."
+            detail="Không tìm thấy yêu cầu này trong dự án." if current_user.is_superuser
+            else "Không tìm thấy yêu cầu này hoặc bạn không có quyền xem."
         )
     request_dict = request_obj.model_dump()
     translated = translate_request_item(request_dict, lang)
     return RequestPublic.model_validate(translated)
 
 @router.get("/", response_model=RequestsPublic)
-def get_requests_by_project(
-    session: SessionDep,
-    project_info: ProjectAccessInfo,
-    current_user=Depends(get_current_active_user),
+async def get_requests_by_project(
+    session: ReadSessionDep,
+    project_info: AsyncProjectAccessInfo,
+    current_user=Depends(get_current_active_user_async),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, le=100),
+    limit: int = Query(100, ge=1, le=100),
     lang: str = Query("en", regex="^(vi|en)$", description="Mã ngôn ngữ (ví dụ: 'vi' hoặc 'en')"),
+    request_status: Optional[RequestStatus] = Query(None, alias="status", description="Lọc theo trạng thái"),
+    created_from: Optional[datetime] = Query(None, description="Tạo từ thời điểm này (bao gồm)"),
+    created_to: Optional[datetime] = Query(None, description="Tạo trước thời điểm này"),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
 ):
     user, project_id, user_rank = project_info
 
-    if current_user.is_superuser:
-        stmt = (
-            select(Request)
-            .where(Request.project_id == project_id)
-            .offset(skip)
-            .limit(limit)
-        )
-        requests = session.exec(stmt).all()
-        total = session.exec(
-            select(Request.id).where(Request.project_id == project_id)
-        ).all()
-        total_count = len(total)
-
-        translated_requests = [
-            RequestPublic.model_validate(translate_request_item(req.model_dump(), lang))
-            for req in requests
-        ]
-        return RequestsPublic(data=translated_requests, count=total_count)
-
-    stmt = (
-        select(Request)
-        .join(Role, Request.role_id == Role.id)
-        .where(
-            Request.project_id == project_id,
-            Role.rank > user_rank
-        )
-        .offset(skip)
-        .limit(limit)
+    # Một truy vấn trả cả trang lẫn tổng số (count(*) OVER()), dùng index (project_id, status, created_at)
+    requests, total_count, next_cursor = await crud.get_project_requests_async(
+        session=session,
+        project_id=project_id,
+        viewer_rank=None if current_user.is_superuser else user_rank,
+        status=request_status,
+        created_from=created_from,
+        created_to=created_to,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        count=count,
     )
-    requests = session.exec(stmt).all()
-    total = session.exec(
-        select(Request.id)
-        .join(Role, Request.role_id == Role.id)
-        .where(
-            Request.project_id == project_id,
-            Role.rank > user_rank
-        )
-    ).all()
-
-    total_count = len(total)
 
     translated_requests = [
-        translate_request_item(req.model_dump(), lang) for req in requests
+        RequestPublic.model_validate(translate_request_item(req.model_dump(), lang))
+        for req in requests
     ]
 
-    return RequestsPublic(data=translated_requests, count=total_count)
+    return RequestsPublic(data=translated_requests, count=total_count, next_cursor=next_cursor)
 
 # 2. ✅ POST - tạo request (chỉ được yêu cầu role có rank >= 3)
 @router.post(
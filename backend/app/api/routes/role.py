@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import select, func
 from typing import Any
 from uuid import UUID
 
 from app.models import Role, RoleCreate, RoleUpdate, RolesPublic, RolePublic
-from app.api.deps import SessionDep, get_current_active_superuser
+from app.api.deps import CountQuery, CursorQuery, SessionDep, get_current_active_superuser
+from app.core.pagination import CountMode, count_rows
 from app import crud
 
 router = APIRouter(prefix="/roles", tags=["Roles"])
@@ -15,15 +16,18 @@ router = APIRouter(prefix="/roles", tags=["Roles"])
     response_model=RolesPublic,
     dependencies=[Depends(get_current_active_superuser)],
 )
-def read_roles(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_roles(
+    session: SessionDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
+) -> Any:
     """
     Retrieve all roles (superuser only).
     """
-    count_statement = select(func.count()).select_from(Role)
-    count = session.exec(count_statement).one()
-
-    roles = crud.get_roles(session=session, skip=skip, limit=limit)
-    return RolesPublic(data=roles, count=count)
+    roles, next_cursor = crud.get_roles(session=session, skip=skip, limit=limit, cursor=cursor)
+    return RolesPublic(data=roles, count=count_rows(session, Role, count), next_cursor=next_cursor)
 
 
 @router.get(
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import FileResponse, Response
+
+from app.core.config import settings
+from app.core.image_cache import InvalidImageError, resized_image_cache
+from app.core.renditions import MEDIA_TYPES
+
+router = APIRouter(prefix="/static-img", tags=["static-img"])
+
+# Tên file cache gồm mtime ảnh gốc: URL không đổi nhưng nội dung có thể đổi khi ảnh gốc được thay
+CACHE_CONTROL = "public, max-age=86400"
+
+
+@router.get("/{path:path}")
+async def read_resized_image(
+    path: str,
+    w: int = Query(..., ge=16, le=settings.STATIC_IMG_MAX_WIDTH, description="Chiều rộng (px), không phóng to quá ảnh gốc"),
+    fmt: str = Query("webp", regex="^(avif|webp|jpeg|png)$", description="Định dạng ảnh trả về"),
+) -> Response:
+    """
+    Ảnh trong thư mục static (cùng đường dẫn như `/api/v1/static/...`) thu nhỏ về chiều rộng `w`.
+    Lần đầu được tạo rồi lưu vào cache trên đĩa, các lần sau gửi thẳng file đã có.
+    """
+    try:
+        cached = await resized_image_cache.get(path, w, fmt)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy ảnh.")
+    except InvalidImageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    headers = {"Cache-Control": CACHE_CONTROL}
+    if settings.STATIC_IMG_ACCEL_REDIRECT_PREFIX:
+        # nginx đọc file từ đĩa và gửi bằng sendfile, worker không phải stream nội dung
+        relative = cached.relative_to(resized_image_cache.cache_dir).as_posix()
+        headers["X-Accel-Redirect"] = f"{settings.STATIC_IMG_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return Response(headers=headers, media_type=MEDIA_TYPES[fmt])
+    # FileResponse dùng "http.response.pathsend" (zero-copy) khi ASGI server hỗ trợ
+    return FileResponse(cached, media_type=MEDIA_TYPES[fmt], headers=headers)
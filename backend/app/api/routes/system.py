@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import select, func
 from typing import Any
 from uuid import UUID
@@ -10,7 +10,9 @@ from app.models import (
     SystemPublic,
     SystemsPublic
 )
-from app.api.deps import SessionDep, get_current_active_superuser
+from app import crud
+from app.api.deps import CountQuery, CursorQuery, SessionDep, get_current_active_superuser
+from app.core.pagination import CountMode, count_rows
 
 router = APIRouter(prefix="/system", tags=["system"])
 
@@ -19,10 +21,15 @@ router = APIRouter(prefix="/system", tags=["system"])
     response_model=SystemsPublic,
     dependencies=[Depends(get_current_active_superuser)],
 )
-def read_system_roles(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
-    count = session.exec(select(func.count()).select_from(System)).one()
-    roles = session.exec(select(System).offset(skip).limit(limit)).all()
-    return SystemsPublic(data=roles, count=count)
+def read_system_roles(
+    session: SessionDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
+) -> Any:
+    roles, next_cursor = crud.get_all_systems(session=session, skip=skip, limit=limit, cursor=cursor)
+    return SystemsPublic(data=roles, count=count_rows(session, System, count), next_cursor=next_cursor)
 
 @router.get(
     "/{system_id}",
@@ -1,17 +1,20 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import select, delete
 from sqlalchemy import func
 
 from app import crud
 from app.api.deps import (
     SessionDep,
+    CountQuery,
     CurrentUser,
+    CursorQuery,
     get_current_active_superuser,
 )
 from app.core.config import settings
+from app.core.pagination import CountMode, count_rows
 from app.core.security import get_password_hash, verify_password
 from app.models import (
     Message,
@@ -34,17 +37,18 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: CursorQuery = None,
+    count: CountQuery = CountMode.exact,
+) -> Any:
     """
     Retrieve users.
     """
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
-
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
-
-    return UsersPublic(data=users, count=count)
+    users, next_cursor = crud.get_page(session=session, model=User, skip=skip, limit=limit, cursor=cursor)
+    return UsersPublic(data=users, count=count_rows(session, User, count), next_cursor=next_cursor)
 
 
 @router.post(
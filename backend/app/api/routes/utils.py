@@ -1,7 +1,20 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.db import db_metrics, replica_router
+from app.core.ecopark_catalog import ecopark_catalog
+from app.core.file_gc import file_sweeper
+from app.core.image_cache import resized_image_cache
+from app.core.invalidation import invalidation_bus
+from app.core.mqtt import mqtt_logging_stats
+from app.core.principal_cache import principal_cache
+from app.core.rbac import project_rank_cache
+from app.core.renditions import image_renditions
+from app.core.security import password_hasher
+from app.core.static_assets import static_manifest
 from app.models import Message
 from app.utils import generate_test_email, send_email
 
@@ -29,3 +42,27 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/metrics/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_metrics() -> dict[str, Any]:
+    """
+    Runtime metrics of background pipelines and caches.
+    """
+    return {
+        "db": db_metrics.stats(),
+        "mqtt": mqtt_logging_stats(),
+        "ecopark_catalog": ecopark_catalog.stats(),
+        "password_hasher": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "rbac": project_rank_cache.stats(),
+        "invalidation_bus": invalidation_bus.stats(),
+        "replicas": replica_router.stats(),
+        "image_renditions": image_renditions.stats(),
+        "static_img": resized_image_cache.stats(),
+        "static_assets": static_manifest.stats(),
+        "file_gc": file_sweeper.stats(),
+    }
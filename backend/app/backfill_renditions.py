@@ -0,0 +1,78 @@
+"""
+Tạo ảnh phái sinh (AVIF/WebP nhiều chiều rộng) cho các ảnh đã có trong thư mục static, ví dụ ảnh
+chi tiết EcoRetreat/CHITIET và ảnh catalog được upload trước khi có pipeline tạo ảnh phái sinh.
+Ảnh đã có manifest được bỏ qua (trừ khi dùng --force); chạy lại an toàn.
+
+Chạy từ thư mục backend:
+
+    python -m app.backfill_renditions
+    python -m app.backfill_renditions EcoRetreat/CHITIET --workers 4 --force
+"""
+
+import argparse
+import logging
+import os
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.renditions import (
+    RENDITIONS_FOLDER,
+    SOURCE_SUFFIXES,
+    STATIC_DIR,
+    manifest_path,
+    render_renditions,
+    supported_formats,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def find_sources(root: Path, force: bool) -> Iterator[Path]:
+    for directory, subdirs, filenames in os.walk(root):
+        # Không tạo ảnh phái sinh từ chính ảnh phái sinh
+        subdirs[:] = [d for d in subdirs if Path(directory, d) != STATIC_DIR / RENDITIONS_FOLDER]
+        for filename in sorted(filenames):
+            source = Path(directory, filename)
+            if source.suffix.lower() not in SOURCE_SUFFIXES:
+                continue
+            if force or not manifest_path(STATIC_DIR, source).exists():
+                yield source
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", default="", help="thư mục con của static (mặc định: toàn bộ)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--force", action="store_true", help="tạo lại cả ảnh đã có manifest")
+    args = parser.parse_args()
+
+    formats = supported_formats(settings.IMAGE_RENDITION_FORMATS)
+    widths = sorted(settings.IMAGE_RENDITION_WIDTHS)
+    sources = list(find_sources(STATIC_DIR / args.folder, args.force))
+    logger.info(f"🖼️ {len(sources)} ảnh cần tạo ảnh phái sinh ({formats} × {widths}), {args.workers} process")
+
+    started = time.monotonic()
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(render_renditions, str(source), str(STATIC_DIR), widths, formats): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"❌ {futures[future]}: {e}")
+            if (done + failed) % 100 == 0:
+                logger.info(f"  {done + failed}/{len(sources)} ảnh")
+    logger.info(f"✅ Xong {done} ảnh, lỗi {failed} ảnh trong {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
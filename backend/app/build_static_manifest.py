@@ -0,0 +1,39 @@
+"""
+Hash nội dung toàn bộ file trong thư mục static (trừ `renditions`, vốn đã đặt tên theo hash) và ghi
+`asset-manifest.json`, để URL ảnh có fingerprint ngay từ request đầu tiên sau khi deploy. Các file văn
+bản (css, js, svg, json...) được nén trước thành `.gz` (và `.br` nếu có gói brotli).
+
+Chạy từ thư mục backend (sau khi thêm/thay file static):
+
+    python -m app.build_static_manifest
+    python -m app.build_static_manifest --no-compress
+"""
+
+import argparse
+import logging
+import time
+
+from app.core.static_assets import MANIFEST_NAME, brotli, static_manifest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-compress", action="store_true", help="không tạo bản nén trước .br/.gz")
+    args = parser.parse_args()
+
+    if brotli is None and not args.no_compress:
+        logger.warning("⚠️ Không có gói brotli: chỉ tạo bản nén .gz")
+    started = time.monotonic()
+    entries = static_manifest.build(compress=not args.no_compress)
+    compressed = sum(1 for entry in entries.values() if entry["encodings"])
+    logger.info(
+        f"✅ {MANIFEST_NAME}: {len(entries)} file, {compressed} file có bản nén trước, "
+        f"{time.monotonic() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
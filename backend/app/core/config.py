@@ -35,6 +35,22 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # bcrypt: cost (đổi giá trị thì hash cũ được băm lại khi đăng nhập) và process pool riêng
+    # cho mỗi worker API; quá PASSWORD_HASH_MAX_CONCURRENCY thì chờ tối đa
+    # PASSWORD_HASH_ADMISSION_TIMEOUT giây rồi trả 503
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+    PASSWORD_HASH_ADMISSION_TIMEOUT: float = 2.0
+    # Bộ nhớ đệm người dùng đã xác thực (bỏ qua truy vấn User ở mỗi request)
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Bộ nhớ đệm rank của user theo từng dự án (RBAC)
+    RBAC_CACHE_TTL: float = 300.0
+    RBAC_CACHE_MAX_ENTRIES: int = 10000
+    # Kênh báo làm mới bộ nhớ đệm giữa các worker/node: "postgres" (LISTEN/NOTIFY) hoặc "local"
+    INVALIDATION_BACKEND: Literal["local", "postgres"] = "postgres"
+    INVALIDATION_CHANNEL: str = "app_invalidation"
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -57,6 +73,25 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
 
+    # Pool kết nối của mỗi worker; statement_timeout áp cho mọi câu lệnh (0: không giới hạn)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_SLOW_QUERY_MS: float = 500.0
+    # Pool riêng của engine async (các route chỉ đọc), dùng chung timeout/recycle/pre-ping ở trên
+    ASYNC_DB_POOL_SIZE: int = 5
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+    # Replica chỉ đọc (tuỳ chọn), vd. "postgresql://app:pw@replica1:5432/app,postgresql://app:pw@replica2:5432/app"
+    POSTGRES_REPLICA_DSNS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    # Replica trễ hơn mức này bị bỏ qua; user vừa ghi đọc từ primary trong REPLICA_STICKY_SECONDS
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 2.0
+    REPLICA_RETRY_AFTER: float = 30.0
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
@@ -69,6 +104,20 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> list[str]:
+        uris = []
+        for dsn in self.POSTGRES_REPLICA_DSNS:
+            dsn = dsn.strip()
+            if not dsn:
+                continue
+            scheme, sep, rest = dsn.partition("://")
+            if scheme in ("postgres", "postgresql"):
+                dsn = f"postgresql+psycopg{sep}{rest}"
+            uris.append(dsn)
+        return uris
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -91,6 +140,76 @@ class Settings(BaseSettings):
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # Kết nối MQTT (chạy nền, tự kết nối lại)
+    MQTT_HOST: str = "scalemodelvn.com"
+    MQTT_PORT: int = 8883
+    MQTT_TLS_CA_FILE: str | None = None
+    MQTT_KEEPALIVE: int = 60
+    MQTT_SUBSCRIBE_TOPIC: str | None = "secure/topic"
+    # Shared subscription: các worker chia nhau tin nhắn thay vì mỗi worker nhận một bản
+    MQTT_SHARED_SUBSCRIPTION_GROUP: str | None = "backend"
+    MQTT_OUTBOUND_QUEUE_SIZE: int = 1000
+    MQTT_RECONNECT_MIN_DELAY: float = 1.0
+    MQTT_RECONNECT_MAX_DELAY: float = 60.0
+    MQTT_PUBLISH_TIMEOUT: float = 5.0
+    # Lệnh bật đèn sa bàn: cửa sổ gộp (giây), gửi chênh lệch bật/tắt, chu kỳ gửi lại toàn bộ.
+    # Chênh lệch tính theo trạng thái đã gửi của từng worker: chỉ bật khi một process publish lệnh đèn
+    MQTT_LIGHT_COALESCE_WINDOW: float = 0.05
+    MQTT_LIGHT_SEND_DELTAS: bool = False
+    MQTT_LIGHT_RESYNC_INTERVAL: float = 300.0
+    # Hàng đợi ghi log MQTT theo lô (Excel / Google Sheet)
+    MQTT_INGEST_QUEUE_SIZE: int = 10000
+    MQTT_INGEST_BATCH_SIZE: int = 500
+    MQTT_INGEST_FLUSH_INTERVAL: float = 2.0
+    # Kho lưu trữ tin nhắn MQTT (mặc định: app/logs/mqtt_store)
+    MQTT_STORE_DIR: str | None = None
+    MQTT_STORE_SEGMENT_MAX_RECORDS: int = 1_000_000
+    MQTT_STORE_SEGMENT_MAX_BYTES: int = 256 * 1024 * 1024
+    MQTT_STORE_MAX_SEGMENTS: int = 64
+    # Các sink export tuỳ chọn, đọc lại từ kho
+    MQTT_EXPORT_EXCEL: bool = True
+    MQTT_EXPORT_GOOGLE_SHEET: bool = True
+    MQTT_EXPORT_BATCH_SIZE: int = 500
+    MQTT_EXPORT_INTERVAL: float = 5.0
+    GOOGLE_SHEETS_API_URL: str = "https://sheets.googleapis.com"
+    GOOGLE_SHEETS_MAX_RETRIES: int = 5
+
+    # Catalog Ecopark trong bộ nhớ: thời gian sống (giây) để các worker khác thấy thay đổi
+    ECOPARK_CATALOG_TTL: float = 30.0
+    # Số hàng mỗi câu lệnh INSERT ... ON CONFLICT khi nhập Excel
+    ECOPARK_IMPORT_CHUNK_SIZE: int = 1000
+    # Job nhập Excel chạy nền (process pool riêng), file upload được lưu tạm ở thư mục chờ
+    ECOPARK_IMPORT_STAGING_DIR: str | None = None
+    ECOPARK_IMPORT_WORKERS: int = 1
+    ECOPARK_IMPORT_BATCH_ROWS: int = 5000
+    ECOPARK_IMPORT_MAX_ERRORS: int = 1000
+    ECOPARK_IMPORT_STALE_AFTER: float = 300.0
+    ECOPARK_IMPORT_MAX_ATTEMPTS: int = 3
+    # Ngưỡng dừng sớm khi nhập Excel (None: không giới hạn); vượt ngưỡng thì không ghi gì
+    ECOPARK_IMPORT_MAX_FAILED_ROWS: int | None = None
+    ECOPARK_IMPORT_MAX_FAILED_RATIO: float | None = None
+    # Lưu ảnh upload: ghi theo khối (byte) trong threadpool, số file xử lý đồng thời mỗi request
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_CONCURRENCY: int = 4
+    # Ảnh phái sinh tạo sau khi upload (process pool riêng): các chiều rộng (px) và định dạng
+    IMAGE_RENDITION_WIDTHS: list[int] = [320, 640, 1280]
+    IMAGE_RENDITION_FORMATS: list[str] = ["avif", "webp"]
+    IMAGE_RENDITION_WORKERS: int = 1
+    # /static-img: ảnh thu nhỏ theo yêu cầu, cache trên đĩa (LRU theo tổng byte của cả thư mục)
+    STATIC_IMG_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    STATIC_IMG_MAX_WIDTH: int = 2560
+    STATIC_IMG_THREADS: int = 2
+    # File bị loại khỏi cache chỉ bị xoá sau chừng này giây (request đang gửi file vẫn đọc được)
+    STATIC_IMG_EVICT_GRACE: float = 60.0
+    # Chu kỳ (giây) đối chiếu chỉ mục với thư mục cache dùng chung, để giới hạn byte áp cho mọi worker
+    STATIC_IMG_RESCAN_INTERVAL: float = 30.0
+    # Đặt khi chạy sau nginx (location internal trỏ tới thư mục cache): nginx gửi file bằng sendfile
+    STATIC_IMG_ACCEL_REDIRECT_PREFIX: str | None = None
+    # Xoá nền file ảnh có tombstone: chu kỳ (giây), số file mỗi lô, thời gian chờ thử lại khi lỗi
+    FILE_GC_INTERVAL: float = 5.0
+    FILE_GC_BATCH_SIZE: int = 500
+    FILE_GC_RETRY_AFTER: float = 60.0
+
     EMAIL_TEST_USER: EmailStr = "test@example.com"
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
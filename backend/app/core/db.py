@@ -1,10 +1,100 @@
+from typing import Any
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.db_metrics import DbMetrics, TimedAsyncQueuePool, TimedQueuePool
+from app.core.invalidation import invalidation_bus
+from app.core.replicas import READ_YOUR_WRITES_TOPIC, ReplicaRouter
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+db_metrics = DbMetrics(slow_query_ms=settings.DB_SLOW_QUERY_MS)
+
+
+def _connect_args(url: str, statement_timeout_ms: int, connect_args: dict[str, Any]) -> dict[str, Any]:
+    if statement_timeout_ms and url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return connect_args
+
+
+def create_db_engine(
+    url: str,
+    *,
+    metrics: DbMetrics = db_metrics,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+    pool_timeout: float = settings.DB_POOL_TIMEOUT,
+    pool_recycle: int = settings.DB_POOL_RECYCLE,
+    pool_pre_ping: bool = settings.DB_POOL_PRE_PING,
+    statement_timeout_ms: int = settings.DB_STATEMENT_TIMEOUT_MS,
+    **kwargs: Any,
+) -> Engine:
+    """
+    Engine với QueuePool có đo thời gian chờ. Mỗi worker có pool riêng: tổng số kết nối tối đa
+    là số worker x (pool_size + max_overflow), cần nhỏ hơn `max_connections` của Postgres.
+    """
+    connect_args = _connect_args(url, statement_timeout_ms, kwargs.pop("connect_args", {}))
+    engine = create_engine(
+        url,
+        poolclass=TimedQueuePool.reporting_to(metrics),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args=connect_args,
+        **kwargs,
+    )
+    metrics.attach(engine)
+    return engine
+
+
+def create_async_db_engine(
+    url: str,
+    *,
+    metrics: DbMetrics = db_metrics,
+    pool_size: int = settings.ASYNC_DB_POOL_SIZE,
+    max_overflow: int = settings.ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout: float = settings.DB_POOL_TIMEOUT,
+    pool_recycle: int = settings.DB_POOL_RECYCLE,
+    pool_pre_ping: bool = settings.DB_POOL_PRE_PING,
+    statement_timeout_ms: int = settings.DB_STATEMENT_TIMEOUT_MS,
+    **kwargs: Any,
+) -> AsyncEngine:
+    """
+    Engine async cho các route chỉ đọc (psycopg 3 dùng chung URL `postgresql+psycopg`).
+    Có pool riêng, cộng thêm vào số kết nối của engine đồng bộ khi tính `max_connections`.
+    """
+    connect_args = _connect_args(url, statement_timeout_ms, kwargs.pop("connect_args", {}))
+    async_engine = create_async_engine(
+        url,
+        poolclass=TimedAsyncQueuePool.reporting_to(metrics),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args=connect_args,
+        **kwargs,
+    )
+    metrics.attach(async_engine.sync_engine)
+    return async_engine
+
+
+engine = create_db_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+async_engine = create_async_db_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+replica_router = ReplicaRouter(
+    async_engine,
+    [create_async_db_engine(uri) for uri in settings.SQLALCHEMY_REPLICA_URIS],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    sticky_for=settings.REPLICA_STICKY_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL,
+    retry_after=settings.REPLICA_RETRY_AFTER,
+)
+invalidation_bus.subscribe(READ_YOUR_WRITES_TOPIC, replica_router.mark_write)
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
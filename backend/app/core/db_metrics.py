@@ -0,0 +1,142 @@
+# app/core/db_metrics.py
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class DbMetrics:
+    """
+    Số liệu của pool kết nối và câu lệnh SQL trong một process:
+    thời gian chờ lấy kết nối (histogram), số lần hết thời gian chờ, kết nối lỗi bị loại,
+    và các câu lệnh chạy lâu hơn `slow_query_ms` (được ghi log).
+    """
+
+    def __init__(self, slow_query_ms: float = 500.0, keep_slow: int = 20) -> None:
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.connects = 0
+        self.invalidations = 0
+        self.statements = 0
+        self.slow_statements = 0
+        self.recent_slow: deque[dict[str, Any]] = deque(maxlen=keep_slow)
+        self._engines: list[Engine] = []
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def record_statement(self, statement: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.statements += 1
+            if elapsed_ms < self.slow_query_ms:
+                return
+            self.slow_statements += 1
+            self.recent_slow.append({"ms": round(elapsed_ms, 1), "statement": statement[:500]})
+        logger.warning(f"🐢 Câu lệnh SQL chậm ({elapsed_ms:.0f}ms): {' '.join(statement.split())[:500]}")
+
+    def attach(self, engine: Engine) -> None:
+        self._engines.append(engine)
+
+        @event.listens_for(engine.pool, "connect")
+        def _connect(dbapi_connection: Any, connection_record: Any) -> None:
+            self.connects += 1
+
+        @event.listens_for(engine.pool, "invalidate")
+        def _invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+            # pre-ping hoặc lỗi kết nối (vd. Postgres khởi động lại): kết nối bị loại và mở lại
+            self.invalidations += 1
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+            started = conn.info["query_started"].pop()
+            self.record_statement(statement, (time.perf_counter() - started) * 1000)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(context: Any) -> None:
+            stack = context.connection.info.get("query_started") if context.connection is not None else None
+            if stack:
+                stack.pop()
+
+    def stats(self) -> dict[str, Any]:
+        pools = []
+        for engine in self._engines:
+            pool = engine.pool
+            pools.append({
+                "url": engine.url.render_as_string(hide_password=True),
+                "status": pool.status(),
+                "size": pool.size() if isinstance(pool, QueuePool) else None,
+                "checked_out": pool.checkedout() if isinstance(pool, QueuePool) else None,
+                "overflow": pool.overflow() if isinstance(pool, QueuePool) else None,
+            })
+        waits = self.checkouts + self.timeouts
+        labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        return {
+            "pools": pools,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait_ms / waits, 3) if waits else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "wait_histogram": dict(zip(labels, self.wait_buckets)),
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "statements": self.statements,
+            "slow_statements": self.slow_statements,
+            "recent_slow": list(self.recent_slow),
+        }
+
+
+class _TimedCheckout:
+    """Đo thời gian chờ lấy kết nối (kể cả khi hết `pool_timeout`) của một QueuePool."""
+
+    metrics: DbMetrics
+
+    @classmethod
+    def reporting_to(cls, metrics: DbMetrics) -> type:
+        # Lớp con riêng: pool.recreate() (sau engine.dispose()) vẫn giữ đúng metrics
+        return type(cls.__name__, (cls,), {"metrics": metrics})
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except PoolTimeoutError:
+            self.metrics.record_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool của engine đồng bộ, có đo thời gian chờ."""
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """Pool của engine async (create_async_engine không nhận QueuePool thường), có đo thời gian chờ."""
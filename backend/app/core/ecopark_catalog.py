@@ -0,0 +1,362 @@
+# app/core/ecopark_catalog.py
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.models import Ecopark
+
+logger = logging.getLogger(__name__)
+
+# Các cột văn bản được tìm kiếm kiểu ILIKE '%...%' từ các route search: có thêm chỉ mục trigram
+TEXT_INDEX_FIELDS = (
+    "zone",
+    "zone_name_vi",
+    "zone_name_en",
+    "building_type_vi",
+    "building_type_en",
+    "amenity",
+    "amenity_type_vi",
+    "amenity_type_en",
+    "building_name",
+    "status_vi",
+    "status_en",
+)
+NGRAM = 3
+
+# Các cột có bản dịch `<field>_vi` / `<field>_en` được đưa về khoá trung tính `<field>`
+TRANSLATED_FIELDS = ("zone_name", "building_type", "amenity_type", "direction", "status")
+FILTER_FIELDS = ("port", "building_name", "picture_name", "zone", "amenity", "bedroom", "price")
+PROJECTION_VARIANTS = ("full", "summary", "filter")
+
+# Các nhóm lọc (facet) của GET /{project_id}/filter_options
+FACETS = ("status", "price", "bedroom", "direction", "building_type", "zone_name", "amenity_type")
+NUMERIC_FACETS = ("price", "bedroom")
+INVALID_FACET_VALUES = {"", " ", "NaN", "nan", "null", "None", "N", "-", "--"}
+
+
+def facet_column(facet: str, lang: str) -> str:
+    return facet if facet in NUMERIC_FACETS else f"{facet}_{lang}"
+
+Positions = set[int]
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _like_matcher(pattern: str) -> Callable[[str], bool]:
+    """Khớp giống Postgres `ILIKE '%pattern%'` (kể cả ký tự đại diện `%`, `_` và escape `\\`)."""
+    if not any(ch in pattern for ch in "%_\\"):
+        needle = pattern.lower()
+        return lambda value: needle in value
+    parts = []
+    chars = iter(pattern)
+    for ch in chars:
+        if ch == "\\":
+            parts.append(re.escape(next(chars, "\\").lower()))
+        elif ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch.lower()))
+    regex = re.compile("".join(parts), re.DOTALL)
+    return lambda value: regex.search(value) is not None
+
+
+class _FieldIndex:
+    """Chỉ mục ngược của một cột: giá trị phân biệt -> vị trí các bản ghi."""
+
+    def __init__(self, records: list[dict[str, Any]], field: str, ngrams: bool) -> None:
+        self.by_value: dict[Any, list[int]] = {}
+        for position, record in enumerate(records):
+            value = record.get(field)
+            if value is not None:
+                self.by_value.setdefault(value, []).append(position)
+
+        # Giá trị phân biệt dạng chữ thường, dùng cho so khớp chuỗi con
+        self.lowered: list[tuple[str, list[int]]] = [
+            (str(value).lower(), positions) for value, positions in self.by_value.items()
+        ]
+        self.by_ngram: dict[str, set[int]] | None = None
+        if ngrams:
+            self.by_ngram = {}
+            for value_id, (text, _) in enumerate(self.lowered):
+                for gram in _ngrams(text):
+                    self.by_ngram.setdefault(gram, set()).add(value_id)
+
+    def equals(self, value: Any) -> Positions:
+        positions = self.by_value.get(value)
+        if positions is None:
+            positions = self.by_value.get(self._coerce(value))
+        return set(positions or ())
+
+    def _coerce(self, value: Any) -> Any:
+        # Giống Postgres: cột số so với chuỗi số ("port" = '5'), cột chuỗi so với số ("zone" = 1)
+        if not isinstance(value, str):
+            return str(value)
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    def ilike(self, pattern: str) -> Positions:
+        candidates: Iterable[int] = range(len(self.lowered))
+        literal = pattern.lower()
+        if self.by_ngram is not None and len(literal) >= NGRAM and not any(ch in literal for ch in "%_\\"):
+            grams = sorted(_ngrams(literal), key=lambda g: len(self.by_ngram.get(g, ())))
+            narrowed = set(self.by_ngram.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not narrowed:
+                    break
+                narrowed &= self.by_ngram.get(gram, set())
+            candidates = narrowed
+
+        matches = _like_matcher(pattern)
+        result: Positions = set()
+        for value_id in candidates:
+            text, positions = self.lowered[value_id]
+            if matches(text):
+                result.update(positions)
+        return result
+
+
+def project_record(record: dict[str, Any], lang: str, variant: str) -> dict[str, Any]:
+    """
+    Dựng dict trả về cho client theo ngôn ngữ:
+    - "full": danh sách `GET /ecopark/` (có `description`)
+    - "summary": các route search (không có `description`)
+    - "filter": `POST /{project_id}/filter` (thiếu bản dịch thì lấy bản tiếng Anh)
+    """
+    if variant == "filter":
+        item = {field: record.get(field) for field in FILTER_FIELDS}
+        for field in (*TRANSLATED_FIELDS, "description"):
+            value = record.get(f"{field}_{lang}")
+            item[field] = value if value is not None else record.get(f"{field}_en")
+        return item
+
+    translated = TRANSLATED_FIELDS + ("description",) if variant == "full" else TRANSLATED_FIELDS
+    item = {key: value for key, value in record.items() if not key.endswith(("_vi", "_en"))}
+    for field in translated:
+        item[field] = record.get(f"{field}_{lang}")
+    return item
+
+
+class CatalogSnapshot:
+    """Ảnh chụp bất biến của bảng Ecopark cùng các chỉ mục, dùng chung giữa các request."""
+
+    def __init__(self, records: list[dict[str, Any]], generation: int) -> None:
+        self.records = records
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self._indexes = {
+            field: _FieldIndex(records, field, ngrams=field in TEXT_INDEX_FIELDS)
+            for field in Ecopark.model_fields
+        }
+        priced = sorted((r["price"], i) for i, r in enumerate(records) if r.get("price") is not None)
+        self._prices = [price for price, _ in priced]
+        self._price_positions = [position for _, position in priced]
+        self._projections: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._facet_values: dict[str, dict[str, list[Any]]] = {}
+        self._memo: dict[Any, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def equals(self, field: str, value: Any) -> Positions:
+        return self._indexes[field].equals(value)
+
+    def ilike(self, field: str, pattern: str) -> Positions:
+        return self._indexes[field].ilike(pattern)
+
+    def price_between(self, min_price: int | None = None, max_price: int | None = None) -> Positions:
+        start = 0 if min_price is None else bisect_left(self._prices, min_price)
+        end = len(self._prices) if max_price is None else bisect_right(self._prices, max_price)
+        return set(self._price_positions[start:end])
+
+    def positions(self, conditions: Iterable[Positions]) -> list[int]:
+        """Giao các tập vị trí (AND), trả về theo thứ tự ban đầu."""
+        selected: Positions | None = None
+        for positions in conditions:
+            selected = positions if selected is None else selected & positions
+            if not selected:
+                return []
+        if selected is None:
+            return list(range(len(self.records)))
+        return sorted(selected)
+
+    def select(self, conditions: Iterable[Positions]) -> list[dict[str, Any]]:
+        return [self.records[i] for i in self.positions(conditions)]
+
+    def projected(self, lang: str, variant: str) -> list[dict[str, Any]]:
+        """
+        Dict trả về đã dịch sẵn cho mọi bản ghi, dựng một lần cho mỗi ảnh chụp.
+        Các dict này dùng chung giữa các request: không sửa trực tiếp, hãy sao chép trước.
+        """
+        key = (lang, variant)
+        projections = self._projections.get(key)
+        if projections is None:
+            projections = [project_record(record, lang, variant) for record in self.records]
+            self._projections[key] = projections
+        return projections
+
+    def memo(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """Lưu kết quả tính từ ảnh chụp này (vd. payload đã serialize); tự mất khi ảnh chụp bị thay."""
+        if key not in self._memo:
+            self._memo[key] = factory()
+        return self._memo[key]
+
+    def facet_values(self, lang: str) -> dict[str, list[Any]]:
+        """Giá trị phân biệt hợp lệ (đã sắp xếp) của mỗi facet, tính một lần cho mỗi ảnh chụp."""
+        values = self._facet_values.get(lang)
+        if values is None:
+            values = {}
+            for facet in FACETS:
+                index = self._indexes[facet_column(facet, lang)]
+                valid = [v for v in index.by_value if str(v).strip() not in INVALID_FACET_VALUES]
+                values[facet] = sorted(valid)
+            self._facet_values[lang] = values
+        return values
+
+    def facet_counts(self, lang: str, active: dict[str, Positions] | None = None) -> dict[str, dict[str, int]]:
+        """
+        Số bản ghi theo từng giá trị facet. Với các bộ lọc đang chọn (`active`), số đếm của một
+        facet áp dụng mọi bộ lọc trừ chính facet đó (kiểu disjunctive), để giao diện vẫn hiển thị
+        được số lượng khi đổi lựa chọn trong cùng một nhóm.
+        """
+        active = active or {}
+        counts: dict[str, dict[str, int]] = {}
+        for facet, values in self.facet_values(lang).items():
+            others = [positions for name, positions in active.items() if name != facet]
+            selected = set(self.positions(others)) if others else None
+            by_value = self._indexes[facet_column(facet, lang)].by_value
+            counts[facet] = {
+                str(value): len(by_value[value]) if selected is None else len(selected.intersection(by_value[value]))
+                for value in values
+            }
+        return counts
+
+    def select_projected(self, conditions: Iterable[Positions], lang: str, variant: str) -> list[dict[str, Any]]:
+        projections = self.projected(lang, variant)
+        return [projections[i] for i in self.positions(conditions)]
+
+
+class EcoparkCatalog:
+    """
+    Bộ nhớ đệm trong process cho bảng Ecopark (nhỏ, ít thay đổi: chỉ qua upload Excel / PATCH).
+
+    Ảnh chụp được dựng lại lười biếng khi bị `invalidate()` (qua `notify_catalog_changed`, phát tới
+    mọi worker) hoặc quá `ttl` giây (phòng khi mất thông báo), và được thay thế nguyên khối:
+    request đang đọc vẫn dùng ảnh cũ.
+    """
+
+    def __init__(self, ttl: float = 30.0) -> None:
+        self.ttl = ttl
+        self._snapshot: CatalogSnapshot | None = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._async_lock: tuple[asyncio.AbstractEventLoop, asyncio.Lock] | None = None
+        self._generation_lock = threading.Lock()
+
+        self.hits = 0
+        self.rebuilds = 0
+        self.invalidations = 0
+        self.last_build_ms = 0.0
+
+    def _is_fresh(self, snapshot: CatalogSnapshot | None) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.generation == self._generation
+            and time.monotonic() - snapshot.built_at < self.ttl
+        )
+
+    def snapshot(self, session: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            # Chỉ một luồng dựng lại, các luồng khác dùng kết quả đó
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            generation = self._generation
+            started = time.monotonic()
+            records = [row.model_dump() for row in session.exec(select(Ecopark)).all()]
+            return self._install(records, generation, started)
+
+    async def snapshot_async(self, session: AsyncSession) -> CatalogSnapshot:
+        """
+        Như `snapshot` cho route async: chờ lần dựng lại đang chạy mà không giữ luồng.
+        `session` phải trên primary (không dùng replica): ảnh chụp được giữ tới lần làm mới sau.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+        async with self._loop_lock():
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            generation = self._generation
+            started = time.monotonic()
+            result = await session.exec(select(Ecopark))
+            records = [row.model_dump() for row in result.all()]
+            # Dựng chỉ mục tốn CPU: chạy ngoài event loop
+            return await asyncio.to_thread(self._install, records, generation, started)
+
+    def _loop_lock(self) -> asyncio.Lock:
+        # asyncio.Lock gắn với một event loop: tạo lại nếu loop đổi (vd. test, TestClient)
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock[0] is not loop:
+            self._async_lock = (loop, asyncio.Lock())
+        return self._async_lock[1]
+
+    def _install(self, records: list[dict[str, Any]], generation: int, started: float) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(records, generation)
+        self._snapshot = snapshot
+        self.rebuilds += 1
+        self.last_build_ms = (time.monotonic() - started) * 1000
+        logger.info(f"✅ Đã dựng lại catalog Ecopark: {len(records)} bản ghi trong {self.last_build_ms:.1f}ms")
+        return snapshot
+
+    def invalidate(self) -> None:
+        # Không chờ lần dựng lại đang chạy: ảnh chụp đó mang generation cũ nên sẽ bị coi là cũ
+        with self._generation_lock:
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "records": len(snapshot) if snapshot else 0,
+            "fresh": self._is_fresh(snapshot),
+            "hits": self.hits,
+            "rebuilds": self.rebuilds,
+            "invalidations": self.invalidations,
+            "last_build_ms": round(self.last_build_ms, 3),
+        }
+
+
+CATALOG_TOPIC = "ecopark_catalog"
+
+ecopark_catalog = EcoparkCatalog(ttl=settings.ECOPARK_CATALOG_TTL)
+invalidation_bus.subscribe(CATALOG_TOPIC, lambda key: ecopark_catalog.invalidate())
+
+
+def notify_catalog_changed() -> None:
+    """Làm mới catalog ở mọi worker (process này được làm mới ngay)."""
+    invalidation_bus.publish(CATALOG_TOPIC)
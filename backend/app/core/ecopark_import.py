@@ -0,0 +1,306 @@
+# app/core/ecopark_import.py
+
+import logging
+import uuid
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+
+from app import crud
+from app.models import EcoparkCreate
+
+logger = logging.getLogger(__name__)
+
+# Các cột nhập từ sheet "ECO PARK" (không gồm id: id chỉ sinh cho bản ghi mới)
+IMPORT_COLUMNS = [name for name in EcoparkCreate.model_fields if name != "id"]
+INT_COLUMNS = ("bedroom", "price")
+TEXT_COLUMNS = [name for name in IMPORT_COLUMNS if name not in ("port", *INT_COLUMNS)]
+
+Row = tuple[int, dict[str, Any]]  # (số hàng trong Excel, dữ liệu bản ghi)
+
+SHEET_NAME = "ECO PARK"
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    processed_count: int = 0
+    failed_count: int = 0
+    errors: list[str] = field(default_factory=list)
+    rows_read: int = 0  # số hàng đã đọc từ file (chỉ dùng khi nhập theo lô)
+    stopped_reason: str | None = None  # dừng sớm do vượt ngưỡng lỗi (không ghi gì vào DB)
+
+    def merge(self, other: "ImportResult") -> None:
+        self.processed_count += other.processed_count
+        self.failed_count += other.failed_count
+        self.rows_read += other.rows_read
+        self.errors.extend(other.errors)
+
+    def as_response(self) -> dict[str, Any]:
+        if self.stopped_reason:
+            return {
+                "message": f"Đã dừng nhập file Excel, không có bản ghi nào được ghi: {self.stopped_reason}",
+                "errors": self.errors,
+                "status": "failed"
+            }
+        if self.failed_count > 0:
+            return {
+                "message": f"Đã xử lý file Excel. Thành công: {self.processed_count}, Thất bại: {self.failed_count}.",
+                "errors": self.errors,
+                "status": "partial_success" if self.processed_count > 0 else "failed"
+            }
+        return {
+            "message": f"Đã xử lý file Excel thành công. Tổng số bản ghi được xử lý: {self.processed_count}.",
+            "status": "success"
+        }
+
+
+def _isna(value: Any) -> bool:
+    return value is None or (not isinstance(value, str) and bool(pd.isna(value)))
+
+
+def _row_error(raw: dict[str, Any], row_number: int) -> str | None:
+    """Chạy lại đúng cách dựng bản ghi cũ cho một hàng lỗi để giữ nguyên thông báo lỗi."""
+    try:
+        data: dict[str, Any] = {name: None if _isna(raw.get(name)) else raw.get(name) for name in TEXT_COLUMNS}
+        for name in INT_COLUMNS:
+            data[name] = int(raw[name]) if name in raw and not _isna(raw.get(name)) else None
+        EcoparkCreate(port=int(raw["port"]), **data)
+    except Exception as e:
+        return f"Hàng {row_number} (Port: {raw.get('port', 'N/A')}): Lỗi - {e}"
+    return None
+
+
+def prepare_rows(df: pd.DataFrame) -> tuple[list[Row], ImportResult]:
+    """
+    Chuẩn hoá và kiểm tra cả DataFrame theo cột (NaN -> None, ép kiểu số), trả về các hàng hợp lệ
+    và kết quả chứa lỗi theo từng hàng (cùng nội dung thông báo như khi xử lý từng hàng).
+    """
+    result = ImportResult()
+    row_numbers = (df.index.to_series() + 2).tolist()  # +2: hàng header và index 0 của pandas
+    raw_port = df["port"]
+    port = pd.to_numeric(raw_port, errors="coerce")
+    port_missing = raw_port.isna()
+    port_invalid = ~port_missing & port.isna()
+
+    columns: dict[str, pd.Series] = {"port": port}
+    invalid = port_missing | port_invalid
+    for name in INT_COLUMNS:
+        if name in df.columns:
+            values = pd.to_numeric(df[name], errors="coerce")
+            invalid |= df[name].notna() & values.isna()
+            columns[name] = values
+    for name in TEXT_COLUMNS:
+        if name in df.columns:
+            values = df[name].astype(object).where(df[name].notna(), None)
+            invalid |= ~values.map(lambda v: v is None or isinstance(v, str))
+            columns[name] = values
+
+    normalized = pd.DataFrame(columns, index=df.index)
+    for name in ("port", *INT_COLUMNS):
+        if name in normalized.columns:
+            # int() cắt phần thập phân như cách cũ
+            normalized[name] = pd.Series(
+                [None if pd.isna(v) else int(v) for v in normalized[name].tolist()],
+                index=normalized.index,
+                dtype=object,
+            )
+    for name in IMPORT_COLUMNS:
+        if name not in normalized.columns:
+            normalized[name] = None
+
+    records = normalized[IMPORT_COLUMNS].to_dict("records")
+    rows: list[Row] = []
+    for position, (row_number, record, is_invalid) in enumerate(zip(row_numbers, records, invalid.tolist())):
+        if not is_invalid:
+            rows.append((row_number, record))
+            continue
+        if port_missing.iat[position]:
+            message = f"Hàng {row_number}: Cột 'port' bị thiếu hoặc giá trị rỗng."
+        elif port_invalid.iat[position]:
+            message = f"Hàng {row_number}: Cột 'port' ('{raw_port.iat[position]}') không phải là số nguyên hợp lệ."
+        else:
+            message = _row_error(df.iloc[position].to_dict(), row_number)
+            if message is None:
+                rows.append((row_number, record))
+                continue
+        result.errors.append(message)
+        result.failed_count += 1
+    return rows, result
+
+
+def upsert_rows(session: Session, rows: list[Row], *, chunk_size: int = 1000) -> ImportResult:
+    """
+    Ghi các hàng bằng `INSERT ... ON CONFLICT (port) DO UPDATE` theo từng khối, trong một transaction.
+    Port trùng trong file: hàng sau ghi đè hàng trước (như khi xử lý tuần tự).
+    Khối nào lỗi ở DB thì ghi lại từng hàng của khối đó (savepoint) để báo lỗi đúng hàng.
+    Không commit: người gọi quyết định.
+    """
+    result = ImportResult(processed_count=len(rows))
+    latest: dict[int, Row] = {}
+    for row_number, record in rows:
+        latest[record["port"]] = (row_number, record)
+    deduped = list(latest.values())
+
+    for start in range(0, len(deduped), chunk_size):
+        chunk = deduped[start:start + chunk_size]
+        records = [{"id": uuid.uuid4(), **record} for _, record in chunk]
+        try:
+            with session.begin_nested():
+                crud.upsert_ecoparks(session=session, ecoparks=records)
+        except SQLAlchemyError:
+            logger.warning(f"Khối {start}-{start + len(chunk)} lỗi, ghi lại từng hàng để xác định hàng lỗi")
+            for (row_number, raw), record in zip(chunk, records):
+                try:
+                    with session.begin_nested():
+                        crud.upsert_ecoparks(session=session, ecoparks=[record])
+                except SQLAlchemyError as e:
+                    result.errors.append(f"Hàng {row_number} (Port: {raw['port']}): Lỗi - {e}")
+                    result.failed_count += 1
+                    result.processed_count -= 1
+    return result
+
+
+def import_ecopark_frame(session: Session, df: pd.DataFrame, *, chunk_size: int = 1000) -> ImportResult:
+    """Nhập toàn bộ sheet "ECO PARK" đã đọc vào DataFrame (cột 'port' bắt buộc) và commit."""
+    rows, result = prepare_rows(df)
+    result.merge(upsert_rows(session, rows, chunk_size=chunk_size))
+    session.commit()
+    return result
+
+
+class ExcelBatchReader:
+    """
+    Đọc sheet "ECO PARK" bằng openpyxl chế độ read-only và trả về từng lô `batch_rows` hàng
+    dưới dạng DataFrame (index = số hàng trong Excel - 2, như `pd.read_excel`).
+    Số hàng giữ trong bộ nhớ chỉ phụ thuộc kích thước lô; riêng bảng shared strings của file
+    (các chuỗi không trùng, vd. mô tả dài) vẫn được openpyxl nạp một lần khi mở.
+
+    Hàng trống ở giữa sheet được giữ lại (báo lỗi thiếu 'port' như trước),
+    các hàng trống ở cuối sheet bị bỏ qua.
+    """
+
+    def __init__(self, source: str | BinaryIO, *, batch_rows: int = 5000, sheet_name: str = SHEET_NAME) -> None:
+        self.batch_rows = batch_rows
+        try:
+            self._wb = load_workbook(source, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFileError(f"Không thể đọc file Excel. Vui lòng kiểm tra định dạng và nội dung: {e}")
+        if sheet_name not in self._wb.sheetnames:
+            self._wb.close()
+            raise ImportFileError(f"Không tìm thấy sheet '{sheet_name}' trong file Excel. Vui lòng kiểm tra tên sheet.")
+        self._ws = self._wb[sheet_name]
+        self._rows = self._ws.iter_rows(values_only=True)
+        self.columns = [
+            name if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(next(self._rows, ()))
+        ]
+        if "port" not in self.columns:
+            self._wb.close()
+            raise ImportFileError(f"Sheet '{sheet_name}' trong file Excel phải chứa cột 'port'.")
+
+    @property
+    def estimated_rows(self) -> int | None:
+        """Số hàng dữ liệu theo thẻ <dimension> của sheet (có thể thiếu hoặc lệch với file do công cụ khác tạo)."""
+        max_row = self._ws.max_row
+        return max(max_row - 1, 0) if max_row else None
+
+    def __enter__(self) -> "ExcelBatchReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._wb.close()
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        width = len(self.columns)
+        batch: list[tuple[Any, ...]] = []
+        blank: list[tuple[Any, ...]] = []  # hàng trống chỉ được giữ khi phía sau còn dữ liệu
+        first_index = 0
+        for values in self._rows:
+            values = tuple(values[:width]) + (None,) * (width - len(values))
+            if all(v is None or v == "" for v in values):
+                blank.append((None,) * width)
+                continue
+            if blank:
+                batch.extend(blank)
+                blank.clear()
+            batch.append(values)
+            if len(batch) >= self.batch_rows:
+                yield self._frame(batch, first_index)
+                first_index += len(batch)
+                batch = []
+        if batch:
+            yield self._frame(batch, first_index)
+
+    def _frame(self, batch: list[tuple[Any, ...]], first_index: int) -> pd.DataFrame:
+        # Chỉ dựng các cột được nhập để DataFrame của lô không giữ các cột thừa
+        keep = [(i, name) for i, name in enumerate(self.columns) if name in IMPORT_COLUMNS]
+        index = pd.RangeIndex(first_index, first_index + len(batch))
+        return pd.DataFrame(
+            {name: pd.Series([row[i] for row in batch], index=index) for i, name in keep},
+            index=index,
+        )
+
+
+def error_limit_reason(
+    result: ImportResult,
+    rows_seen: int,
+    *,
+    max_failed_rows: int | None = None,
+    max_failed_ratio: float | None = None,
+) -> str | None:
+    if max_failed_rows is not None and result.failed_count > max_failed_rows:
+        return f"{result.failed_count} hàng lỗi (tối đa {max_failed_rows})."
+    if max_failed_ratio is not None and rows_seen and result.failed_count / rows_seen > max_failed_ratio:
+        return f"{result.failed_count}/{rows_seen} hàng lỗi, vượt tỉ lệ cho phép {max_failed_ratio:.0%}."
+    return None
+
+
+def import_ecopark_stream(
+    session: Session,
+    reader: ExcelBatchReader,
+    *,
+    chunk_size: int = 1000,
+    max_failed_rows: int | None = None,
+    max_failed_ratio: float | None = None,
+    on_batch: Callable[[int, ImportResult], None] | None = None,
+) -> ImportResult:
+    """
+    Nhập từng lô của `reader` vào DB trong một transaction rồi commit.
+    Vượt ngưỡng lỗi thì dừng ngay, rollback và trả về kết quả có `stopped_reason`.
+    `on_batch(rows_seen, result)` được gọi sau mỗi lô (cập nhật tiến độ, ném lỗi để huỷ).
+    """
+    result = ImportResult()
+    for df in reader:
+        rows, batch_result = prepare_rows(df)
+        result.rows_read += len(df)
+        result.merge(batch_result)
+        reason = error_limit_reason(
+            result, result.rows_read, max_failed_rows=max_failed_rows, max_failed_ratio=max_failed_ratio
+        )
+        if reason is None:
+            result.merge(upsert_rows(session, rows, chunk_size=chunk_size))
+            reason = error_limit_reason(
+                result, result.rows_read, max_failed_rows=max_failed_rows, max_failed_ratio=max_failed_ratio
+            )
+        if reason is not None:
+            session.rollback()
+            logger.warning(f"⚠️ Dừng nhập Excel sau {result.rows_read} hàng: {reason}")
+            result.stopped_reason = reason
+            result.processed_count = 0
+            return result
+        if on_batch is not None:
+            on_batch(result.rows_read, result)
+    session.commit()
+    return result
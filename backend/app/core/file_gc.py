@@ -0,0 +1,209 @@
+# app/core/file_gc.py
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.renditions import MANIFEST_FOLDER, RENDITIONS_FOLDER, STATIC_DIR, manifest_path
+from app.crud import DETAIL_IMAGE_FOLDER
+from app.models import DetalEcoRetreat, FileTombstone, now_vn
+
+logger = logging.getLogger(__name__)
+
+
+class FileSweeper:
+    """
+    Xoá nền các file có tombstone (ghi cùng giao dịch xoá/thay bản ghi), mỗi lần tối đa `batch_size` file.
+
+    - Nhiều worker cùng chạy: mỗi lô khoá các dòng bằng `FOR UPDATE SKIP LOCKED` nên không xoá trùng.
+    - File xoá lỗi được thử lại sau `retry_after` × số lần lỗi giây; tombstone vẫn nằm trong backlog.
+    - Xoá cả manifest ảnh phái sinh của file. Ảnh phái sinh dùng chung theo hash nội dung nên không xoá
+      ở đây; file không còn manifest nào tham chiếu được `reconcile` ghi tombstone (xem `find_orphan_renditions`).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        static_dir: Path = STATIC_DIR,
+        *,
+        batch_size: int = 500,
+        interval: float = 5.0,
+        retry_after: float = 60.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.static_dir = static_dir.resolve()
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retry_after = retry_after
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self.swept = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.backlog: int | None = None
+        self.oldest_age_seconds: float | None = None
+
+    def _remove(self, relative: str) -> None:
+        path = (self.static_dir / relative).resolve()
+        if not path.is_relative_to(self.static_dir):
+            logger.warning(f"⚠️ Bỏ qua tombstone ngoài thư mục static: '{relative}'")
+            return
+        path.unlink(missing_ok=True)
+        manifest_path(self.static_dir, path).unlink(missing_ok=True)
+
+    def sweep_once(self) -> int:
+        """Xoá một lô; trả về số tombstone đã xử lý xong."""
+        started = time.monotonic()
+        now = now_vn()
+        with self.session_factory() as session:
+            tombstones = session.exec(
+                select(FileTombstone)
+                .where(FileTombstone.not_before <= now)
+                .order_by(FileTombstone.created_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            done, failed = [], 0
+            for tombstone in tombstones:
+                try:
+                    self._remove(tombstone.path)
+                    done.append(tombstone.id)
+                except OSError as e:
+                    failed += 1
+                    tombstone.attempts += 1
+                    tombstone.last_error = str(e)[:500]
+                    tombstone.not_before = now + timedelta(seconds=self.retry_after * tombstone.attempts)
+                    session.add(tombstone)
+                    logger.warning(f"⚠️ Không xoá được file '{tombstone.path}' (lần {tombstone.attempts}): {e}")
+            if done:
+                session.execute(delete(FileTombstone).where(FileTombstone.id.in_(done)))
+            session.commit()
+        with self._lock:
+            self.swept += len(done)
+            self.failed += failed
+            self.batches += 1
+            self.busy_seconds += time.monotonic() - started
+        return len(done)
+
+    def measure_backlog(self) -> int:
+        with self.session_factory() as session:
+            count, oldest = session.exec(select(func.count(), func.min(FileTombstone.created_at))).one()
+        now = now_vn()
+        if oldest is not None and oldest.tzinfo is None:  # SQLite không lưu múi giờ
+            now = now.replace(tzinfo=None)
+        self.backlog = count
+        self.oldest_age_seconds = (now - oldest).total_seconds() if oldest is not None else None
+        return count
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                # Dọn liên tục khi còn lô đầy, rồi nghỉ `interval`
+                while self.sweep_once() >= self.batch_size and not self._stop_event.is_set():
+                    pass
+                self.measure_backlog()
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi dọn file: {e}")
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "swept": self.swept,
+            "failed": self.failed,
+            "batches": self.batches,
+            "files_per_second": round(self.swept / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "backlog": self.backlog,
+            "oldest_age_seconds": None if self.oldest_age_seconds is None else round(self.oldest_age_seconds, 1),
+        }
+
+
+def find_orphans(session: Session, static_dir: Path = STATIC_DIR, *, grace: float = 3600.0) -> list[str]:
+    """
+    File trong thư mục ảnh chi tiết không còn bản ghi nào tham chiếu và chưa có tombstone. Bỏ qua file
+    mới hơn `grace` giây: upload đang ghi file trước khi insert bản ghi.
+    """
+    directory = static_dir / DETAIL_IMAGE_FOLDER
+    referenced = set(session.exec(select(DetalEcoRetreat.picture)).all())
+    pending = set(session.exec(select(FileTombstone.path)).all())
+    cutoff = time.time() - grace
+    orphans = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            relative = f"{DETAIL_IMAGE_FOLDER}/{entry.name}"
+            if relative not in pending and entry.stat().st_mtime < cutoff:
+                orphans.append(relative)
+    return sorted(orphans)
+
+
+def find_orphan_renditions(session: Session, static_dir: Path = STATIC_DIR, *, grace: float = 3600.0) -> list[str]:
+    """
+    Manifest ảnh phái sinh mà ảnh gốc không còn, và file trong thư mục ảnh phái sinh không manifest nào
+    (còn lại) tham chiếu. Bỏ qua file mới hơn `grace` giây: ảnh phái sinh được ghi trước manifest.
+    """
+    renditions_dir = static_dir / RENDITIONS_FOLDER
+    manifests_dir = renditions_dir / MANIFEST_FOLDER
+    if not renditions_dir.is_dir():
+        return []
+    pending = set(session.exec(select(FileTombstone.path)).all())
+    cutoff = time.time() - grace
+    orphans, referenced = [], set()
+    for manifest in manifests_dir.rglob("*.json") if manifests_dir.is_dir() else ():
+        source = static_dir / manifest.relative_to(manifests_dir).as_posix().removesuffix(".json")
+        try:
+            if not source.exists() and manifest.stat().st_mtime < cutoff:
+                orphans.append(manifest.relative_to(static_dir).as_posix())
+                continue
+            data = json.loads(manifest.read_text())
+        except (OSError, ValueError):
+            continue
+        for names in data.get("renditions", {}).values():
+            referenced.update(names.values())
+    with os.scandir(renditions_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name not in referenced and entry.stat().st_mtime < cutoff:
+                orphans.append(f"{RENDITIONS_FOLDER}/{entry.name}")
+    return sorted(relative for relative in orphans if relative not in pending)
+
+
+def reconcile(session: Session, static_dir: Path = STATIC_DIR, *, grace: float = 3600.0) -> list[str]:
+    """Ghi tombstone cho các file mồ côi (ảnh chi tiết và ảnh phái sinh) để sweeper xoá."""
+    orphans = find_orphans(session, static_dir, grace=grace) + find_orphan_renditions(session, static_dir, grace=grace)
+    session.add_all(FileTombstone(path=relative) for relative in orphans)
+    session.commit()
+    return orphans
+
+
+file_sweeper = FileSweeper(
+    lambda: Session(engine),
+    batch_size=settings.FILE_GC_BATCH_SIZE,
+    interval=settings.FILE_GC_INTERVAL,
+    retry_after=settings.FILE_GC_RETRY_AFTER,
+)
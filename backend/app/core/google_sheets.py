@@ -0,0 +1,237 @@
+# app/core/google_sheets.py
+
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import Future
+from typing import Any, Protocol
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+DEFAULT_SHEETS_API_URL = "https://sheets.googleapis.com"
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GoogleSheetsError(Exception):
+    def __init__(self, status_code: int, body: str) -> None:
+        super().__init__(f"Google Sheets API trả về {status_code}: {body[:500]}")
+        self.status_code = status_code
+        self.body = body
+
+
+# ---------- Transport ----------
+
+class SheetsTransport(Protocol):
+    def post(self, url: str, *, headers: dict[str, str], json: Any) -> tuple[int, dict[str, str], bytes]:
+        ...
+
+
+class HttpxTransport:
+    """Transport mặc định: một httpx.Client dùng chung (giữ kết nối keep-alive)."""
+
+    def __init__(self, timeout: float = 30.0) -> None:
+        self._client = httpx.Client(timeout=timeout)
+
+    def post(self, url: str, *, headers: dict[str, str], json: Any) -> tuple[int, dict[str, str], bytes]:
+        response = self._client.post(url, headers=headers, json=json)
+        return response.status_code, dict(response.headers), response.content
+
+
+# ---------- Token ----------
+
+class TokenProvider(Protocol):
+    def token(self, force_refresh: bool = False) -> str:
+        ...
+
+
+class StaticTokenProvider:
+    def __init__(self, token: str) -> None:
+        self._token = token
+
+    def token(self, force_refresh: bool = False) -> str:
+        return self._token
+
+
+class ServiceAccountTokenProvider:
+    """
+    Đọc file service account một lần duy nhất và chỉ lấy access token mới khi token hết hạn.
+    """
+
+    def __init__(self, credentials_file: str, scopes: Sequence[str] = SHEETS_SCOPES) -> None:
+        self.credentials_file = credentials_file
+        self.scopes = list(scopes)
+        self.refreshes = 0
+        self._credentials: Any = None
+        self._auth_request: Any = None
+        self._lock = threading.Lock()
+
+    def token(self, force_refresh: bool = False) -> str:
+        from google.auth.transport.requests import Request as AuthRequest
+        from google.oauth2 import service_account
+
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.credentials_file, scopes=self.scopes
+                )
+                self._auth_request = AuthRequest()
+            if force_refresh or not self._credentials.valid:
+                self._credentials.refresh(self._auth_request)
+                self.refreshes += 1
+            return str(self._credentials.token)
+
+
+# ---------- Sink ----------
+
+class _PendingAppend:
+    def __init__(self, rows: list[list[Any]]) -> None:
+        self.rows = rows
+        self.future: Future[dict[str, Any]] = Future()
+
+
+class GoogleSheetsSink:
+    """
+    Sink ghi dữ liệu vào Google Sheet dùng chung cho cả process.
+
+    - Client HTTP và token được tạo một lần, token chỉ làm mới khi hết hạn (hoặc bị 401).
+    - Lỗi 429/5xx và lỗi mạng được thử lại với backoff lũy thừa có jitter (tôn trọng Retry-After).
+    - Các lời gọi `append_rows` đồng thời được gộp: trong lúc một lần append đang chạy,
+      các dòng mới chờ sẵn sẽ được gửi chung trong một lần `values:append` kế tiếp.
+    """
+
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        range_: str = "Sheet1!A1",
+        *,
+        token_provider: TokenProvider,
+        transport: SheetsTransport | None = None,
+        base_url: str = DEFAULT_SHEETS_API_URL,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ) -> None:
+        self.spreadsheet_id = spreadsheet_id
+        self.range = range_
+        self.token_provider = token_provider
+        self.transport = transport
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._pending: list[_PendingAppend] = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.appends = 0
+        self.rows_appended = 0
+        self.coalesced_calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_latency_ms = 0.0
+
+    @property
+    def url(self) -> str:
+        return (
+            f"{self.base_url}/v4/spreadsheets/{self.spreadsheet_id}/values/"
+            f"{quote(self.range, safe='')}:append?valueInputOption=RAW&insertDataOption=INSERT_ROWS"
+        )
+
+    def _get_transport(self) -> SheetsTransport:
+        if self.transport is None:
+            self.transport = HttpxTransport()
+        return self.transport
+
+    def append_rows(self, rows: Sequence[Sequence[Any]]) -> dict[str, Any]:
+        """Ghi các dòng vào sheet; chặn cho tới khi lần append chứa các dòng này hoàn tất."""
+        entry = _PendingAppend([list(row) for row in rows])
+        with self._pending_lock:
+            self._pending.append(entry)
+        with self._flush_lock:
+            if not entry.future.done():
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                values = [row for pending in batch for row in pending.rows]
+                try:
+                    result = self._append_with_retry(values)
+                except Exception as e:
+                    for pending in batch:
+                        pending.future.set_exception(e)
+                else:
+                    with self._stats_lock:
+                        self.coalesced_calls += len(batch) - 1
+                    for pending in batch:
+                        pending.future.set_result(result)
+        return entry.future.result()
+
+    def _backoff(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter: ngẫu nhiên trong [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _append_with_retry(self, values: list[list[Any]]) -> dict[str, Any]:
+        transport = self._get_transport()
+        force_refresh = False
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            headers = {"Authorization": f"Bearer {self.token_provider.token(force_refresh=force_refresh)}"}
+            force_refresh = False
+            retry_after: str | None = None
+            try:
+                status_code, response_headers, body = transport.post(
+                    self.url, headers=headers, json={"values": values}
+                )
+            except httpx.TransportError as e:
+                status_code, body = 0, str(e).encode()
+            else:
+                if 200 <= status_code < 300:
+                    with self._stats_lock:
+                        self.appends += 1
+                        self.rows_appended += len(values)
+                        self.last_latency_ms = (time.monotonic() - started) * 1000
+                    return json.loads(body) if body else {}
+                retry_after = {k.lower(): v for k, v in response_headers.items()}.get("retry-after")
+
+            retryable = status_code == 0 or status_code in RETRYABLE_STATUSES
+            if status_code == 401 and attempt == 0:
+                # Token có thể đã bị thu hồi: làm mới và thử lại một lần
+                force_refresh = retryable = True
+            if not retryable or attempt >= self.max_retries:
+                with self._stats_lock:
+                    self.failures += 1
+                raise GoogleSheetsError(status_code, body.decode(errors="replace"))
+
+            delay = 0.0 if force_refresh else self._backoff(attempt, retry_after)
+            attempt += 1
+            with self._stats_lock:
+                self.retries += 1
+            logger.warning(
+                f"⚠️ Google Sheets append lỗi {status_code}, thử lại lần {attempt} sau {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "appends": self.appends,
+                "rows_appended": self.rows_appended,
+                "coalesced_calls": self.coalesced_calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "token_refreshes": getattr(self.token_provider, "refreshes", 0),
+                "last_latency_ms": round(self.last_latency_ms, 3),
+            }
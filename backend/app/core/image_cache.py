@@ -0,0 +1,235 @@
+# app/core/image_cache.py
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, UnidentifiedImageError, features
+
+from app.core.config import settings
+from app.core.renditions import SOURCE_SUFFIXES, STATIC_DIR, normalize, resize_to_width, save_image
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / "cache" / "static-img"
+RESIZE_FORMATS = {"jpeg", "png"} | {fmt for fmt in ("avif", "webp") if features.check(fmt)}
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def _render(source: Path, target: Path, width: int, fmt: str) -> int:
+    try:
+        with Image.open(source) as opened:
+            save_image(resize_to_width(normalize(opened), width), target, fmt)
+    except UnidentifiedImageError as e:
+        raise InvalidImageError(f"Không đọc được ảnh '{source.name}'") from e
+    return target.stat().st_size
+
+
+class ResizedImageCache:
+    """
+    Ảnh thu nhỏ theo yêu cầu (`/static-img/{path}?w=&fmt=`) của các ảnh trong thư mục static, lưu trên
+    đĩa trong một LRU giới hạn `max_bytes` byte.
+
+    - Khoá gồm đường dẫn, mtime/kích thước ảnh gốc, chiều rộng và định dạng: thay ảnh gốc thì tự tạo lại.
+    - Nhiều request cùng một ảnh chưa có chỉ tạo một lần (singleflight trong event loop của worker);
+      việc giải mã/mã hoá chạy trong `threads` luồng (Pillow nhả GIL khi xử lý ảnh).
+    - Mỗi worker giữ chỉ mục LRU riêng trên cùng thư mục; file bị worker khác xoá khi dọn cache được coi
+      là chưa có và tạo lại. Giới hạn `max_bytes` áp cho cả thư mục: khi vượt (theo chỉ mục của worker),
+      hoặc sau mỗi `rescan_interval` giây, chỉ mục được đối chiếu lại với thư mục để tính cả file do các
+      worker khác tạo.
+    - File bị loại khỏi LRU chỉ bị xoá sau `evict_grace` giây: request vừa nhận đường dẫn từ `get()`
+      (ở worker này hoặc worker khác) vẫn kịp gửi file.
+    """
+
+    def __init__(
+        self,
+        source_dir: Path = STATIC_DIR,
+        cache_dir: Path = CACHE_DIR,
+        *,
+        max_bytes: int,
+        threads: int = 2,
+        evict_grace: float = 60.0,
+        rescan_interval: float = 30.0,
+    ) -> None:
+        self.source_dir = source_dir.resolve()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="static-img")
+        self._index: OrderedDict[str, int] | None = None
+        self._bytes = 0
+        self._inflight: dict[str, asyncio.Task[Path]] = {}
+        self.evict_grace = evict_grace
+        # File đã loại khỏi LRU, chờ xoá: tên -> thời điểm được xoá (theo thứ tự loại)
+        self._evicted: dict[str, float] = {}
+        self.rescan_interval = rescan_interval
+        self._scanned_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.renders = 0
+        self.errors = 0
+        self.evictions = 0
+        self.rescans = 0
+        self.total_render_ms = 0.0
+        self.max_render_ms = 0.0
+
+    def _source(self, path: str) -> tuple[Path, os.stat_result]:
+        source = (self.source_dir / path).resolve()
+        if not source.is_relative_to(self.source_dir) or source.suffix.lower() not in SOURCE_SUFFIXES:
+            raise FileNotFoundError(path)
+        return source, source.stat()
+
+    def _cache_path(self, key: str, fmt: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.{fmt}"
+
+    def _load_index(self) -> OrderedDict[str, int]:
+        """Nạp các file đã có, cũ nhất (theo lần truy cập/ghi) trước."""
+        entries = []
+        for entry in self.cache_dir.glob("*/*.*"):
+            if entry.name.endswith(".part"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), entry.relative_to(self.cache_dir).as_posix(), stat.st_size))
+        entries.sort()
+        return OrderedDict((name, size) for _, name, size in entries)
+
+    async def get(self, path: str, width: int, fmt: str) -> Path:
+        """Đường dẫn file ảnh `path` thu về chiều rộng `width` (không phóng to), định dạng `fmt`."""
+        if fmt not in RESIZE_FORMATS:
+            raise InvalidImageError(f"Định dạng '{fmt}' không được hỗ trợ")
+        loop = asyncio.get_running_loop()
+        if self._index is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            index = await loop.run_in_executor(self._executor, self._load_index)
+            if self._index is None:
+                self._index, self._bytes = index, sum(index.values())
+                self._scanned_at = time.monotonic()
+        source, stat = await loop.run_in_executor(self._executor, self._source, path)
+        key = hashlib.sha256(
+            f"{source.relative_to(self.source_dir).as_posix()}|{stat.st_mtime_ns}|{stat.st_size}|{width}|{fmt}".encode()
+        ).hexdigest()
+        target = self._cache_path(key, fmt)
+        name = target.relative_to(self.cache_dir).as_posix()
+
+        if name in self._index and target.exists():
+            self.hits += 1
+            self._index.move_to_end(name)
+            return target
+
+        task = self._inflight.get(name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._render(source, target, name, width, fmt))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        else:
+            self.collapsed += 1
+        # shield: client ngắt kết nối không huỷ lần tạo ảnh mà các request khác đang chờ
+        return await asyncio.shield(task)
+
+    async def _render(self, source: Path, target: Path, name: str, width: int, fmt: str) -> Path:
+        started = time.monotonic()
+        target.parent.mkdir(exist_ok=True)
+        try:
+            size = await asyncio.get_running_loop().run_in_executor(self._executor, _render, source, target, width, fmt)
+        except Exception:
+            self.errors += 1
+            raise
+        render_ms = (time.monotonic() - started) * 1000
+        self.renders += 1
+        self.total_render_ms += render_ms
+        self.max_render_ms = max(self.max_render_ms, render_ms)
+
+        assert self._index is not None
+        self._bytes += size - self._index.pop(name, 0)
+        self._index[name] = size
+        self._evicted.pop(name, None)
+        now = time.monotonic()
+        if self._bytes > self.max_bytes or now - self._scanned_at >= self.rescan_interval:
+            await self._rescan()
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            victim, victim_size = self._index.popitem(last=False)
+            self._bytes -= victim_size
+            self._evicted.pop(victim, None)
+            self._evicted[victim] = now + self.evict_grace
+            self.evictions += 1
+        due = []
+        for victim, deadline in self._evicted.items():
+            if deadline > now:
+                break
+            due.append(victim)
+        for victim in due:
+            del self._evicted[victim]
+        if due:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, _unlink_all, [self.cache_dir / victim for victim in due]
+            )
+        return target
+
+    async def _rescan(self) -> None:
+        """
+        Đối chiếu chỉ mục với thư mục cache (dùng chung giữa các worker). File worker khác tạo được thêm
+        vào đầu LRU (theo thời gian ghi), file đã bị xoá được bỏ khỏi chỉ mục.
+        """
+        assert self._index is not None
+        known = set(self._index)
+        self._scanned_at = time.monotonic()
+        scanned = await asyncio.get_running_loop().run_in_executor(self._executor, self._load_index)
+        index: OrderedDict[str, int] = OrderedDict(
+            (name, size) for name, size in scanned.items() if name not in self._index and name not in self._evicted
+        )
+        for name, size in self._index.items():
+            # File vừa tạo trong lúc quét vẫn giữ; file có trong chỉ mục từ trước mà không còn trên đĩa thì bỏ
+            if name in scanned or name not in known:
+                index[name] = size
+        self._index, self._bytes = index, sum(index.values())
+        self.rescans += 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.collapsed
+        return {
+            "files": len(self._index or ()),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "renders": self.renders,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "pending_unlink": len(self._evicted),
+            "rescans": self.rescans,
+            "in_flight": len(self._inflight),
+            "avg_render_ms": round(self.total_render_ms / self.renders, 3) if self.renders else 0.0,
+            "max_render_ms": round(self.max_render_ms, 3),
+        }
+
+
+def _unlink_all(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+resized_image_cache = ResizedImageCache(
+    max_bytes=settings.STATIC_IMG_CACHE_MAX_BYTES,
+    threads=settings.STATIC_IMG_THREADS,
+    evict_grace=settings.STATIC_IMG_EVICT_GRACE,
+    rescan_interval=settings.STATIC_IMG_RESCAN_INTERVAL,
+)
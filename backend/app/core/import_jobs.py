@@ -0,0 +1,365 @@
+# app/core/import_jobs.py
+
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+from typing import Any, BinaryIO
+
+from sqlalchemy import func, update
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.ecopark_import import ExcelBatchReader, ImportFileError, ImportResult, import_ecopark_stream
+from app.models import EcoparkImportJob, EcoparkImportJobPublic, ImportJobStatus, now_vn
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # trỏ tới app/
+STAGING_DIR = settings.ECOPARK_IMPORT_STAGING_DIR or os.path.join(BASE_DIR, "imports")
+TERMINAL_STATUSES = (ImportJobStatus.succeeded, ImportJobStatus.failed, ImportJobStatus.cancelled)
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+# ---------- Phía API ----------
+
+def stage_upload(file: BinaryIO) -> str:
+    """Lưu file upload vào thư mục chờ xử lý (dùng chung giữa các worker)."""
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    path = os.path.join(STAGING_DIR, f"{uuid.uuid4()}.xlsx")
+    with open(path + ".part", "wb") as out:
+        shutil.copyfileobj(file, out, length=1024 * 1024)
+    os.replace(path + ".part", path)
+    return path
+
+
+def validate_workbook(path: str) -> None:
+    """Kiểm tra nhanh sheet và cột 'port' (chỉ đọc dòng tiêu đề) để báo lỗi ngay khi upload."""
+    with ExcelBatchReader(path):
+        pass
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+# Luồng kiểm tra định kỳ job chết (xem `start_stale_job_watch`)
+_watch_stop = threading.Event()
+_watch_thread: threading.Thread | None = None
+# Job đã gửi vào pool của worker này và chưa xong: watcher không gửi lại
+_pending_jobs: set[uuid.UUID] = set()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: process con không thừa hưởng engine/kết nối DB và các luồng nền của worker API
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.ECOPARK_IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def submit_job(job_id: uuid.UUID) -> Future[str]:
+    future = _get_executor().submit(run_import_job, str(job_id))
+    _pending_jobs.add(job_id)
+    future.add_done_callback(lambda done: _pending_jobs.discard(job_id))
+    future.add_done_callback(_on_job_done)
+    return future
+
+
+def _on_job_done(future: Future[str]) -> None:
+    from app.core.ecopark_catalog import notify_catalog_changed
+
+    # Process con không chạm được vào catalog của worker này: làm mới sau mỗi job
+    notify_catalog_changed()
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error(f"❌ Process nhập Excel lỗi: {error}")
+
+
+def shutdown_import_workers() -> None:
+    global _executor, _watch_thread
+    _watch_stop.set()
+    if _watch_thread is not None:
+        _watch_thread.join(timeout=5)
+        _watch_thread = None
+    with _executor_lock:
+        if _executor is not None:
+            # Job đang chạy dở sẽ được tiếp tục ở lần khởi động sau (recover_import_jobs)
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def requeue_stale_jobs(session: Session) -> list[uuid.UUID]:
+    """
+    Job "running" không còn heartbeat quá `ECOPARK_IMPORT_STALE_AFTER` giây (process đã chết) được đưa
+    lại về "queued" (hoặc "failed" nếu đã thử quá số lần cho phép). Trả về các job vừa đưa về hàng đợi;
+    nhiều worker cùng chạy chỉ một worker đổi được trạng thái mỗi job.
+    """
+    stale_before = now_vn() - timedelta(seconds=settings.ECOPARK_IMPORT_STALE_AFTER)
+    stale = session.exec(
+        select(EcoparkImportJob).where(
+            EcoparkImportJob.status == ImportJobStatus.running,
+            col(EcoparkImportJob.heartbeat_at) < stale_before,
+        )
+    ).all()
+    requeued = []
+    for job in stale:
+        if job.attempts >= settings.ECOPARK_IMPORT_MAX_ATTEMPTS:
+            values: dict[str, Any] = {
+                "status": ImportJobStatus.failed,
+                "message": f"Dừng sau {job.attempts} lần thử do process xử lý bị dừng đột ngột.",
+                "finished_at": now_vn(),
+            }
+        else:
+            values = {
+                "status": ImportJobStatus.queued,
+                "processed_rows": 0,
+                "failed_rows": 0,
+                "errors": [],
+                "heartbeat_at": now_vn(),  # thời điểm vào lại hàng đợi, xem `resubmit_stale_queued_jobs`
+            }
+        result = session.exec(
+            update(EcoparkImportJob)
+            .where(EcoparkImportJob.id == job.id, EcoparkImportJob.status == ImportJobStatus.running)
+            .values(**values)
+        )
+        if result.rowcount and values["status"] == ImportJobStatus.queued:
+            requeued.append(job.id)
+    session.commit()
+    return requeued
+
+
+def resubmit_stale_queued_jobs(session: Session) -> list[uuid.UUID]:
+    """
+    Job "queued" chờ quá `ECOPARK_IMPORT_STALE_AFTER` giây mà không nằm trong pool của worker này, vd.
+    worker chết giữa lúc commit job và `submit_job`. Trả về các job cần gửi lại; `heartbeat_at` được
+    đặt lại để các worker khác không gửi trùng trong chu kỳ này (gửi trùng vẫn an toàn, xem `_claim`).
+    """
+    stale_before = now_vn() - timedelta(seconds=settings.ECOPARK_IMPORT_STALE_AFTER)
+    waiting_since = func.coalesce(EcoparkImportJob.heartbeat_at, EcoparkImportJob.created_at)
+    candidates = session.exec(
+        select(EcoparkImportJob.id)
+        .where(EcoparkImportJob.status == ImportJobStatus.queued, waiting_since < stale_before)
+        .order_by(EcoparkImportJob.created_at)
+    ).all()
+    resubmit = []
+    for job_id in candidates:
+        if job_id in _pending_jobs:
+            continue
+        result = session.exec(
+            update(EcoparkImportJob)
+            .where(
+                EcoparkImportJob.id == job_id,
+                EcoparkImportJob.status == ImportJobStatus.queued,
+                waiting_since < stale_before,
+            )
+            .values(heartbeat_at=now_vn())
+        )
+        if result.rowcount:
+            resubmit.append(job_id)
+    session.commit()
+    return resubmit
+
+
+def recover_import_jobs(session: Session) -> int:
+    """
+    Khi khởi động: đưa các job chết về hàng đợi (`requeue_stale_jobs`) rồi gửi mọi job "queued" vào pool.
+    Chạy ở mọi worker là an toàn: mỗi job chỉ được một process nhận (xem `_claim`).
+    """
+    requeue_stale_jobs(session)
+    queued = session.exec(
+        select(EcoparkImportJob.id)
+        .where(EcoparkImportJob.status == ImportJobStatus.queued)
+        .order_by(EcoparkImportJob.created_at)
+    ).all()
+    for job_id in queued:
+        submit_job(job_id)
+    if queued:
+        logger.info(f"🔁 Gửi lại {len(queued)} job nhập Excel đang chờ")
+    return len(queued)
+
+
+def _watch_stale_jobs(session_factory: Callable[[], Session], interval: float) -> None:
+    while not _watch_stop.wait(interval):
+        try:
+            with session_factory() as session:
+                requeued = requeue_stale_jobs(session)
+                lost = resubmit_stale_queued_jobs(session)
+            for job_id in requeued + lost:
+                submit_job(job_id)
+            if requeued or lost:
+                logger.info(f"🔁 Gửi lại {len(requeued)} job nhập Excel bị dừng giữa chừng, {len(lost)} job chờ quá lâu")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi kiểm tra job nhập Excel bị treo: {e}")
+
+
+def start_stale_job_watch(session_factory: Callable[[], Session]) -> None:
+    """
+    Kiểm tra định kỳ (mỗi `ECOPARK_IMPORT_STALE_AFTER / 2` giây) các job chết sau khi khởi động: job bị
+    dừng lúc deploy vẫn còn heartbeat mới khi worker mới lên, nên lần kiểm tra lúc khởi động bỏ sót;
+    job "queued" bị mất lệnh gửi vào pool cũng được gửi lại.
+    """
+    global _watch_thread
+    if _watch_thread and _watch_thread.is_alive():
+        return
+    _watch_stop.clear()
+    _watch_thread = threading.Thread(
+        target=_watch_stale_jobs,
+        args=(session_factory, settings.ECOPARK_IMPORT_STALE_AFTER / 2),
+        name="import-job-watch",
+        daemon=True,
+    )
+    _watch_thread.start()
+
+
+def request_cancel(session: Session, job: EcoparkImportJob) -> EcoparkImportJob:
+    if job.status == ImportJobStatus.queued:
+        session.exec(
+            update(EcoparkImportJob)
+            .where(EcoparkImportJob.id == job.id, EcoparkImportJob.status == ImportJobStatus.queued)
+            .values(status=ImportJobStatus.cancelled, cancel_requested=True, finished_at=now_vn())
+        )
+    elif job.status == ImportJobStatus.running:
+        # Process xử lý kiểm tra cờ này giữa các lô và rollback toàn bộ
+        session.exec(
+            update(EcoparkImportJob).where(EcoparkImportJob.id == job.id).values(cancel_requested=True)
+        )
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def job_public(job: EcoparkImportJob) -> EcoparkImportJobPublic:
+    public = EcoparkImportJobPublic.model_validate(job)
+    if job.started_at and job.processed_rows:
+        elapsed = ((job.finished_at or now_vn()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            public.rows_per_second = round(job.processed_rows / elapsed, 1)
+            if job.status == ImportJobStatus.running and job.total_rows is not None:
+                remaining = max(job.total_rows - job.processed_rows, 0)
+                public.eta_seconds = round(remaining / public.rows_per_second, 1)
+    return public
+
+
+# ---------- Phía process xử lý ----------
+
+def _update_job(job_id: str, **values: Any) -> None:
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        session.exec(update(EcoparkImportJob).where(EcoparkImportJob.id == uuid.UUID(job_id)).values(**values))
+        session.commit()
+
+
+def _claim(job_id: str) -> EcoparkImportJob | None:
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        now = now_vn()
+        claimed = session.exec(
+            update(EcoparkImportJob)
+            .where(EcoparkImportJob.id == uuid.UUID(job_id), EcoparkImportJob.status == ImportJobStatus.queued)
+            .values(
+                status=ImportJobStatus.running,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=EcoparkImportJob.attempts + 1,
+            )
+        )
+        session.commit()
+        if claimed.rowcount == 0:
+            return None
+        return session.get(EcoparkImportJob, uuid.UUID(job_id))
+
+
+def _cancel_requested(job_id: str) -> bool:
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        return bool(session.exec(
+            select(EcoparkImportJob.cancel_requested).where(EcoparkImportJob.id == uuid.UUID(job_id))
+        ).one())
+
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    interval = max(1.0, settings.ECOPARK_IMPORT_STALE_AFTER / 4)
+    while not stop.wait(interval):
+        try:
+            _update_job(job_id, heartbeat_at=now_vn())
+        except Exception as e:
+            logger.warning(f"⚠️ Không cập nhật được heartbeat job {job_id}: {e}")
+
+
+def _finish(job_id: str, status: ImportJobStatus, staged_path: str, **values: Any) -> None:
+    _update_job(job_id, status=status, finished_at=now_vn(), **values)
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+
+def run_import_job(job_id: str) -> str:
+    """Chạy trong process con: đọc file đã lưu theo lô, nhập trong một transaction, cập nhật tiến độ."""
+    from app.core.db import engine
+
+    job = _claim(job_id)
+    if job is None:
+        return "skipped"
+
+    def on_batch(rows_seen: int, result: ImportResult) -> None:
+        _update_job(job_id, processed_rows=rows_seen, failed_rows=result.failed_count, heartbeat_at=now_vn())
+        if _cancel_requested(job_id):
+            raise ImportCancelled()
+
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop_heartbeat), daemon=True).start()
+    try:
+        with ExcelBatchReader(job.staged_path, batch_rows=settings.ECOPARK_IMPORT_BATCH_ROWS) as reader:
+            _update_job(job_id, total_rows=reader.estimated_rows)
+            with Session(engine) as session:
+                # Lỗi/huỷ giữa chừng: đóng session là rollback toàn bộ các lô đã ghi
+                result = import_ecopark_stream(
+                    session,
+                    reader,
+                    chunk_size=settings.ECOPARK_IMPORT_CHUNK_SIZE,
+                    max_failed_rows=settings.ECOPARK_IMPORT_MAX_FAILED_ROWS,
+                    max_failed_ratio=settings.ECOPARK_IMPORT_MAX_FAILED_RATIO,
+                    on_batch=on_batch,
+                )
+
+        response = result.as_response()
+        status = ImportJobStatus.failed if response["status"] == "failed" else ImportJobStatus.succeeded
+        _finish(
+            job_id, status, job.staged_path,
+            processed_rows=result.rows_read,
+            imported_rows=result.processed_count,
+            failed_rows=result.failed_count,
+            errors=result.errors[:settings.ECOPARK_IMPORT_MAX_ERRORS],
+            message=response["message"],
+            **({} if result.stopped_reason else {"total_rows": result.rows_read}),
+        )
+        return status.value
+    except ImportCancelled:
+        _finish(job_id, ImportJobStatus.cancelled, job.staged_path, message="Đã huỷ, không có bản ghi nào được ghi.")
+        return ImportJobStatus.cancelled.value
+    except ImportFileError as e:
+        _finish(job_id, ImportJobStatus.failed, job.staged_path, message=str(e))
+        return ImportJobStatus.failed.value
+    except Exception as e:
+        logger.exception(f"❌ Job nhập Excel {job_id} lỗi")
+        _finish(job_id, ImportJobStatus.failed, job.staged_path, message=f"Lỗi khi nhập dữ liệu: {e}")
+        return ImportJobStatus.failed.value
+    finally:
+        stop_heartbeat.set()
@@ -0,0 +1,198 @@
+# app/core/invalidation.py
+
+import json
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], None]  # nhận khoá bị thay đổi ("*": xoá toàn bộ)
+
+ALL_KEYS = "*"
+
+
+class InvalidationBus:
+    """
+    Kênh phát thông báo "dữ liệu đã đổi" cho các bộ nhớ đệm trong process.
+
+    `publish(topic, key)` gọi ngay các handler trong process này rồi phát sang các worker/node
+    khác (tuỳ lớp con). Handler phải nhẹ và idempotent: một thông báo có thể tới nhiều lần.
+    Lớp gốc chỉ phát trong process (dùng cho test / chạy một worker).
+    """
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self.published = 0
+        self.received = 0
+        self.broadcast_errors = 0
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic].append(handler)
+
+    def publish(self, topic: str, key: str = ALL_KEYS) -> None:
+        self.published += 1
+        self._dispatch(topic, key)
+        try:
+            self._broadcast(topic, key)
+        except Exception as e:
+            # Bộ nhớ đệm ở worker khác vẫn hết hạn theo TTL
+            self.broadcast_errors += 1
+            logger.warning(f"⚠️ Không phát được thông báo làm mới {topic}:{key}: {e}")
+
+    def _dispatch(self, topic: str, key: str) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi xử lý thông báo làm mới {topic}:{key}: {e}")
+
+    def _dispatch_all(self) -> None:
+        for topic in list(self._handlers):
+            self._dispatch(topic, ALL_KEYS)
+
+    def _broadcast(self, topic: str, key: str) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "received": self.received,
+            "broadcast_errors": self.broadcast_errors,
+        }
+
+
+class InProcessInvalidationBus(InvalidationBus):
+    pass
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    Phát qua Postgres `NOTIFY`: mọi worker (và mọi node dùng chung DB) `LISTEN` cùng một kênh.
+    Luồng nghe tự kết nối lại; sau khi kết nối lại thì xoá toàn bộ bộ nhớ đệm vì có thể đã lỡ thông báo.
+    """
+
+    def __init__(self, conninfo: str, channel: str = "app_invalidation", reconnect_delay: float = 2.0) -> None:
+        super().__init__()
+        self.conninfo = conninfo
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.origin = uuid.uuid4().hex
+        self._publisher: Any = None
+        self._publisher_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener: threading.Thread | None = None
+        self.reconnects = 0
+
+    def _connect(self) -> Any:
+        import psycopg
+
+        return psycopg.connect(self.conninfo, autocommit=True)
+
+    def _broadcast(self, topic: str, key: str) -> None:
+        payload = json.dumps({"origin": self.origin, "topic": topic, "key": key})
+        with self._publisher_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.closed:
+                        self._publisher = self._connect()
+                    self._publisher.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except Exception:
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen_forever, name="invalidation-listener", daemon=True)
+        self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+        with self._publisher_lock:
+            if self._publisher is not None:
+                self._publisher.close()
+                self._publisher = None
+
+    def _listen_forever(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                with self._connect() as conn:
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    if connected_before:
+                        self.reconnects += 1
+                        self._dispatch_all()
+                    connected_before = True
+                    logger.info(f"📡 Đang nghe thông báo làm mới bộ nhớ đệm trên kênh {self.channel}")
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self._handle(notify.payload)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"⚠️ Mất kết nối kênh làm mới bộ nhớ đệm ({e}), thử lại sau {self.reconnect_delay}s")
+                self._stop.wait(self.reconnect_delay)
+
+    def _handle(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return  # đã xử lý trong process khi publish
+        self.received += 1
+        self._dispatch(message["topic"], message["key"])
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "listening": bool(self._listener and self._listener.is_alive()),
+                "reconnects": self.reconnects}
+
+
+def publish_on_commit(session: Session, topic: str, key: str = ALL_KEYS) -> None:
+    """Chỉ phát thông báo khi transaction của `session` commit thành công."""
+    session.info.setdefault("pending_invalidations", set()).add((topic, key))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop("pending_invalidations", None)
+    for topic, key in pending or ():
+        invalidation_bus.publish(topic, key)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session: Session, previous_transaction: Any) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop("pending_invalidations", None)
+
+
+def create_invalidation_bus() -> InvalidationBus:
+    if settings.INVALIDATION_BACKEND == "postgres":
+        conninfo = str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+psycopg://", "postgresql://", 1)
+        return PostgresInvalidationBus(conninfo, channel=settings.INVALIDATION_CHANNEL)
+    return InProcessInvalidationBus()
+
+
+invalidation_bus = create_invalidation_bus()
@@ -4,21 +4,21 @@ import json
 import ssl
 import logging
 import os
-from datetime import datetime
+import time
 
 # ---  CÁC THƯ VIỆN GHI FILE EXCEL ---
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 # ------------------------------------
 
-# --- THÊM CÁC THƯ VIỆN GOOGLE SHEETS API MỚI ---
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-# ----------------------------------------------
+from app.core.config import settings
+from app.core.google_sheets import GoogleSheetsSink, ServiceAccountTokenProvider
+from app.core.mqtt_ingest import MqttIngestPipeline, MqttRow
+from app.core.mqtt_scheduler import PublishScheduler
+from app.core.mqtt_service import MqttService
+from app.core.mqtt_store import MqttMessageStore, StoreExporter
 
 logger = logging.getLogger(__name__)
-mqtt_client = None
 
 # ✅ Tạo đường dẫn tuyệt đối đến thư mục logs (giữ lại nếu bạn muốn ghi log khác)
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # trỏ tới app/
@@ -28,6 +28,9 @@ os.makedirs(LOG_DIR, exist_ok=True)
 # ✅ Đường dẫn tới file Excel log
 EXCEL_FILE = os.path.join(LOG_DIR, "mqtt_data.xlsx")
 
+# ✅ Thư mục kho lưu trữ tin nhắn MQTT (append-only, chia segment)
+STORE_DIR = settings.MQTT_STORE_DIR or os.path.join(LOG_DIR, "mqtt_store")
+
 # ✅ Đường dẫn tới file credentials.json
 # Đặt file credentials.json trong thư mục app/core/ (cùng cấp với mqtt.py)
 CREDENTIALS_FILE = os.path.join(os.path.dirname(__file__), "credentials.json")
@@ -37,126 +40,177 @@ CREDENTIALS_FILE = os.path.join(os.path.dirname(__file__), "credentials.json")
 # https://docs.google.com/spreadsheets/d/YOUR_SPREADSHEET_ID_HERE/edit
 SPREADSHEET_ID = "1_hfhka2P0cM3w5q80MDqNIQ1ut2RzXMJ-T1DNEYzOCc" # <<< THAY THẾ CHỖ NÀY !!!
 
-def get_mqtt_client():
-    global mqtt_client
-    if mqtt_client is None:
-        from paho.mqtt.client import Client
-        mqtt_client = Client()
-
-        mqtt_client.on_connect = on_connect
-        mqtt_client.on_message = on_message
-
-        # Đường dẫn đến ca.pem (đảm bảo file này vẫn đúng vị trí)
-        cert_path = os.path.join(os.path.dirname(__file__), "certs", "emqxsl_ca.pem")
+def create_mqtt_client():
+    from paho.mqtt.client import CallbackAPIVersion, Client
 
-        # Thiết lập TLS chỉ dùng CA
-        mqtt_client.tls_set(
-            ca_certs=cert_path,
-            cert_reqs=ssl.CERT_REQUIRED,
-            tls_version=ssl.PROTOCOL_TLSv1_2,
-        )
-        mqtt_client.tls_insecure_set(False)
+    client = Client(CallbackAPIVersion.VERSION2)
 
-        # Kết nối đến broker
-        mqtt_client.connect("scalemodelvn.com", port=8883)
-        mqtt_client.loop_start()
+    # Đường dẫn đến ca.pem (đảm bảo file này vẫn đúng vị trí)
+    cert_path = settings.MQTT_TLS_CA_FILE or os.path.join(os.path.dirname(__file__), "certs", "emqxsl_ca.pem")
 
-    return mqtt_client
-
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        logger.info("✅ MQTT connected securely with CA cert only")
-        client.subscribe("secure/topic")  # Thay topic nếu cần
-    else:
-        logger.error(f"❌ MQTT connection failed with code {rc}")
+    # Thiết lập TLS chỉ dùng CA
+    client.tls_set(
+        ca_certs=cert_path,
+        cert_reqs=ssl.CERT_REQUIRED,
+        tls_version=ssl.PROTOCOL_TLSv1_2,
+    )
+    client.tls_insecure_set(False)
+    return client
 
 def on_message(client, userdata, msg):
-    payload = msg.payload.decode()
+    payload = msg.payload.decode(errors="replace")
     topic = msg.topic
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    logger.info(f"📩 MQTT Message: {topic} -> {payload}")
-    # Gọi hàm mới để ghi vào Google Sheet
-    log_to_google_sheet(timestamp, topic, payload)
-    log_to_excel(timestamp, topic, payload) # Gọi lại hàm ghi Excel
+    logger.debug(f"📩 MQTT Message: {topic} -> {payload}")
+    # Chỉ đẩy vào hàng đợi, luồng nền ghi theo lô vào kho MQTT
+    ingest_pipeline.enqueue(time.time(), topic, payload)
+
+# ✅ Kết nối MQTT dùng chung cho cả process (khởi động/dừng trong lifespan của app)
+mqtt_service = MqttService(
+    create_mqtt_client,
+    settings.MQTT_HOST,
+    settings.MQTT_PORT,
+    subscribe_topic=settings.MQTT_SUBSCRIBE_TOPIC,
+    shared_group=settings.MQTT_SHARED_SUBSCRIPTION_GROUP,
+    on_message=on_message,
+    keepalive=settings.MQTT_KEEPALIVE,
+    max_queue_size=settings.MQTT_OUTBOUND_QUEUE_SIZE,
+    reconnect_min_delay=settings.MQTT_RECONNECT_MIN_DELAY,
+    reconnect_max_delay=settings.MQTT_RECONNECT_MAX_DELAY,
+    publish_timeout=settings.MQTT_PUBLISH_TIMEOUT,
+)
+
+def log_rows_to_excel(rows: list[MqttRow]):
+    # Tạo mới file nếu chưa tồn tại
+    if not os.path.exists(EXCEL_FILE):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "MQTT Logs"
+        ws.append(["Timestamp", "Topic", "Payload"])
+        logger.info(f"✅ Đã tạo file Excel mới: {EXCEL_FILE}")
+    else:
+        wb = load_workbook(EXCEL_FILE)
+        ws = wb.active
+
+    # Thêm các dòng dữ liệu mới, đồng thời tính độ rộng cột chỉ trên các dòng mới
+    new_widths = [0, 0, 0]
+    for row in rows:
+        ws.append(list(row))
+        for i, value in enumerate(row):
+            new_widths[i] = max(new_widths[i], len(str(value)) if value else 0)
+
+    # Auto-resize cột: chỉ nới rộng khi dòng mới dài hơn, không quét lại toàn bộ cột
+    for i, width in enumerate(new_widths):
+        col_letter = get_column_letter(i + 1)
+        current = ws.column_dimensions[col_letter].width or 0
+        if width + 2 > current:
+            ws.column_dimensions[col_letter].width = width + 2
+
+    wb.save(EXCEL_FILE)
+    logger.info(f"✅ Đã ghi {len(rows)} dòng vào file Excel cục bộ: {EXCEL_FILE}")
 
 def log_to_excel(timestamp: str, topic: str, payload: str):
     try:
-        # Tạo mới file nếu chưa tồn tại
-        if not os.path.exists(EXCEL_FILE):
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "MQTT Logs"
-            ws.append(["Timestamp", "Topic", "Payload"])
-            logger.info(f"✅ Đã tạo file Excel mới: {EXCEL_FILE}")
-        else:
-            wb = load_workbook(EXCEL_FILE)
-            ws = wb.active
-
-        # Thêm dòng dữ liệu mới
-        ws.append([timestamp, topic, payload])
-
-        # Auto-resize cột (tùy chọn, có thể bỏ qua nếu không cần)
-        for col in ws.columns:
-            max_len = max(len(str(cell.value)) if cell.value else 0 for cell in col)
-            col_letter = get_column_letter(col[0].column)
-            ws.column_dimensions[col_letter].width = max_len + 2
-
-        wb.save(EXCEL_FILE)
-        logger.info(f"✅ Đã ghi dữ liệu vào file Excel cục bộ: {EXCEL_FILE}")
+        log_rows_to_excel([(timestamp, topic, payload)])
     except Exception as e:
         logger.error(f"❌ Lỗi khi ghi vào file Excel: {e}")
 
-def log_to_google_sheet(timestamp: str, topic: str, payload: str):
-    # Phạm vi quyền mà ứng dụng của bạn cần
-    # Chỉ cần quyền ghi vào Google Sheets
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-    creds = None
+# ✅ Sink Google Sheet dùng chung cho cả process: credentials, token và HTTP client chỉ tạo một lần
+google_sheets_sink = GoogleSheetsSink(
+    SPREADSHEET_ID,
+    "Sheet1!A1", # Đảm bảo tên sheet này khớp với tên tab trong Google Sheet của bạn
+    token_provider=ServiceAccountTokenProvider(CREDENTIALS_FILE),
+    base_url=settings.GOOGLE_SHEETS_API_URL,
+    max_retries=settings.GOOGLE_SHEETS_MAX_RETRIES,
+)
+
+def log_rows_to_google_sheet(rows: list[MqttRow]):
     try:
-        # Tải thông tin xác thực từ file JSON
-        creds = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, scopes=SCOPES)
+        result = google_sheets_sink.append_rows(rows)
     except FileNotFoundError:
         logger.error(f"❌ Lỗi: Không tìm thấy file thông tin xác thực tại: {CREDENTIALS_FILE}. Vui lòng kiểm tra đường dẫn và tên file.")
         return
-    except Exception as e:
-        logger.error(f"❌ Lỗi khi tải thông tin xác thực: {e}")
-        return
 
+    logger.info(f"✅ Đã ghi dữ liệu vào Google Sheet: {result.get('updates', {}).get('updatedCells')} ô đã được cập nhật.")
+
+def log_to_google_sheet(timestamp: str, topic: str, payload: str):
     try:
-        # Xây dựng đối tượng dịch vụ Google Sheets API
-        service = build('sheets', 'v4', credentials=creds)
-        sheet = service.spreadsheets()
-
-        # Dữ liệu bạn muốn ghi vào Google Sheet
-        # Mỗi phần tử trong list con là một ô trong hàng
-        values = [[timestamp, topic, payload]]
-        body = {
-            'values': values
-        }
-
-        # Thực hiện việc ghi dữ liệu vào Google Sheet
-        # range="Sheet1!A1": Chỉ định tên sheet (mặc định là Sheet1) và ô bắt đầu (A1)
-        # valueInputOption="RAW": Dữ liệu được chèn nguyên văn, không qua phân tích cú pháp
-        # insertDataOption="INSERT_ROWS": Chèn dữ liệu dưới dạng hàng mới vào cuối sheet
-        result = sheet.values().append(
-            spreadsheetId=SPREADSHEET_ID,
-            range="Sheet1!A1", # Đảm bảo tên sheet này khớp với tên tab trong Google Sheet của bạn
-            valueInputOption="RAW",
-            insertDataOption="INSERT_ROWS",
-            body=body).execute()
-
-        # Log thông báo thành công
-        logger.info(f"✅ Đã ghi dữ liệu vào Google Sheet: {result.get('updates').get('updatedCells')} ô đã được cập nhật.")
-
-    except HttpError as err:
-        # Xử lý các lỗi từ Google Sheets API (ví dụ: lỗi quyền truy cập, sheet không tồn tại)
-        logger.error(f"❌ Lỗi Google Sheets API: {err}")
+        log_rows_to_google_sheet([(timestamp, topic, payload)])
     except Exception as e:
-        # Xử lý các lỗi không mong muốn khác
-        logger.error(f"❌ Đã xảy ra lỗi không mong muốn khi ghi vào Google Sheet: {e}")
+        logger.error(f"❌ Đã xảy ra lỗi khi ghi vào Google Sheet: {e}")
+
+
+# ✅ Kho lưu trữ tin nhắn MQTT, có thể truy vấn qua /mqtt/messages
+message_store = MqttMessageStore(
+    STORE_DIR,
+    segment_max_records=settings.MQTT_STORE_SEGMENT_MAX_RECORDS,
+    segment_max_bytes=settings.MQTT_STORE_SEGMENT_MAX_BYTES,
+    max_segments=settings.MQTT_STORE_MAX_SEGMENTS,
+)
+
+# ✅ Hàng đợi ghi tin nhắn MQTT theo lô vào kho (khởi động/dừng trong lifespan của app)
+ingest_pipeline = MqttIngestPipeline(
+    sinks=[message_store.append],
+    max_queue_size=settings.MQTT_INGEST_QUEUE_SIZE,
+    batch_size=settings.MQTT_INGEST_BATCH_SIZE,
+    flush_interval=settings.MQTT_INGEST_FLUSH_INTERVAL,
+)
+
+# ✅ Excel / Google Sheet là các sink export tuỳ chọn, đọc lại dữ liệu từ kho
+exporters: list[StoreExporter] = []
+if settings.MQTT_EXPORT_GOOGLE_SHEET:
+    exporters.append(StoreExporter(
+        message_store, log_rows_to_google_sheet, "google_sheet",
+        batch_size=settings.MQTT_EXPORT_BATCH_SIZE, interval=settings.MQTT_EXPORT_INTERVAL,
+    ))
+if settings.MQTT_EXPORT_EXCEL:
+    exporters.append(StoreExporter(
+        message_store, log_rows_to_excel, "excel",
+        batch_size=settings.MQTT_EXPORT_BATCH_SIZE, interval=settings.MQTT_EXPORT_INTERVAL,
+    ))
+
+
+def start_mqtt_logging():
+    ingest_pipeline.start()
+    for exporter in exporters:
+        exporter.start()
+
+
+def stop_mqtt_logging():
+    # Ghi nốt các bản ghi còn trong hàng đợi trước, sau đó mới dừng export
+    ingest_pipeline.stop()
+    for exporter in exporters:
+        exporter.stop()
+
+
+def mqtt_logging_stats() -> dict:
+    return {
+        "ingest": ingest_pipeline.stats(),
+        "store": message_store.stats(),
+        "exporters": {exporter.name: exporter.stats() for exporter in exporters},
+        "google_sheets": google_sheets_sink.stats(),
+        "client": mqtt_service.stats(),
+        "light_scheduler": light_scheduler.stats(),
+    }
 
 
 def publish(topic: str, payload: dict):
-    client = get_mqtt_client()
-    client.publish(topic, json.dumps(payload))
\ No newline at end of file
+    # Không chặn route: tin nhắn được xếp hàng và gửi khi có kết nối
+    mqtt_service.publish_nowait(topic, json.dumps(payload))
+
+
+async def publish_async(topic: str, payload: dict, *, qos: int = 0, timeout: float | None = None):
+    await mqtt_service.publish(topic, json.dumps(payload), qos=qos, timeout=timeout)
+
+
+# ✅ Lệnh bật đèn sa bàn: gộp theo cửa sổ thời gian, bỏ lệnh trùng và chỉ gửi phần chênh lệch
+light_scheduler = PublishScheduler(
+    publish,
+    window=settings.MQTT_LIGHT_COALESCE_WINDOW,
+    deltas=settings.MQTT_LIGHT_SEND_DELTAS,
+    resync_interval=settings.MQTT_LIGHT_RESYNC_INTERVAL,
+)
+
+
+def publish_light_channels(topic: str, channels: list[int]):
+    light_scheduler.submit(topic, channels)
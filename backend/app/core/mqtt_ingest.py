@@ -0,0 +1,163 @@
+# app/core/mqtt_ingest.py
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Một tin nhắn MQTT nhận được: (received_at - epoch giây, topic, payload)
+MqttMessage = tuple[float, str, str]
+# Một dòng log dạng văn bản cho các sink export: (timestamp, topic, payload)
+MqttRow = tuple[str, str, str]
+BatchSink = Callable[[list[MqttMessage]], None]
+
+
+class MqttIngestPipeline:
+    """
+    Hàng đợi có giới hạn giữa callback paho và các sink ghi log.
+
+    `enqueue` chỉ đẩy bản ghi vào hàng đợi (không bao giờ chặn luồng mạng của paho),
+    một luồng nền gom bản ghi thành lô theo kích thước hoặc theo thời gian rồi
+    gọi mỗi sink đúng một lần cho mỗi lô.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[BatchSink],
+        *,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[tuple[float, MqttMessage]] = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.sink_errors = 0
+        self.last_flush_duration_ms = 0.0
+        self.max_flush_duration_ms = 0.0
+        self.total_flush_duration_ms = 0.0
+        self.last_flush_max_wait_ms = 0.0
+        self.last_flush_at: float | None = None
+
+    def enqueue(self, received_at: float, topic: str, payload: str) -> bool:
+        """Đẩy một bản ghi vào hàng đợi. Trả về False nếu hàng đợi đầy (bản ghi bị bỏ)."""
+        try:
+            self._queue.put_nowait((time.monotonic(), (received_at, topic, payload)))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            # Chỉ log thưa để tránh spam log khi bị dồn
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"⚠️ Hàng đợi MQTT ingest đầy, đã bỏ {dropped} bản ghi")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="mqtt-ingest-writer", daemon=True)
+        self._thread.start()
+        logger.info("✅ MQTT ingest writer started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Dừng luồng ghi, ghi nốt các bản ghi còn trong hàng đợi."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning("⚠️ MQTT ingest writer chưa dừng kịp, bỏ qua bước ghi nốt")
+                return
+            self._thread = None
+        # Trường hợp luồng chưa từng chạy: ghi nốt tại chỗ
+        while not self._queue.empty():
+            self._flush(self._drain(self.batch_size))
+
+    def _drain(self, limit: int) -> list[tuple[float, MqttMessage]]:
+        items: list[tuple[float, MqttMessage]] = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            batch: list[tuple[float, MqttMessage]] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            if batch:
+                self._flush(batch)
+        # Ghi nốt phần còn lại khi dừng
+        while not self._queue.empty():
+            self._flush(self._drain(self.batch_size))
+
+    def _flush(self, batch: list[tuple[float, MqttMessage]]) -> None:
+        if not batch:
+            return
+        rows = [row for _, row in batch]
+        started = time.monotonic()
+        oldest = min(enqueued_at for enqueued_at, _ in batch)
+        errors = 0
+        for sink in self.sinks:
+            try:
+                sink(rows)
+            except Exception as e:
+                errors += 1
+                logger.error(f"❌ Lỗi khi ghi lô {len(rows)} bản ghi MQTT vào {getattr(sink, '__name__', sink)}: {e}")
+        finished = time.monotonic()
+        duration_ms = (finished - started) * 1000
+        with self._lock:
+            self.flushed_rows += len(rows)
+            self.flushed_batches += 1
+            self.sink_errors += errors
+            self.last_flush_duration_ms = duration_ms
+            self.max_flush_duration_ms = max(self.max_flush_duration_ms, duration_ms)
+            self.total_flush_duration_ms += duration_ms
+            self.last_flush_max_wait_ms = (finished - oldest) * 1000
+            self.last_flush_at = time.time()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "flushed_rows": self.flushed_rows,
+                "flushed_batches": self.flushed_batches,
+                "sink_errors": self.sink_errors,
+                "last_flush_duration_ms": round(self.last_flush_duration_ms, 3),
+                "max_flush_duration_ms": round(self.max_flush_duration_ms, 3),
+                "avg_flush_duration_ms": round(
+                    self.total_flush_duration_ms / self.flushed_batches, 3
+                ) if self.flushed_batches else 0.0,
+                "last_flush_max_wait_ms": round(self.last_flush_max_wait_ms, 3),
+                "last_flush_at": self.last_flush_at,
+            }
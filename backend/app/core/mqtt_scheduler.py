@@ -0,0 +1,176 @@
+# app/core/mqtt_scheduler.py
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+Publisher = Callable[[str, dict[str, Any]], None]
+
+
+class _TopicState:
+    def __init__(self) -> None:
+        self.pending: frozenset[int] | None = None
+        self.pending_since = 0.0
+        self.pending_commands = 0
+        self.timer: asyncio.TimerHandle | None = None
+        self.sent: frozenset[int] | None = None
+        self.last_full_at = 0.0
+
+
+class PublishScheduler:
+    """
+    Gom và khử trùng lặp lệnh bật đèn (`{"channels": [...], "value": 1}`) trước khi publish.
+
+    - Các lệnh tới cùng một topic trong `window` giây được gộp: chỉ trạng thái cuối cùng được gửi.
+    - Khi bật `deltas`: bỏ qua trạng thái giống hệt lần gửi trước và chỉ gửi phần chênh lệch:
+      `{"channels": <tắt>, "value": 0}` rồi `{"channels": <bật>, "value": 1}`.
+      Cứ mỗi `resync_interval` giây sẽ gửi lại toàn bộ trạng thái (kênh tắt với value 0, kênh bật với
+      value 1) để bộ điều khiển không bị lệch.
+
+    Trạng thái đã gửi được giữ riêng trong từng worker, nên chỉ bật `deltas` khi chỉ có một process
+    publish lệnh đèn (vd. một worker); nhiều worker thì mỗi lần gửi nguyên danh sách như trước.
+    Các hàm `submit` an toàn khi gọi từ luồng khác.
+    """
+
+    def __init__(
+        self,
+        publisher: Publisher,
+        *,
+        window: float = 0.05,
+        deltas: bool = False,
+        resync_interval: float = 300.0,
+    ) -> None:
+        self.publisher = publisher
+        self.window = window
+        self.deltas = deltas
+        self.resync_interval = resync_interval
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._topics: dict[str, _TopicState] = {}
+
+        self.submitted = 0
+        self.unbatched_messages = 0
+        self.coalesced = 0
+        self.deduplicated = 0
+        self.messages_sent = 0
+        self.delta_messages = 0
+        self.flushes = 0
+        self.total_delay_ms = 0.0
+        self.max_delay_ms = 0.0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self) -> None:
+        """Gửi ngay các lệnh còn đang chờ trong cửa sổ gộp."""
+        for topic, state in self._topics.items():
+            if state.timer is not None:
+                state.timer.cancel()
+                self._flush(topic)
+        self._loop = None
+
+    def submit(self, topic: str, channels: Iterable[int]) -> None:
+        """Đặt trạng thái mong muốn (danh sách kênh đang bật) cho `topic`."""
+        state = frozenset(channels)
+        loop = self._loop
+        if loop is None:
+            # Chưa chạy trong event loop (vd. script/test): xử lý ngay, không gộp
+            self._submit(topic, state)
+            self._flush(topic)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._submit(topic, state)
+        else:
+            loop.call_soon_threadsafe(self._submit, topic, state)
+
+    def _submit(self, topic: str, channels: frozenset[int]) -> None:
+        state = self._topics.setdefault(topic, _TopicState())
+        self.submitted += 1
+        if state.pending is None:
+            state.pending_since = time.monotonic()
+        else:
+            self.coalesced += 1
+        state.pending = channels
+        state.pending_commands += 1
+        if channels:
+            # Trước đây mỗi lệnh có kênh là một tin nhắn
+            self.unbatched_messages += 1
+        if state.timer is None and self._loop is not None:
+            state.timer = self._loop.call_later(self.window, self._flush, topic)
+
+    def _flush(self, topic: str) -> None:
+        state = self._topics[topic]
+        state.timer = None
+        desired, state.pending = state.pending, None
+        commands, state.pending_commands = state.pending_commands, 0
+        if desired is None:
+            return
+
+        now = time.monotonic()
+        delay_ms = (now - state.pending_since) * 1000
+        self.flushes += 1
+        self.total_delay_ms += delay_ms
+        self.max_delay_ms = max(self.max_delay_ms, delay_ms)
+
+        messages: list[dict[str, Any]] = []
+        if not self.deltas:
+            # Worker khác có thể đã đổi đèn sau lần gửi trước của worker này: luôn gửi nguyên danh sách
+            if desired:
+                messages.append({"channels": sorted(desired), "value": 1})
+            self._publish(topic, state, desired, messages)
+            return
+
+        resync = now - state.last_full_at >= self.resync_interval
+        if desired == state.sent and not resync:
+            self.deduplicated += commands
+            return
+
+        if state.sent is not None and not resync:
+            turned_off = state.sent - desired
+            turned_on = desired - state.sent
+            if turned_off:
+                messages.append({"channels": sorted(turned_off), "value": 0})
+            if turned_on:
+                messages.append({"channels": sorted(turned_on), "value": 1})
+            self.delta_messages += len(messages)
+        else:
+            # Gửi toàn bộ trạng thái: kênh đã bật trước đó mà không còn trong danh sách phải được tắt rõ ràng
+            turned_off = state.sent - desired if state.sent is not None else frozenset()
+            if turned_off:
+                messages.append({"channels": sorted(turned_off), "value": 0})
+            if desired:
+                messages.append({"channels": sorted(desired), "value": 1})
+            state.last_full_at = now
+        self._publish(topic, state, desired, messages)
+
+    def _publish(self, topic: str, state: _TopicState, desired: frozenset[int], messages: list[dict[str, Any]]) -> None:
+        for payload in messages:
+            try:
+                self.publisher(topic, payload)
+            except Exception as e:
+                # Không cập nhật trạng thái đã gửi để lần sau gửi lại
+                logger.error(f"❌ Lỗi khi publish lệnh tới {topic}: {e}")
+                return
+            self.messages_sent += 1
+        state.sent = desired
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "deltas": self.deltas,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "deduplicated": self.deduplicated,
+            "messages_sent": self.messages_sent,
+            "delta_messages": self.delta_messages,
+            "messages_saved": max(self.unbatched_messages - self.messages_sent, 0),
+            "avg_added_latency_ms": round(self.total_delay_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_added_latency_ms": round(self.max_delay_ms, 3),
+        }
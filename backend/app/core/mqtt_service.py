@@ -0,0 +1,320 @@
+# app/core/mqtt_service.py
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+ClientFactory = Callable[[], Any]
+MessageHandler = Callable[[Any, Any, Any], None]
+
+
+class MqttQueueFullError(Exception):
+    pass
+
+
+class MqttServiceStoppedError(Exception):
+    pass
+
+
+@dataclass
+class _OutboundMessage:
+    topic: str
+    payload: str | bytes
+    qos: int
+    future: asyncio.Future[None]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MqttService:
+    """
+    Kết nối MQTT chạy nền, không chặn lifespan hay request handler.
+
+    - `start()` chỉ gọi `connect_async` + `loop_start`: luồng mạng của paho tự kết nối
+      và tự kết nối lại với backoff lũy thừa (`reconnect_delay_set`).
+    - Mỗi lần kết nối (lại) thành công sẽ subscribe lại; nếu có `shared_group` thì dùng
+      shared subscription `$share/<group>/<topic>` để các worker chia nhau tin nhắn
+      thay vì mỗi worker nhận một bản.
+    - `publish()` đẩy tin vào hàng đợi cục bộ có giới hạn; tin được giữ lại khi mất kết nối
+      và gửi đi khi kết nối lại. Trả về khi broker xác nhận (QoS 1/2) hoặc khi đã ghi
+      xuống socket (QoS 0), hoặc ném `TimeoutError` khi quá `timeout`.
+    """
+
+    def __init__(
+        self,
+        client_factory: ClientFactory,
+        host: str,
+        port: int,
+        *,
+        subscribe_topic: str | None = None,
+        shared_group: str | None = None,
+        on_message: MessageHandler | None = None,
+        keepalive: int = 60,
+        max_queue_size: int = 1000,
+        reconnect_min_delay: float = 1.0,
+        reconnect_max_delay: float = 60.0,
+        publish_timeout: float = 5.0,
+    ) -> None:
+        self.client_factory = client_factory
+        self.host = host
+        self.port = port
+        self.subscribe_topic = subscribe_topic
+        self.shared_group = shared_group
+        self.on_message = on_message
+        self.keepalive = keepalive
+        self.max_queue_size = max_queue_size
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.publish_timeout = publish_timeout
+
+        self.client: Any = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[_OutboundMessage] | None = None
+        self._connected: asyncio.Event | None = None
+        self._sender: asyncio.Task[None] | None = None
+        self._inflight: dict[int, _OutboundMessage] = {}
+
+        self.connects = 0
+        self.disconnects = 0
+        self.connect_failures = 0
+        self.published = 0
+        self.publish_timeouts = 0
+        self.publish_errors = 0
+        self.rejected = 0
+        self.last_publish_latency_ms = 0.0
+        self.last_connected_at: float | None = None
+
+    @property
+    def subscription(self) -> str | None:
+        if not self.subscribe_topic:
+            return None
+        if self.shared_group:
+            return f"$share/{self.shared_group}/{self.subscribe_topic}"
+        return self.subscribe_topic
+
+    @property
+    def is_connected(self) -> bool:
+        return bool(self._connected and self._connected.is_set())
+
+    # ---------- Vòng đời ----------
+
+    async def start(self) -> None:
+        if self._sender is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._connected = asyncio.Event()
+
+        client = self.client_factory()
+        client.on_connect = self._on_connect
+        client.on_connect_fail = self._on_connect_fail
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        if self.on_message is not None:
+            client.on_message = self.on_message
+        client.reconnect_delay_set(
+            min_delay=max(1, int(self.reconnect_min_delay)),
+            max_delay=max(1, int(self.reconnect_max_delay)),
+        )
+        self.client = client
+
+        # Không chặn: việc kết nối TCP/TLS diễn ra trong luồng mạng của paho
+        client.connect_async(self.host, self.port, keepalive=self.keepalive)
+        client.loop_start()
+        self._sender = asyncio.create_task(self._send_loop(), name="mqtt-sender")
+        logger.info(f"🔌 MQTT đang kết nối nền tới {self.host}:{self.port}")
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Gửi nốt hàng đợi (nếu đang kết nối, tối đa `drain_timeout` giây) rồi ngắt kết nối."""
+        if self._sender is None or self._queue is None:
+            return
+        if self.is_connected:
+            deadline = time.monotonic() + drain_timeout
+            while (self._queue.qsize() or self._inflight) and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+
+        self._sender.cancel()
+        try:
+            await self._sender
+        except asyncio.CancelledError:
+            pass
+        self._sender = None
+
+        client, self.client = self.client, None
+        client.disconnect()
+        await asyncio.to_thread(client.loop_stop)
+
+        error = MqttServiceStoppedError("MQTT service đã dừng")
+        while not self._queue.empty():
+            self._fail(self._queue.get_nowait(), error)
+        for message in self._inflight.values():
+            self._fail(message, error)
+        self._inflight.clear()
+        self._connected.clear()
+        logger.info("🔌 MQTT đã ngắt kết nối")
+
+    # ---------- Publish ----------
+
+    async def publish(
+        self,
+        topic: str,
+        payload: str | bytes,
+        *,
+        qos: int = 0,
+        timeout: float | None = None,
+    ) -> None:
+        """Gửi một tin nhắn; chờ tối đa `timeout` giây (mặc định `publish_timeout`)."""
+        message = self._enqueue(topic, payload, qos)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(message.future),
+                self.publish_timeout if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:  # Python 3.10: không phải TimeoutError dựng sẵn
+            self.publish_timeouts += 1
+            # Tin chưa gửi sẽ bị bỏ qua; tin đã gửi (QoS > 0) vẫn để paho hoàn tất
+            message.future.cancel()
+            raise
+
+    def publish_nowait(self, topic: str, payload: str | bytes, *, qos: int = 0) -> None:
+        """
+        Gửi kiểu fire-and-forget, an toàn khi gọi từ luồng khác (route đồng bộ chạy trong threadpool).
+        """
+        loop = self._loop
+        if loop is None or self._sender is None:
+            self.rejected += 1
+            logger.warning(f"⚠️ MQTT service chưa chạy, bỏ tin nhắn tới {topic}")
+            return
+
+        def enqueue() -> None:
+            try:
+                self._enqueue(topic, payload, qos)
+            except (MqttQueueFullError, MqttServiceStoppedError) as e:
+                logger.warning(f"⚠️ Bỏ tin nhắn MQTT tới {topic}: {e}")
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            enqueue()
+        else:
+            loop.call_soon_threadsafe(enqueue)
+
+    def _enqueue(self, topic: str, payload: str | bytes, qos: int) -> _OutboundMessage:
+        if self._queue is None or self._loop is None or self._sender is None:
+            self.rejected += 1
+            raise MqttServiceStoppedError("MQTT service chưa chạy")
+        message = _OutboundMessage(topic, payload, qos, self._loop.create_future())
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise MqttQueueFullError(
+                f"Hàng đợi MQTT đầy ({self.max_queue_size} tin nhắn)"
+            ) from None
+        return message
+
+    async def _send_loop(self) -> None:
+        assert self._queue is not None and self._connected is not None
+        while True:
+            message = await self._queue.get()
+            while not message.future.done():
+                await self._connected.wait()
+                if message.future.done():
+                    break
+                try:
+                    info = self.client.publish(message.topic, message.payload, qos=message.qos)
+                except Exception as e:
+                    # Topic/payload sai hoặc lỗi socket: báo lỗi cho người gửi, vòng gửi vẫn chạy tiếp
+                    self.publish_errors += 1
+                    logger.error(f"❌ Không gửi được tin nhắn MQTT tới {message.topic}: {e}")
+                    self._fail(message, e)
+                    break
+                if info.rc == MQTT_ERR_SUCCESS or (info.rc == MQTT_ERR_NO_CONN and message.qos > 0):
+                    # QoS > 0: paho giữ tin và tự gửi lại sau khi kết nối lại.
+                    # on_publish được đẩy về event loop nên luôn chạy sau dòng dưới đây.
+                    self._inflight[info.mid] = message
+                    break
+                # QoS 0 khi vừa mất kết nối: chờ kết nối lại rồi thử lại
+                await asyncio.sleep(self.reconnect_min_delay)
+
+    # ---------- Callback từ luồng mạng của paho ----------
+
+    def _call_in_loop(self, callback: Callable[..., None], *args: Any) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        if reason_code != 0:
+            self.connect_failures += 1
+            logger.error(f"❌ MQTT connection failed with code {reason_code}")
+            return
+        self.connects += 1
+        self.last_connected_at = time.time()
+        logger.info("✅ MQTT connected securely with CA cert only")
+        if self.subscription:
+            client.subscribe(self.subscription, qos=1)
+        self._call_in_loop(self._set_connected, True)
+
+    def _on_connect_fail(self, client, userdata) -> None:
+        self.connect_failures += 1
+        logger.warning(f"⚠️ Không kết nối được MQTT broker {self.host}:{self.port}, sẽ thử lại")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        self.disconnects += 1
+        if reason_code != 0:
+            logger.warning(f"⚠️ MQTT mất kết nối ({reason_code}), paho sẽ tự kết nối lại")
+        self._call_in_loop(self._set_connected, False)
+
+    def _on_publish(self, client, userdata, mid, reason_code=None, properties=None) -> None:
+        self._call_in_loop(self._set_published, mid)
+
+    def _set_connected(self, connected: bool) -> None:
+        if self._connected is None:
+            return
+        if connected:
+            self._connected.set()
+        else:
+            self._connected.clear()
+
+    def _set_published(self, mid: int) -> None:
+        message = self._inflight.pop(mid, None)
+        if message is None:
+            return
+        self.published += 1
+        self.last_publish_latency_ms = (time.monotonic() - message.enqueued_at) * 1000
+        if not message.future.done():
+            message.future.set_result(None)
+
+    @staticmethod
+    def _fail(message: _OutboundMessage, error: Exception) -> None:
+        if not message.future.done():
+            message.future.set_exception(error)
+            # Tránh cảnh báo "exception was never retrieved" với publish_nowait
+            message.future.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connected": self.is_connected,
+            "subscription": self.subscription,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "connect_failures": self.connect_failures,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue_size,
+            "inflight": len(self._inflight),
+            "published": self.published,
+            "publish_timeouts": self.publish_timeouts,
+            "publish_errors": self.publish_errors,
+            "rejected": self.rejected,
+            "last_publish_latency_ms": round(self.last_publish_latency_ms, 3),
+            "last_connected_at": self.last_connected_at,
+        }
@@ -0,0 +1,454 @@
+# app/core/mqtt_store.py
+
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from app.core.mqtt_ingest import MqttMessage, MqttRow
+
+logger = logging.getLogger(__name__)
+
+# Bản ghi chỉ mục có độ rộng cố định: timestamp_ms, topic_id, payload_len, payload_offset
+RECORD = struct.Struct("<qIIQ")
+RECORD_SIZE = RECORD.size
+_TIMESTAMP = struct.Struct("<q")
+
+SEGMENT_PREFIX = "seg-"
+TOPICS_FILE = "topics.jsonl"
+LOCK_FILE = "store.lock"
+
+
+@dataclass(frozen=True)
+class StoredMessage:
+    seq: int
+    timestamp_ms: int
+    topic: str
+    payload: str
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "timestamp": datetime.fromtimestamp(self.timestamp_ms / 1000).isoformat(timespec="milliseconds"),
+            "topic": self.topic,
+            "payload": self.payload,
+        }
+
+    def as_row(self) -> MqttRow:
+        timestamp = datetime.fromtimestamp(self.timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+        return (timestamp, self.topic, self.payload)
+
+
+class _Segment:
+    """
+    Một segment gồm 2 file: `.idx` (các bản ghi RECORD nối tiếp nhau) và `.dat` (payload).
+    `base_seq` là số thứ tự toàn cục của bản ghi đầu tiên trong segment.
+    """
+
+    def __init__(self, directory: str, base_seq: int) -> None:
+        self.base_seq = base_seq
+        name = f"{SEGMENT_PREFIX}{base_seq:016d}"
+        self.idx_path = os.path.join(directory, f"{name}.idx")
+        self.dat_path = os.path.join(directory, f"{name}.dat")
+        self._lock = threading.Lock()
+        self._topic_positions: dict[int, array] = {}
+        self._indexed_count = 0
+
+    def count(self) -> int:
+        try:
+            return os.path.getsize(self.idx_path) // RECORD_SIZE
+        except FileNotFoundError:
+            return 0
+
+    def data_size(self) -> int:
+        try:
+            return os.path.getsize(self.dat_path)
+        except FileNotFoundError:
+            return 0
+
+    def touch(self) -> None:
+        for path in (self.idx_path, self.dat_path):
+            with open(path, "ab"):
+                pass
+
+    @contextmanager
+    def mapped(self) -> Iterator[tuple[mmap.mmap | None, mmap.mmap | None, int]]:
+        """Ánh xạ bộ nhớ (read-only) phần đã ghi xong của segment."""
+        count = self.count()
+        data_size = self.data_size()
+        idx_mm = dat_mm = None
+        try:
+            if count:
+                with open(self.idx_path, "rb") as f:
+                    idx_mm = mmap.mmap(f.fileno(), count * RECORD_SIZE, access=mmap.ACCESS_READ)
+            if data_size:
+                with open(self.dat_path, "rb") as f:
+                    dat_mm = mmap.mmap(f.fileno(), data_size, access=mmap.ACCESS_READ)
+            yield idx_mm, dat_mm, count
+        finally:
+            if idx_mm is not None:
+                idx_mm.close()
+            if dat_mm is not None:
+                dat_mm.close()
+
+    def topic_positions(self, idx_mm: mmap.mmap, count: int, topic_id: int) -> array:
+        """Chỉ mục theo topic: danh sách vị trí bản ghi (tăng dần) của topic trong segment."""
+        with self._lock:
+            if count > self._indexed_count:
+                view = memoryview(idx_mm)[self._indexed_count * RECORD_SIZE : count * RECORD_SIZE]
+                position = self._indexed_count
+                for _, tid, _, _ in RECORD.iter_unpack(view):
+                    positions = self._topic_positions.get(tid)
+                    if positions is None:
+                        positions = self._topic_positions[tid] = array("Q")
+                    positions.append(position)
+                    position += 1
+                view.release()
+                self._indexed_count = count
+            return self._topic_positions.get(topic_id, array("Q"))
+
+
+class MqttMessageStore:
+    """
+    Kho lưu trữ tin nhắn MQTT dạng append-only, chia thành nhiều segment xoay vòng.
+
+    - Timestamp (ms) và topic_id lưu ở file chỉ mục có độ rộng cố định, payload lưu riêng.
+    - Topic được intern vào `topics.jsonl` (id = số thứ tự dòng).
+    - Timestamp trong kho không giảm, nên truy vấn theo khoảng thời gian dùng tìm kiếm nhị phân
+      trực tiếp trên file được mmap, không cần đọc toàn bộ file.
+    - Nhiều worker có thể ghi cùng thư mục: mỗi lần ghi giữ khoá file `store.lock`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_max_records: int = 1_000_000,
+        segment_max_bytes: int = 256 * 1024 * 1024,
+        max_segments: int = 64,
+    ) -> None:
+        self.directory = directory
+        self.segment_max_records = segment_max_records
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._segments: dict[int, _Segment] = {}
+        self._topics: list[str] = []
+        self._topic_ids: dict[str, int] = {}
+        self._topics_offset = 0
+
+    # ---------- Helpers ----------
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(os.path.join(self.directory, LOCK_FILE), "a+b") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _list_segments(self) -> list[_Segment]:
+        bases = sorted(
+            int(name[len(SEGMENT_PREFIX) : -len(".idx")])
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(".idx")
+        )
+        with self._lock:
+            for base in list(self._segments):
+                if base not in bases:
+                    del self._segments[base]
+            for base in bases:
+                if base not in self._segments:
+                    self._segments[base] = _Segment(self.directory, base)
+            return [self._segments[base] for base in bases]
+
+    def _refresh_topics(self) -> None:
+        path = os.path.join(self.directory, TOPICS_FILE)
+        if not os.path.exists(path):
+            return
+        with self._lock, open(path, "rb") as f:
+            f.seek(self._topics_offset)
+            chunk = f.read()
+            # Chỉ đọc các dòng đã ghi trọn vẹn
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                topic = json.loads(line)
+                self._topic_ids[topic] = len(self._topics)
+                self._topics.append(topic)
+            self._topics_offset += end
+
+    def _topic_name(self, topic_id: int) -> str:
+        if topic_id >= len(self._topics):
+            self._refresh_topics()
+        return self._topics[topic_id] if topic_id < len(self._topics) else ""
+
+    # ---------- Ghi ----------
+
+    def append(self, messages: Sequence[MqttMessage]) -> None:
+        """Ghi một lô tin nhắn (received_at, topic, payload) vào segment hiện hành."""
+        if not messages:
+            return
+        with self._lock, self._file_lock():
+            self._refresh_topics()
+            segments = self._list_segments()
+            segment = segments[-1] if segments else None
+            if segment is None or (
+                segment.count() >= self.segment_max_records
+                or segment.data_size() >= self.segment_max_bytes
+            ):
+                base = segment.base_seq + segment.count() if segment else 0
+                segment = self._segments[base] = _Segment(self.directory, base)
+                segment.touch()
+                logger.info(f"✅ MQTT store: mở segment mới {segment.idx_path}")
+
+            last_ts = 0
+            count = segment.count()
+            if count:
+                with open(segment.idx_path, "rb") as f:
+                    f.seek((count - 1) * RECORD_SIZE)
+                    last_ts = _TIMESTAMP.unpack(f.read(_TIMESTAMP.size))[0]
+
+            new_topics: list[str] = []
+            payloads = bytearray()
+            records = bytearray()
+            data_offset = segment.data_size()
+            for received_at, topic, payload in messages:
+                topic_id = self._topic_ids.get(topic)
+                if topic_id is None:
+                    topic_id = self._topic_ids[topic] = len(self._topics)
+                    self._topics.append(topic)
+                    new_topics.append(topic)
+                data = payload.encode("utf-8") if isinstance(payload, str) else payload
+                # Đảm bảo timestamp không giảm trong segment để tìm kiếm nhị phân
+                timestamp_ms = max(int(received_at * 1000), last_ts)
+                last_ts = timestamp_ms
+                records += RECORD.pack(timestamp_ms, topic_id, len(data), data_offset + len(payloads))
+                payloads += data
+
+            if new_topics:
+                lines = "".join(json.dumps(t) + "\n" for t in new_topics).encode("utf-8")
+                with open(os.path.join(self.directory, TOPICS_FILE), "ab") as f:
+                    f.write(lines)
+                self._topics_offset += len(lines)
+            # Ghi payload trước, chỉ mục sau: bản ghi chỉ mục nào đọc được thì payload đã có
+            with open(segment.dat_path, "ab") as f:
+                f.write(payloads)
+            with open(segment.idx_path, "ab") as f:
+                f.write(records)
+
+            self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        segments = self._list_segments()
+        for segment in segments[: max(0, len(segments) - self.max_segments)]:
+            for path in (segment.idx_path, segment.dat_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._segments.pop(segment.base_seq, None)
+            logger.info(f"🗑️ MQTT store: đã xoá segment cũ {segment.idx_path}")
+
+    # ---------- Đọc ----------
+
+    def _read(self, segment: _Segment, idx_mm: mmap.mmap, dat_mm: mmap.mmap | None, position: int) -> StoredMessage:
+        timestamp_ms, topic_id, length, offset = RECORD.unpack_from(idx_mm, position * RECORD_SIZE)
+        payload = dat_mm[offset : offset + length].decode("utf-8", errors="replace") if dat_mm and length else ""
+        return StoredMessage(
+            seq=segment.base_seq + position,
+            timestamp_ms=timestamp_ms,
+            topic=self._topic_name(topic_id),
+            payload=payload,
+        )
+
+    def query(
+        self,
+        *,
+        topic: str | None = None,
+        from_ms: int | None = None,
+        to_ms: int | None = None,
+        limit: int | None = None,
+    ) -> Iterator[StoredMessage]:
+        """Duyệt các tin nhắn theo thời gian tăng dần, lọc theo topic và khoảng [from_ms, to_ms]."""
+        topic_id: int | None = None
+        if topic is not None:
+            self._refresh_topics()
+            topic_id = self._topic_ids.get(topic)
+            if topic_id is None:
+                return
+
+        remaining = limit
+        for segment in self._list_segments():
+            with segment.mapped() as (idx_mm, dat_mm, count):
+                if idx_mm is None:
+                    continue
+
+                def ts_at(position: int, idx_mm: mmap.mmap = idx_mm) -> int:
+                    return _TIMESTAMP.unpack_from(idx_mm, position * RECORD_SIZE)[0]
+
+                if (from_ms is not None and ts_at(count - 1) < from_ms) or (
+                    to_ms is not None and ts_at(0) > to_ms
+                ):
+                    continue
+
+                positions: Sequence[int] = (
+                    segment.topic_positions(idx_mm, count, topic_id)
+                    if topic_id is not None
+                    else range(count)
+                )
+                lo = bisect.bisect_left(positions, from_ms, key=ts_at) if from_ms is not None else 0
+                hi = bisect.bisect_right(positions, to_ms, key=ts_at) if to_ms is not None else len(positions)
+                for i in range(lo, hi):
+                    if remaining is not None:
+                        if remaining <= 0:
+                            return
+                        remaining -= 1
+                    yield self._read(segment, idx_mm, dat_mm, positions[i])
+
+    def read_after(self, seq: int, limit: int) -> list[StoredMessage]:
+        """Đọc tối đa `limit` tin nhắn có số thứ tự >= seq (dùng cho các sink export)."""
+        messages: list[StoredMessage] = []
+        for segment in self._list_segments():
+            if len(messages) >= limit:
+                break
+            with segment.mapped() as (idx_mm, dat_mm, count):
+                if idx_mm is None or seq >= segment.base_seq + count:
+                    continue
+                start = max(seq, segment.base_seq) - segment.base_seq
+                for position in range(start, min(count, start + limit - len(messages))):
+                    messages.append(self._read(segment, idx_mm, dat_mm, position))
+        return messages
+
+    def next_seq(self) -> int:
+        segments = self._list_segments()
+        return segments[-1].base_seq + segments[-1].count() if segments else 0
+
+    def stats(self) -> dict[str, Any]:
+        segments = self._list_segments()
+        return {
+            "segments": len(segments),
+            "first_seq": segments[0].base_seq if segments else 0,
+            "next_seq": segments[-1].base_seq + segments[-1].count() if segments else 0,
+            "index_bytes": sum(s.count() * RECORD_SIZE for s in segments),
+            "payload_bytes": sum(s.data_size() for s in segments),
+            "topics": len(self._topics),
+        }
+
+
+class StoreExporter:
+    """
+    Đẩy dữ liệu từ kho MQTT sang một sink export (Excel, Google Sheet...) theo lô.
+
+    Mỗi exporter giữ con trỏ riêng (file `export-<name>.cursor`) nên sink lỗi sẽ được thử lại
+    từ đúng vị trí cũ, và chỉ một worker giữ khoá `export-<name>.lock` thực hiện export.
+    """
+
+    def __init__(
+        self,
+        store: MqttMessageStore,
+        sink: Callable[[list[MqttRow]], None],
+        name: str,
+        *,
+        batch_size: int = 500,
+        interval: float = 5.0,
+    ) -> None:
+        self.store = store
+        self.sink = sink
+        self.name = name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.cursor_path = os.path.join(store.directory, f"export-{name}.cursor")
+        self.lock_path = os.path.join(store.directory, f"export-{name}.lock")
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock_file: Any = None
+
+        self.exported = 0
+        self.errors = 0
+
+    def _read_cursor(self) -> int:
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_cursor(self, seq: int) -> None:
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(seq))
+        os.replace(tmp_path, self.cursor_path)
+
+    def _acquire_leadership(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a+b")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def export_once(self) -> int:
+        """Export một lô; trả về số bản ghi đã export."""
+        cursor = self._read_cursor()
+        messages = self.store.read_after(cursor, self.batch_size)
+        if not messages:
+            return 0
+        try:
+            self.sink([m.as_row() for m in messages])
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ Lỗi khi export MQTT sang {self.name}: {e}")
+            return 0
+        self._write_cursor(messages[-1].seq + 1)
+        self.exported += len(messages)
+        return len(messages)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            exported = 0
+            if self._acquire_leadership():
+                exported = self.export_once()
+            if exported < self.batch_size:
+                self._stop_event.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"mqtt-export-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> dict[str, Any]:
+        cursor = self._read_cursor()
+        return {
+            "leader": self._lock_file is not None,
+            "cursor": cursor,
+            "lag": max(0, self.store.next_seq() - cursor),
+            "exported": self.exported,
+            "errors": self.errors,
+        }
@@ -0,0 +1,114 @@
+# app/core/pagination.py
+
+import base64
+import json
+from enum import Enum
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import func, text
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Bảng nhỏ hơn mức này vẫn đếm chính xác khi chọn count=estimated (COUNT(*) đủ rẻ)
+EXACT_COUNT_BELOW = 10000
+
+ESTIMATE_QUERY = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+
+
+class CountMode(str, Enum):
+    exact = "exact"  # SELECT count(*)
+    estimated = "estimated"  # pg_class.reltuples (sau ANALYZE / autovacuum), bảng nhỏ đếm chính xác
+    none = "none"  # không đếm, trả count = null
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def key_column(model: Any) -> Any:
+    """Khoá sắp xếp ổn định của bảng: khoá chính (đã có index, duy nhất)."""
+    (column,) = model.__table__.primary_key.columns
+    return column
+
+
+def encode_key_cursor(name: str, values: list[Any]) -> str:
+    """Cursor mờ cho khoá sắp xếp `values` (có thể nhiều cột) của danh sách `name`."""
+    payload = json.dumps({"t": name, "k": [str(value) for value in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_key_cursor(name: str, cursor: str, parsers: list[Callable[[str], Any]]) -> list[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["t"] != name:
+            raise ValueError("cursor of another listing")
+        if len(payload["k"]) != len(parsers):
+            raise ValueError("wrong key length")
+        return [parse(value) for parse, value in zip(parsers, payload["k"])]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Cursor không hợp lệ: {e}") from e
+
+
+def encode_cursor(model: Any, value: Any) -> str:
+    return encode_key_cursor(model.__tablename__, [value])
+
+
+def decode_cursor(model: Any, cursor: str) -> Any:
+    try:
+        python_type = key_column(model).type.python_type
+    except NotImplementedError:
+        # AutoString của sqlmodel không khai báo python_type
+        python_type = str
+    (value,) = decode_key_cursor(model.__tablename__, cursor, [python_type])
+    return value
+
+
+def apply_keyset(statement: Any, model: Any, *, skip: int = 0, limit: int = 100, cursor: str | None = None) -> Any:
+    """
+    Sắp xếp theo khoá chính và cắt trang: có `cursor` thì `WHERE key > <cursor>` (dùng index,
+    không phụ thuộc độ sâu trang), không có thì OFFSET `skip` như cũ. Lấy thêm một dòng để biết
+    còn trang sau hay không (xem `split_page`).
+    """
+    column = key_column(model)
+    statement = statement.order_by(column)
+    if cursor:
+        statement = statement.where(column > decode_cursor(model, cursor))
+    elif skip:
+        statement = statement.offset(skip)
+    return statement.limit(max(limit, 0) + 1)
+
+
+def split_page(rows: Any, model: Any, limit: int) -> tuple[list[Any], str | None]:
+    rows = list(rows)
+    if limit <= 0:
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(model, getattr(rows[-1], key_column(model).key))
+
+
+def _use_estimate(session: Session | AsyncSession, mode: CountMode) -> bool:
+    return mode == CountMode.estimated and session.get_bind().dialect.name == "postgresql"
+
+
+def count_rows(session: Session, model: Any, mode: CountMode = CountMode.exact) -> int | None:
+    if mode == CountMode.none:
+        return None
+    if _use_estimate(session, mode):
+        estimate = session.execute(ESTIMATE_QUERY, {"table": model.__tablename__}).scalar()
+        # -1: bảng chưa từng được ANALYZE
+        if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+            return int(estimate)
+    return session.exec(select(func.count()).select_from(model)).one()
+
+
+async def count_rows_async(session: AsyncSession, model: Any, mode: CountMode = CountMode.exact) -> int | None:
+    if mode == CountMode.none:
+        return None
+    if _use_estimate(session, mode):
+        estimate = (await session.execute(ESTIMATE_QUERY, {"table": model.__tablename__})).scalar()
+        if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+            return int(estimate)
+    return (await session.exec(select(func.count()).select_from(model))).one()
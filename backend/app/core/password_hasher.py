@@ -0,0 +1,142 @@
+# app/core/password_hasher.py
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusyError(Exception):
+    """Quá nhiều yêu cầu băm mật khẩu đang chờ: trả về 503 thay vì làm nghẽn cả API."""
+
+
+@lru_cache
+def crypt_context(rounds: int) -> CryptContext:
+    # min/max = rounds: hash tạo với cost khác sẽ được đánh dấu cần băm lại khi đăng nhập
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    return crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Băm/kiểm tra mật khẩu bcrypt trong một process pool riêng (mỗi worker API một pool).
+
+    - Tối đa `max_concurrency` yêu cầu được xử lý cùng lúc; yêu cầu khác chờ tối đa
+      `admission_timeout` giây rồi bị từ chối bằng `PasswordHasherBusyError`.
+    - `workers = 0`: chạy ngay trong luồng gọi (script, test).
+    - `verify_and_update` trả về hash mới khi hash cũ dùng cost khác `rounds`.
+    """
+
+    def __init__(
+        self,
+        *,
+        rounds: int = 12,
+        workers: int = 2,
+        max_concurrency: int = 4,
+        admission_timeout: float = 2.0,
+    ) -> None:
+        self.rounds = rounds
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.admission_timeout = admission_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.rehashed = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self.verify_and_update(password, hashed_password)[0]
+
+    def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        verified, new_hash = self._run(_verify_and_update, password, hashed_password, self.rounds)
+        if new_hash is not None:
+            self.rehashed += 1
+        return verified, new_hash
+
+    def _run(self, func: Callable[..., T], *args: Any) -> T:
+        queued_at = time.monotonic()
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            self.rejected += 1
+            raise PasswordHasherBusyError(
+                f"Hệ thống đang bận xử lý mật khẩu (quá {self.admission_timeout}s chờ), vui lòng thử lại"
+            )
+        started = time.monotonic()
+        queue_ms = (started - queued_at) * 1000
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.total_queue_ms += queue_ms
+            self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+        try:
+            if self.workers <= 0:
+                return func(*args)
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.total_run_ms += (time.monotonic() - started) * 1000
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"🔐 Khởi tạo pool băm mật khẩu: {self.workers} process, bcrypt cost {self.rounds}")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        completed = self.submitted - self.in_flight
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "submitted": self.submitted,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_queue_ms": round(self.total_queue_ms / self.submitted, 3) if self.submitted else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 3),
+            "avg_run_ms": round(self.total_run_ms / completed, 3) if completed else 0.0,
+        }
@@ -0,0 +1,126 @@
+# app/core/principal_cache.py
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation import ALL_KEYS, invalidation_bus, publish_on_commit
+from app.models import User
+
+PRINCIPAL_TOPIC = "principal"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Thông tin người dùng đã xác thực, đủ cho các dependency phân quyền (không gắn với session)."""
+    id: uuid.UUID
+    email: str
+    full_name: str | None
+    is_active: bool
+    is_superuser: bool
+    system_rank: int | None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            system_rank=user.system_rank,
+        )
+
+
+class PrincipalCache:
+    """
+    Bộ nhớ đệm `Principal` theo user id, có TTL và giới hạn số phần tử (LRU).
+
+    Bị xoá khi một bản ghi User được sửa/xoá và commit (xem `_track_user_changes`), thông báo
+    được phát tới mọi worker qua `invalidation_bus`. Kết quả đọc DB đang chạy dở khi có thông báo
+    sẽ không được lưu (so generation) để không ghi đè dữ liệu cũ vào cache.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Principal, float]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, user_id: str) -> tuple[Principal | None, int]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0], self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def _store(self, user_id: str, user: User | None, generation: int) -> Principal | None:
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def get_or_load(self, user_id: str, load: Callable[[], User | None]) -> Principal | None:
+        principal, generation = self._lookup(user_id)
+        if principal is not None:
+            return principal
+        return self._store(user_id, load(), generation)
+
+    async def get_or_load_async(self, user_id: str, load: Callable[[], Awaitable[User | None]]) -> Principal | None:
+        principal, generation = self._lookup(user_id)
+        if principal is not None:
+            return principal
+        return self._store(user_id, await load(), generation)
+
+    def invalidate(self, user_id: str = ALL_KEYS) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if user_id == ALL_KEYS:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(ttl=settings.PRINCIPAL_CACHE_TTL, max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+invalidation_bus.subscribe(PRINCIPAL_TOPIC, principal_cache.invalidate)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_user_changes(session: Session, flush_context: Any) -> None:
+    # update_user, delete_user, đổi mật khẩu / system_rank ... đều đi qua flush của ORM
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            publish_on_commit(session, PRINCIPAL_TOPIC, str(obj.id))
@@ -0,0 +1,136 @@
+# app/core/rbac.py
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.invalidation import ALL_KEYS, invalidation_bus, publish_on_commit
+from app.models import Role, UserProjectRole
+
+RBAC_TOPIC = "rbac"
+
+
+class ProjectRankCache:
+    """
+    Bảng `{project_id: rank}` của từng user, nạp một lần bằng một truy vấn UserProjectRole JOIN Role.
+
+    Mỗi phần tử mang version lúc bắt đầu nạp: `invalidate(user_id)` tăng version của user đó,
+    `invalidate()` (vd. sửa rank của một Role) tăng version chung; phần tử lệch version bị nạp lại
+    và kết quả nạp dở lúc có thay đổi không được lưu.
+    User có nhiều vai trò trong cùng dự án: lấy rank cao nhất (số nhỏ nhất).
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[uuid.UUID, tuple[dict[uuid.UUID, int], tuple[int, int], float]] = OrderedDict()
+        self._global_version = 0
+        self._user_versions: dict[uuid.UUID, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _version(self, user_id: uuid.UUID) -> tuple[int, int]:
+        return self._global_version, self._user_versions.get(user_id, 0)
+
+    def _lookup(self, user_id: uuid.UUID) -> tuple[dict[uuid.UUID, int] | None, tuple[int, int]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            version = self._version(user_id)
+            if entry is not None and entry[1] == version and entry[2] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0], version
+            self.misses += 1
+            return None, version
+
+    @staticmethod
+    def _statement(user_id: uuid.UUID) -> Any:
+        return (
+            select(UserProjectRole.project_id, Role.rank)
+            .join(Role, Role.id == UserProjectRole.role_id)
+            .where(UserProjectRole.user_id == user_id)
+        )
+
+    def _store(self, user_id: uuid.UUID, rows: Any, version: tuple[int, int]) -> dict[uuid.UUID, int]:
+        ranks: dict[uuid.UUID, int] = {}
+        for project_id, rank in rows:
+            if project_id not in ranks or rank < ranks[project_id]:
+                ranks[project_id] = rank
+
+        with self._lock:
+            if self._version(user_id) == version:
+                self._entries[user_id] = (ranks, version, time.monotonic() + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return ranks
+
+    def ranks(self, session: Session, user_id: uuid.UUID) -> dict[uuid.UUID, int]:
+        ranks, version = self._lookup(user_id)
+        if ranks is not None:
+            return ranks
+        return self._store(user_id, session.exec(self._statement(user_id)).all(), version)
+
+    async def ranks_async(self, session: AsyncSession, user_id: uuid.UUID) -> dict[uuid.UUID, int]:
+        ranks, version = self._lookup(user_id)
+        if ranks is not None:
+            return ranks
+        result = await session.exec(self._statement(user_id))
+        return self._store(user_id, result.all(), version)
+
+    def rank_in_project(self, session: Session, user_id: uuid.UUID, project_id: uuid.UUID) -> int | None:
+        return self.ranks(session, user_id).get(project_id)
+
+    async def rank_in_project_async(
+        self, session: AsyncSession, user_id: uuid.UUID, project_id: uuid.UUID
+    ) -> int | None:
+        return (await self.ranks_async(session, user_id)).get(project_id)
+
+    def invalidate(self, user_id: str = ALL_KEYS) -> None:
+        with self._lock:
+            self.invalidations += 1
+            if user_id == ALL_KEYS:
+                self._global_version += 1
+                self._entries.clear()
+            else:
+                key = uuid.UUID(user_id)
+                self._user_versions[key] = self._user_versions.get(key, 0) + 1
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+project_rank_cache = ProjectRankCache(ttl=settings.RBAC_CACHE_TTL, max_entries=settings.RBAC_CACHE_MAX_ENTRIES)
+invalidation_bus.subscribe(RBAC_TOPIC, project_rank_cache.invalidate)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_role_changes(session: Session, flush_context: Any) -> None:
+    # Thêm/sửa/xoá phân quyền (UserProjectRole.py, crud) chỉ ảnh hưởng user đó;
+    # sửa/xoá một Role ảnh hưởng mọi user có vai trò này
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, UserProjectRole):
+            publish_on_commit(session, RBAC_TOPIC, str(obj.user_id))
+            for old_user_id in inspect(obj).attrs.user_id.history.deleted or ():
+                publish_on_commit(session, RBAC_TOPIC, str(old_user_id))
+        elif isinstance(obj, Role) and obj not in session.new:
+            publish_on_commit(session, RBAC_TOPIC, ALL_KEYS)
@@ -0,0 +1,293 @@
+# app/core/renditions.py
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageOps, features
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+# Ảnh phái sinh nằm chung một thư mục (tên theo hash nội dung), manifest theo đường dẫn ảnh gốc
+RENDITIONS_FOLDER = "renditions"
+MANIFEST_FOLDER = "_manifest"
+SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+SAVE_OPTIONS: dict[str, dict[str, Any]] = {
+    "avif": {"quality": 50},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+
+def supported_formats(formats: list[str]) -> list[str]:
+    """Bỏ các định dạng mà bản Pillow đang cài không mã hoá được (thiếu libavif/libwebp)."""
+    usable = [fmt for fmt in formats if fmt in SAVE_OPTIONS and (fmt in ("jpeg", "png") or features.check(fmt))]
+    for fmt in set(formats) - set(usable):
+        logger.warning(f"⚠️ Pillow không hỗ trợ định dạng '{fmt}', bỏ qua khi tạo ảnh phái sinh")
+    return usable
+
+
+def manifest_path(static_dir: Path, source: Path) -> Path:
+    relative = source.resolve().relative_to(static_dir.resolve())
+    return static_dir / RENDITIONS_FOLDER / MANIFEST_FOLDER / f"{relative.as_posix()}.json"
+
+
+def _write_atomic(path: Path, write: Any) -> None:
+    # Tên file tạm riêng cho mỗi lần ghi: nhiều process có thể ghi cùng một đích
+    part = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+    try:
+        write(part)
+        os.replace(part, path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+
+def normalize(image: Image.Image) -> Image.Image:
+    """Xoay theo EXIF và đưa về RGB/RGBA (ảnh P, CMYK, L... không mã hoá thẳng sang AVIF/WebP được)."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    return image
+
+
+def resize_to_width(image: Image.Image, width: int) -> Image.Image:
+    if width >= image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def save_image(image: Image.Image, target: Path, fmt: str) -> None:
+    if fmt == "jpeg" and image.mode == "RGBA":
+        image = image.convert("RGB")
+    _write_atomic(target, lambda part: image.save(part, format=fmt.upper(), **SAVE_OPTIONS[fmt]))
+
+
+def render_renditions(source: str, static_dir: str, widths: list[int], formats: list[str]) -> dict[str, Any]:
+    """
+    Tạo các bản thu nhỏ của `source` theo từng chiều rộng (không phóng to) và định dạng, tên file là
+    hash nội dung ảnh gốc + chiều rộng, rồi ghi manifest. Chạy trong process con; an toàn khi chạy lại.
+    """
+    source_path, static_path = Path(source), Path(static_dir)
+    data = source_path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    output_dir = static_path / RENDITIONS_FOLDER
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    renditions: dict[str, dict[str, str]] = {}
+    with Image.open(io.BytesIO(data)) as opened:
+        image = normalize(opened)
+        targets = sorted({w for w in widths if w <= image.width}) or [image.width]
+        for width in targets:
+            resized = resize_to_width(image, width)
+            for fmt in formats:
+                filename = f"{digest}-{width}.{fmt}"
+                target = output_dir / filename
+                # Cùng nội dung + chiều rộng: file đã có là đúng, không cần mã hoá lại
+                if not target.exists():
+                    save_image(resized, target, fmt)
+                renditions.setdefault(fmt, {})[str(width)] = filename
+        size = image.size
+
+    manifest = {
+        "source": source_path.resolve().relative_to(static_path.resolve()).as_posix(),
+        "hash": digest,
+        "width": size[0],
+        "height": size[1],
+        "renditions": renditions,
+    }
+    target = manifest_path(static_path, source_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(target, lambda part: part.write_text(json.dumps(manifest), encoding="utf-8"))
+    return manifest
+
+
+class ImageRenditions:
+    """
+    Tạo ảnh phái sinh (nhiều chiều rộng, AVIF/WebP) sau khi upload trong một process pool riêng và
+    trả về map `srcset` cho URL ảnh.
+
+    - `submit` không chờ: ảnh mới có srcset khi process con ghi xong manifest.
+    - Manifest đã đọc được giữ trong LRU `cache_size` phần tử (nội dung không đổi vì tên ảnh gốc là
+      uuid); ảnh chưa có manifest được kiểm tra lại sau `retry_missing_after` giây.
+    - `workers = 0`: tạo ngay trong luồng gọi (script, test).
+    """
+
+    def __init__(
+        self,
+        static_dir: Path = STATIC_DIR,
+        *,
+        widths: list[int],
+        formats: list[str],
+        workers: int = 1,
+        cache_size: int = 10000,
+        retry_missing_after: float = 5.0,
+    ) -> None:
+        self.static_dir = static_dir
+        self.widths = sorted(widths)
+        self.formats = supported_formats(formats)
+        self.workers = workers
+        self.cache_size = cache_size
+        self.retry_missing_after = retry_missing_after
+        self._cache: OrderedDict[Path, tuple[dict[str, Any] | None, float]] = OrderedDict()
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.rendered = 0
+        self.failed = 0
+        self.total_render_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, source: Path) -> dict[str, Any]:
+        started = time.monotonic()
+        manifest = render_renditions(str(source), str(self.static_dir), self.widths, self.formats)
+        self._rendered(source, manifest, started)
+        return manifest
+
+    def submit(self, source: Path) -> Future[dict[str, Any]] | None:
+        if not self.formats or source.suffix.lower() not in SOURCE_SUFFIXES:
+            return None
+        with self._lock:
+            self.submitted += 1
+        if self.workers <= 0:
+            try:
+                self.render(source)
+            except Exception as e:
+                self._failed(source, e)
+            return None
+        started = time.monotonic()
+        future = self._get_executor().submit(
+            render_renditions, str(source), str(self.static_dir), self.widths, self.formats
+        )
+
+        def done(future: Future[dict[str, Any]]) -> None:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                self._failed(source, error)
+            else:
+                self._rendered(source, future.result(), started)
+
+        future.add_done_callback(done)
+        return future
+
+    def _rendered(self, source: Path, manifest: dict[str, Any], started: float) -> None:
+        with self._lock:
+            self.rendered += 1
+            self.total_render_ms += (time.monotonic() - started) * 1000
+            self._remember(source, manifest)
+
+    def _failed(self, source: Path, error: BaseException) -> None:
+        with self._lock:
+            self.failed += 1
+        logger.error(f"❌ Không tạo được ảnh phái sinh cho '{source}': {error}")
+
+    def _remember(self, source: Path, manifest: dict[str, Any] | None) -> None:
+        expires = float("inf") if manifest is not None else time.monotonic() + self.retry_missing_after
+        self._cache[source] = (manifest, expires)
+        self._cache.move_to_end(source)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _is_cached(self, source: Path) -> bool:
+        cached = self._cache.get(source)
+        return cached is not None and cached[1] > time.monotonic()
+
+    def _load(self, source: Path) -> dict[str, Any] | None:
+        try:
+            manifest = json.loads(manifest_path(self.static_dir, source).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = None
+        with self._lock:
+            self._remember(source, manifest)
+        return manifest
+
+    def manifest(self, source: Path) -> dict[str, Any] | None:
+        with self._lock:
+            if self._is_cached(source):
+                self.hits += 1
+                self._cache.move_to_end(source)
+                return self._cache[source][0]
+            self.misses += 1
+        return self._load(source)
+
+    async def preload(self, sources: Iterable[Path]) -> None:
+        """
+        Đọc trước (một lần, ngoài event loop) các manifest chưa có trong bộ nhớ đệm, để `srcset` trong
+        route async không đọc file trên event loop.
+        """
+        with self._lock:
+            missing = [source for source in dict.fromkeys(sources) if not self._is_cached(source)]
+        if missing:
+            await asyncio.to_thread(lambda: [self._load(source) for source in missing])
+
+    def srcset(self, source: Path, static_url: str) -> dict[str, str] | None:
+        """`{"avif": "<url> 320w, <url> 640w", "webp": ...}` với `static_url` là URL của thư mục static."""
+        manifest = self.manifest(source)
+        if not manifest:
+            return None
+        prefix = f"{static_url.rstrip('/')}/{RENDITIONS_FOLDER}"
+        return {
+            fmt: ", ".join(f"{prefix}/{filename} {width}w" for width, filename in sorted(by_width.items(), key=lambda item: int(item[0])))
+            for fmt, by_width in manifest["renditions"].items()
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"🖼️ Khởi tạo pool tạo ảnh phái sinh: {self.workers} process, {self.formats} × {self.widths}")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "widths": self.widths,
+            "formats": self.formats,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "pending": self.submitted - self.rendered - self.failed,
+            "avg_render_ms": round(self.total_render_ms / self.rendered, 3) if self.rendered else 0.0,
+            "cached_manifests": len(self._cache),
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+image_renditions = ImageRenditions(
+    widths=settings.IMAGE_RENDITION_WIDTHS,
+    formats=settings.IMAGE_RENDITION_FORMATS,
+    workers=settings.IMAGE_RENDITION_WORKERS,
+)
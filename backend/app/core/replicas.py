@@ -0,0 +1,203 @@
+# app/core/replicas.py
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_TOPIC = "replica_sticky"
+
+# Độ trễ áp dụng WAL của replica (giây); 0 khi đã áp dụng hết WAL nhận được
+# (tránh báo trễ giả khi primary không có giao dịch mới)
+LAG_QUERY = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
+
+Probe = Callable[[Any], Awaitable[float]]
+
+# Danh sách commit của request hiện tại (xem `track_writes`); None: không theo dõi
+_request_writes: ContextVar[list[bool] | None] = ContextVar("request_writes", default=None)
+
+
+@contextmanager
+def track_writes() -> Iterator[list[bool]]:
+    """Ghi nhận các Session commit trong request hiện tại (kể cả route đồng bộ chạy trong threadpool)."""
+    writes: list[bool] = []
+    token = _request_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _request_writes.reset(token)
+
+
+@event.listens_for(Session, "after_commit")
+def _note_commit(session: Session) -> None:
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.append(True)
+
+
+async def measure_lag(engine: Any) -> float:
+    async with engine.connect() as conn:
+        return float((await conn.execute(LAG_QUERY)).scalar() or 0)
+
+
+@dataclass
+class _Replica:
+    engine: Any
+    lag: float | None = None  # None: chưa đo được
+    down_until: float = 0.0
+    reads: int = 0
+    failures: int = 0
+
+
+class ReplicaRouter:
+    """
+    Chọn engine cho các dependency chỉ đọc: lần lượt qua các replica còn dùng được, ngược lại primary.
+
+    Replica chỉ được dùng sau khi đo độ trễ (mỗi `check_interval` giây) và độ trễ không quá `max_lag`;
+    replica lỗi kết nối bị bỏ qua `retry_after` giây. User vừa commit một thay đổi được đọc từ primary
+    trong `sticky_for` giây (không nhỏ hơn `max_lag`) để luôn thấy dữ liệu mình vừa ghi.
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        replicas: list[Any],
+        *,
+        max_lag: float = 5.0,
+        sticky_for: float = 5.0,
+        check_interval: float = 2.0,
+        retry_after: float = 30.0,
+        max_sticky: int = 10000,
+        probe: Probe = measure_lag,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.primary = primary
+        self.max_lag = max_lag
+        self.sticky_for = max(sticky_for, max_lag)
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.max_sticky = max_sticky
+        self._replicas = [_Replica(engine) for engine in replicas]
+        self._probe = probe
+        self._clock = clock
+        self._sticky: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._cursor = itertools.count()
+        self._task: asyncio.Task | None = None
+
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._replicas)
+
+    def _usable(self, replica: _Replica, now: float) -> bool:
+        return replica.down_until <= now and replica.lag is not None and replica.lag <= self.max_lag
+
+    def engine_for_read(self, key: str | None = None) -> Any:
+        if not self._replicas:
+            self.primary_reads += 1
+            return self.primary
+        now = self._clock()
+        if key is not None:
+            with self._lock:
+                sticky_until = self._sticky.get(key)
+            if sticky_until is not None and sticky_until > now:
+                self.sticky_reads += 1
+                return self.primary
+        usable = [replica for replica in self._replicas if self._usable(replica, now)]
+        if not usable:
+            self.fallbacks += 1
+            return self.primary
+        replica = usable[next(self._cursor) % len(usable)]
+        replica.reads += 1
+        return replica.engine
+
+    def mark_write(self, key: str) -> None:
+        """Đọc của `key` (user id) đi về primary trong `sticky_for` giây tới."""
+        now = self._clock()
+        with self._lock:
+            self._sticky[key] = now + self.sticky_for
+            self._sticky.move_to_end(key)
+            # Thời hạn tăng dần theo thứ tự chèn: bỏ các phần tử đã hết hạn ở đầu
+            while self._sticky and (next(iter(self._sticky.values())) <= now or len(self._sticky) > self.max_sticky):
+                self._sticky.popitem(last=False)
+
+    def report_failure(self, engine: Any, error: BaseException) -> None:
+        for replica in self._replicas:
+            if replica.engine is engine:
+                replica.failures += 1
+                replica.down_until = self._clock() + self.retry_after
+                logger.warning(f"⚠️ Replica {self._name(replica)} lỗi, đọc từ primary trong {self.retry_after:.0f}s: {error}")
+
+    async def check_replicas(self) -> None:
+        for replica in self._replicas:
+            try:
+                replica.lag = await self._probe(replica.engine)
+            except Exception as e:
+                replica.lag = None
+                self.report_failure(replica.engine, e)
+                continue
+            if replica.lag > self.max_lag:
+                logger.warning(f"🐢 Replica {self._name(replica)} trễ {replica.lag:.1f}s, tạm đọc từ primary")
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        if self._replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+    @staticmethod
+    def _name(replica: _Replica) -> str:
+        url = getattr(replica.engine, "url", None)
+        return url.render_as_string(hide_password=True) if url is not None else repr(replica.engine)
+
+    def stats(self) -> dict[str, Any]:
+        now = self._clock()
+        return {
+            "replicas": [
+                {
+                    "url": self._name(replica),
+                    "lag_seconds": None if replica.lag is None else round(replica.lag, 3),
+                    "usable": self._usable(replica, now),
+                    "reads": replica.reads,
+                    "failures": replica.failures,
+                }
+                for replica in self._replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+            "sticky_users": len(self._sticky),
+        }
@@ -2,11 +2,17 @@ from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
-from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.password_hasher import PasswordHasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt chạy trong process pool riêng, có giới hạn đồng thời (xem PasswordHasher)
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    admission_timeout=settings.PASSWORD_HASH_ADMISSION_TIMEOUT,
+)
 
 
 ALGORITHM = "HS256"
@@ -25,8 +31,13 @@ def create_access_token(subject: str | Any, expires_delta: timedelta, is_active:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Như `verify_password`, kèm hash mới nếu hash cũ dùng cost bcrypt khác `BCRYPT_ROUNDS`."""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
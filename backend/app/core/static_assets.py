@@ -0,0 +1,319 @@
+# app/core/static_assets.py
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+from app.core.renditions import RENDITIONS_FOLDER, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:  # tuỳ chọn: không có thì chỉ tạo bản .gz
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "asset-manifest.json"
+HASH_LENGTH = 12
+# "pk_3.1a2b3c4d5e6f.png" -> "pk_3.png"
+FINGERPRINT = re.compile(rf"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{{{HASH_LENGTH}}})(?P<suffix>\.[A-Za-z0-9]+)$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Ảnh JPG/PNG/WebP đã nén sẵn: chỉ nén trước các định dạng văn bản
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".html", ".json", ".svg", ".txt", ".xml", ".map"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass(frozen=True)
+class Asset:
+    digest: str
+    size: int
+    mtime_ns: int
+    encodings: tuple[str, ...] = ()
+
+    @property
+    def fingerprint(self) -> str:
+        return self.digest[:HASH_LENGTH]
+
+    def etag(self, encoding: str | None = None) -> str:
+        # ETag mạnh: mỗi cách mã hoá là một biểu diễn riêng
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprinted(relative: str, fingerprint: str) -> str:
+    stem, suffix = os.path.splitext(relative)
+    return f"{stem}.{fingerprint}{suffix}"
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
+
+
+def precompress(path: Path, *, min_saving: float = 0.1) -> tuple[str, ...]:
+    """Tạo `<file>.br`/`<file>.gz` khi nhỏ hơn bản gốc ít nhất `min_saving`; xoá bản nén cũ không còn lợi."""
+    if path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+        return ()
+    data = path.read_bytes()
+    compressors: dict[str, Callable[[bytes], bytes]] = {"gzip": lambda raw: gzip.compress(raw, 9, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda raw: brotli.compress(raw, quality=11)
+    available = []
+    for encoding, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        compressed = compressors[encoding](data) if encoding in compressors else None
+        if compressed is not None and len(compressed) <= len(data) * (1 - min_saving):
+            variant.write_bytes(compressed)
+            available.append(encoding)
+        else:
+            variant.unlink(missing_ok=True)
+    return tuple(available)
+
+
+class StaticManifest:
+    """
+    Hash nội dung các file trong thư mục static để dựng URL có fingerprint (`pk_3.<hash>.png`), được
+    phục vụ với `Cache-Control: immutable` (xem `ImmutableStaticFiles`).
+
+    - Manifest dựng sẵn (`python -m app.build_static_manifest`) được nạp khi khởi động; file chưa có
+      trong manifest được hash ở luồng nền, trong lúc đó URL giữ tên gốc (không cache lâu).
+    - Mỗi mục được kiểm tra lại mtime/kích thước sau `revalidate_after` giây; file bị thay thì URL đổi.
+    - Thư mục `renditions` đã đặt tên theo hash nội dung nên không cần hash lại.
+    """
+
+    def __init__(
+        self,
+        static_dir: Path = STATIC_DIR,
+        *,
+        revalidate_after: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.static_dir = static_dir
+        self.revalidate_after = revalidate_after
+        self._clock = clock
+        self._assets: dict[str, tuple[Asset, float]] = {}
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="static-manifest")
+
+        self.hashed = 0
+        self.fingerprinted_urls = 0
+        self.plain_urls = 0
+
+    @staticmethod
+    def is_content_addressed(relative: str) -> bool:
+        return relative.split("/", 1)[0] == RENDITIONS_FOLDER
+
+    def path_of(self, relative: str) -> Path:
+        return self.static_dir / relative
+
+    def load(self) -> int:
+        try:
+            entries = json.loads((self.static_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return 0
+        now = self._clock()
+        with self._lock:
+            for relative, entry in entries.items():
+                entry["encodings"] = tuple(entry.get("encodings", ()))
+                self._assets[relative] = (Asset(**entry), now)
+        logger.info(f"📦 Nạp manifest static: {len(entries)} file")
+        return len(entries)
+
+    def _hash(self, relative: str, stat: os.stat_result, encodings: tuple[str, ...] | None = None) -> Asset:
+        path = self.path_of(relative)
+        if encodings is None:
+            # Bản nén cũ hơn file gốc là của nội dung trước đó: không dùng
+            encodings = tuple(
+                encoding for encoding, suffix in ENCODINGS
+                if _mtime_ns(path.with_name(path.name + suffix)) >= stat.st_mtime_ns
+            )
+        asset = Asset(hash_file(path), stat.st_size, stat.st_mtime_ns, encodings)
+        with self._lock:
+            self._assets[relative] = (asset, self._clock())
+            self.hashed += 1
+        return asset
+
+    def current(self, relative: str) -> Asset | None:
+        """Asset đúng với nội dung file hiện tại (hash lại nếu cần); None nếu không có file. Gọi trong luồng."""
+        try:
+            stat = self.path_of(relative).stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        known = self.known(relative, stat)
+        return known if known is not None else self._hash(relative, stat)
+
+    def known(self, relative: str, stat: os.stat_result) -> Asset | None:
+        """Asset đã hash khớp `stat` (không đọc file)."""
+        with self._lock:
+            entry = self._assets.get(relative)
+        if entry is None or (entry[0].mtime_ns, entry[0].size) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return entry[0]
+
+    def url_path(self, relative: str) -> str:
+        """Đường dẫn (trong thư mục static) dùng để dựng URL: có fingerprint nếu đã biết hash hiện tại."""
+        with self._lock:
+            entry = self._assets.get(relative)
+        asset = entry[0] if entry else None
+        if asset is not None and self._clock() - entry[1] > self.revalidate_after:
+            try:
+                stat = self.path_of(relative).stat()
+            except OSError:
+                stat = None
+            if stat is not None and (asset.mtime_ns, asset.size) == (stat.st_mtime_ns, stat.st_size):
+                with self._lock:
+                    self._assets[relative] = (asset, self._clock())
+            else:
+                asset = None
+        if asset is None:
+            self._schedule(relative)
+            self.plain_urls += 1
+            return relative
+        self.fingerprinted_urls += 1
+        return fingerprinted(relative, asset.fingerprint)
+
+    def _schedule(self, relative: str) -> None:
+        if self.is_content_addressed(relative):
+            return
+        with self._lock:
+            if relative in self._pending:
+                return
+            self._pending.add(relative)
+
+        def run() -> None:
+            try:
+                self.current(relative)
+            except OSError as e:
+                logger.warning(f"⚠️ Không hash được file static '{relative}': {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(relative)
+
+        self._executor.submit(run)
+
+    def _walk(self) -> Iterator[str]:
+        skip = {self.static_dir / RENDITIONS_FOLDER}
+        for directory, subdirs, filenames in os.walk(self.static_dir):
+            subdirs[:] = [d for d in subdirs if Path(directory, d) not in skip]
+            for filename in filenames:
+                if filename == MANIFEST_NAME or filename.endswith((".br", ".gz", ".part")):
+                    continue
+                yield Path(directory, filename).relative_to(self.static_dir).as_posix()
+
+    def build(self, *, compress: bool = True) -> dict[str, Any]:
+        """Hash (và nén trước) toàn bộ file static, ghi `asset-manifest.json`."""
+        entries: dict[str, Any] = {}
+        for relative in sorted(self._walk()):
+            path = self.path_of(relative)
+            encodings = precompress(path) if compress else None
+            entries[relative] = asdict(self._hash(relative, path.stat(), encodings))
+        target = self.static_dir / MANIFEST_NAME
+        part = target.with_name(target.name + ".part")
+        part.write_text(json.dumps(entries, indent=0, sort_keys=True), encoding="utf-8")
+        os.replace(part, target)
+        return entries
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "assets": len(self._assets),
+            "pending": len(self._pending),
+            "hashed": self.hashed,
+            "fingerprinted_urls": self.fingerprinted_urls,
+            "plain_urls": self.plain_urls,
+        }
+
+
+def _accepted_encodings(request_headers: Headers) -> set[str]:
+    accepted = set()
+    for token in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = token.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.lower())
+    return accepted
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles phục vụ URL có fingerprint với `Cache-Control: immutable`, ETag mạnh theo hash nội dung
+    và bản nén trước `.br`/`.gz` nếu có. URL tên gốc vẫn dùng được nhưng luôn phải xác thực lại (`no-cache`).
+    """
+
+    def __init__(self, *, manifest: StaticManifest, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        match = FINGERPRINT.match(os.path.basename(path))
+        if match and scope["method"] in ("GET", "HEAD") and not path.startswith(("/", "\\", "..")):
+            relative = Path(os.path.dirname(path), match["stem"] + match["suffix"]).as_posix()
+            asset = await anyio.to_thread.run_sync(self.manifest.current, relative)
+            # Hash cũ (file đã bị thay): không phục vụ nội dung mới dưới URL bất biến cũ
+            if asset is not None and asset.fingerprint == match["hash"]:
+                return self.asset_response(relative, asset, scope)
+        return await super().get_response(path, scope)
+
+    def asset_response(self, relative: str, asset: Asset, scope: Scope) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = self.manifest.path_of(relative)
+        encoding = next(
+            (enc for enc, _ in ENCODINGS if enc in asset.encodings and enc in _accepted_encodings(request_headers)),
+            None,
+        )
+        headers = {"Cache-Control": IMMUTABLE, "ETag": asset.etag(encoding)}
+        if asset.encodings:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            full_path = full_path.with_name(full_path.name + dict(ENCODINGS)[encoding])
+        media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        response = FileResponse(full_path, media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def file_response(
+        self, full_path: Any, stat_result: os.stat_result, scope: Scope, status_code: int = 200
+    ) -> Response:
+        relative = Path(full_path).resolve().relative_to(Path(self.directory).resolve()).as_posix()
+        headers = {"Cache-Control": IMMUTABLE if self.manifest.is_content_addressed(relative) else "no-cache"}
+        asset = self.manifest.known(relative, stat_result)
+        if asset is not None:
+            headers["ETag"] = asset.etag()
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+static_manifest = StaticManifest()
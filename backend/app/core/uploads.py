@@ -0,0 +1,58 @@
+# app/core/uploads.py
+
+import asyncio
+import os
+import shutil
+from collections.abc import Awaitable, Callable, Iterable
+from pathlib import Path
+from typing import Any, BinaryIO, TypeVar
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def _copy_to(source: BinaryIO, target: Path, chunk_size: int) -> None:
+    part = target.with_name(target.name + ".part")
+    try:
+        with open(part, "wb") as out:
+            shutil.copyfileobj(source, out, length=chunk_size)
+        # Đổi tên nguyên tử: không bao giờ phục vụ một file ghi dở
+        os.replace(part, target)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+
+async def save_upload(file: UploadFile, target: Path, *, chunk_size: int | None = None) -> Path:
+    """
+    Ghi file upload xuống `target` theo từng khối `chunk_size` byte trong threadpool: không đọc cả file
+    vào bộ nhớ và không chặn event loop khi ghi đĩa.
+    """
+    await file.seek(0)
+    await asyncio.to_thread(_copy_to, file.file, target, chunk_size or settings.UPLOAD_CHUNK_SIZE)
+    return target
+
+
+async def remove_file(path: Path) -> bool:
+    """Xoá file trong threadpool; trả False nếu không còn file hoặc không xoá được."""
+    try:
+        await asyncio.to_thread(os.remove, path)
+        return True
+    except OSError:
+        return False
+
+
+async def gather_bounded(
+    items: Iterable[Any], handle: Callable[[Any], Awaitable[T]], *, limit: int | None = None
+) -> list[T | BaseException]:
+    """Chạy `handle` cho từng phần tử, tối đa `limit` cùng lúc; giữ thứ tự, lỗi được trả về thay vì ném ra."""
+    semaphore = asyncio.Semaphore(limit or settings.UPLOAD_CONCURRENCY)
+
+    async def run(item: Any) -> T:
+        async with semaphore:
+            return await handle(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
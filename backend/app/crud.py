@@ -1,21 +1,25 @@
 import uuid
+from collections.abc import Iterator
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import pytz
 
 from fastapi import HTTPException
-from sqlalchemy import  func
+from sqlalchemy import  func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlmodel import Session, delete, select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.pagination import CountMode, apply_keyset, count_rows, decode_key_cursor, encode_key_cursor, split_page
+from app.core.security import get_password_hash, verify_and_update_password
 from app.models import (
     DetalEcoRetreat, DetalEcoRetreatCreate, DetalEcoRetreatUpdate, User, UserCreate, UserUpdate,
     System, SystemCreate, SystemUpdate,
     Role, RoleCreate, RoleUpdate,
     ProjectList, ProjectCreate, ProjectUpdate,
     UserProjectRole, UserProjectRoleCreate,
-    Request, RequestCreate, RequestUpdate,
-    Ecopark, EcoparkCreate, EcoparkUpdate,
+    Request, RequestCreate, RequestStatus, RequestUpdate,
+    Ecopark, EcoparkCreate, EcoparkUpdate, FileTombstone,
     AdministrativeRegionCreate, AdministrativeRegionUpdate, AdministrativeRegionList,
     AdministrativeUnitCreate, AdministrativeUnitUpdate, AdministrativeUnitList,
     ProvinceCreate, ProvinceUpdate, ProvinceList,
@@ -27,6 +31,13 @@ VN_TZ = pytz.timezone("Asia/Ho_Chi_Minh")
 def now_vn():
     return datetime.now(VN_TZ)
 
+def get_page(
+    *, session: Session, model: Any, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """Một trang của `model` theo khoá chính: `cursor` (keyset) hoặc `skip` (OFFSET); trả thêm cursor trang sau."""
+    statement = apply_keyset(select(model), model, skip=skip, limit=limit, cursor=cursor)
+    return split_page(session.exec(statement).all(), model, limit)
+
 # ========== USER CRUD ==========
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -64,8 +75,17 @@ def get_user_by_email(*, session: Session, email: str) -> User | None:
 
 def authenticate(*, session: Session, email: str, password: str) -> Optional[User]:
     db_user = get_user_by_email(session=session, email=email)
-    if not db_user or not verify_password(password, db_user.hashed_password):
+    if not db_user:
+        return None
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # BCRYPT_ROUNDS đã đổi: lưu lại hash với cost mới
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        session.commit()
+        session.refresh(db_user)
     return db_user
 
 # ========== SYSTEM CRUD ==========
@@ -87,9 +107,8 @@ def update_system(*, session: Session, db_system: System, system_in: SystemUpdat
 def get_system(*, session: Session, system_id: uuid.UUID) -> Optional[System]:
     return session.get(System, system_id)
 
-def get_all_systems(*, session: Session, skip: int = 0, limit: int = 100) -> List[System]:
-    statement = select(System).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_all_systems(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[System], Optional[str]]:
+    return get_page(session=session, model=System, skip=skip, limit=limit, cursor=cursor)
 
 def delete_system(*, session: Session, db_system: System) -> System:
     session.delete(db_system)
@@ -120,9 +139,8 @@ def get_role_by_name(*, session: Session, name: str) -> Optional[Role]:
 def get_role(*, session: Session, role_id: uuid.UUID) -> Optional[Role]:
     return session.get(Role, role_id)
 
-def get_roles(*, session: Session, skip: int = 0, limit: int = 100) -> List[Role]:
-    statement = select(Role).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_roles(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Role], Optional[str]]:
+    return get_page(session=session, model=Role, skip=skip, limit=limit, cursor=cursor)
 
 def delete_role(*, session: Session, db_role: Role) -> Role:
     session.delete(db_role)
@@ -156,9 +174,8 @@ def update_project_list(*, session: Session, db_project: ProjectList, update_dat
 def get_project_list(*, session: Session, project_id: uuid.UUID) -> Optional[ProjectList]:
     return session.get(ProjectList, project_id)
 
-def get_all_project_lists(*, session: Session, skip: int = 0, limit: int = 100) -> List[ProjectList]:
-    statement = select(ProjectList).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_all_project_lists(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[ProjectList], Optional[str]]:
+    return get_page(session=session, model=ProjectList, skip=skip, limit=limit, cursor=cursor)
 
 def delete_project_list(*, session: Session, db_project: ProjectList) -> ProjectList:
     session.delete(db_project)
@@ -203,6 +220,96 @@ def delete_user_project_role(*, session: Session, db_upr: UserProjectRole) -> Us
     session.commit()
     return db_upr
 
+def _assignment_rows(
+    lang: str,
+    *,
+    project_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+    role_id: Optional[uuid.UUID] = None,
+) -> Any:
+    """Chỉ lấy các cột hiển thị của bản phân quyền (không dựng entity User/ProjectList/Role cho mỗi dòng)."""
+    statement = (
+        select(
+            UserProjectRole.id,
+            UserProjectRole.user_id,
+            User.email.label("user_email"),
+            UserProjectRole.project_id,
+            getattr(ProjectList, f"name_{lang}").label("project_name"),
+            UserProjectRole.role_id,
+            Role.name.label("role_name"),
+            Role.rank.label("role_rank"),
+        )
+        .join(User, UserProjectRole.user_id == User.id)
+        .join(ProjectList, UserProjectRole.project_id == ProjectList.id)
+        .join(Role, UserProjectRole.role_id == Role.id)
+    )
+    return _filter_assignments(statement, project_id=project_id, user_id=user_id, role_id=role_id)
+
+def _filter_assignments(statement: Any, **filters: Optional[uuid.UUID]) -> Any:
+    for name, value in filters.items():
+        if value is not None:
+            statement = statement.where(getattr(UserProjectRole, name) == value)
+    return statement
+
+def get_assignment(*, session: Session, user_project_role_id: uuid.UUID, lang: str = "en") -> Optional[Dict[str, Any]]:
+    row = session.exec(_assignment_rows(lang).where(UserProjectRole.id == user_project_role_id)).first()
+    return row._asdict() if row else None
+
+def get_assignments(
+    *,
+    session: Session,
+    lang: str = "en",
+    project_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+    role_id: Optional[uuid.UUID] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    statement = _assignment_rows(lang, project_id=project_id, user_id=user_id, role_id=role_id)
+    statement = apply_keyset(statement, UserProjectRole, skip=skip, limit=limit, cursor=cursor)
+    rows, next_cursor = split_page(session.exec(statement).all(), UserProjectRole, limit)
+    return [row._asdict() for row in rows], next_cursor
+
+def count_assignments(
+    *,
+    session: Session,
+    mode: CountMode = CountMode.exact,
+    project_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+    role_id: Optional[uuid.UUID] = None,
+) -> Optional[int]:
+    filters = dict(project_id=project_id, user_id=user_id, role_id=role_id)
+    if mode == CountMode.none or not any(filters.values()):
+        return count_rows(session, UserProjectRole, mode)
+    # Có bộ lọc thì không ước lượng được từ thống kê bảng: luôn đếm chính xác (dùng index của cột lọc)
+    statement = _filter_assignments(select(func.count()).select_from(UserProjectRole), **filters)
+    return session.exec(statement).one()
+
+def iter_assignments(
+    *,
+    session: Session,
+    lang: str = "en",
+    batch_size: int = 1000,
+    project_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+    role_id: Optional[uuid.UUID] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Duyệt toàn bộ bản phân quyền theo từng lô `batch_size` dòng (keyset theo id): bộ nhớ không phụ thuộc
+    kích thước bảng. Kết nối được trả về pool giữa các lô để client đọc chậm không giữ kết nối.
+    """
+    cursor: Optional[str] = None
+    while True:
+        rows, cursor = get_assignments(
+            session=session, lang=lang, project_id=project_id, user_id=user_id, role_id=role_id,
+            limit=batch_size, cursor=cursor,
+        )
+        session.rollback()
+        yield from rows
+        if cursor is None:
+            return
+
 # ========== REQUEST CRUD ==========
 
 def create_request(
@@ -299,6 +406,27 @@ def update_ecopark(*, session: Session, db_ecopark: Ecopark, ecopark_in: Ecopark
     return db_ecopark
 
 
+def upsert_ecoparks(*, session: Session, ecoparks: List[Dict[str, Any]]) -> None:
+    """
+    Thêm/cập nhật nhiều bản ghi Ecopark theo port trong một câu lệnh
+    (INSERT ... ON CONFLICT (port) DO UPDATE). Không cập nhật id, không commit.
+    Các port trong `ecoparks` phải khác nhau.
+    """
+    if not ecoparks:
+        return
+    table = Ecopark.__table__
+    statement = pg_insert(table).values(ecoparks)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.port],
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if column.name not in ("id", "port")
+        },
+    )
+    session.exec(statement)
+
+
 def delete_ecopark(*, session: Session, db_ecopark: Ecopark) -> Ecopark:
     session.delete(db_ecopark)
     session.commit()
@@ -328,10 +456,9 @@ def get_region(*, session: Session, region_id: int) -> Optional[AdministrativeRe
     """Lấy một vùng hành chính theo ID."""
     return session.get(AdministrativeRegionList, region_id)
 
-def get_all_regions(*, session: Session, skip: int = 0, limit: int = 100) -> List[AdministrativeRegionList]:
+def get_all_regions(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[AdministrativeRegionList], Optional[str]]:
     """Lấy tất cả các vùng hành chính."""
-    statement = select(AdministrativeRegionList).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    return get_page(session=session, model=AdministrativeRegionList, skip=skip, limit=limit, cursor=cursor)
 
 def delete_region(*, session: Session, db_region: AdministrativeRegionList) -> AdministrativeRegionList:
     """Xóa một vùng hành chính."""
@@ -363,10 +490,9 @@ def get_unit(*, session: Session, unit_id: int) -> Optional[AdministrativeUnitLi
     """Lấy một đơn vị hành chính theo ID."""
     return session.get(AdministrativeUnitList, unit_id)
 
-def get_all_units(*, session: Session, skip: int = 0, limit: int = 100) -> List[AdministrativeUnitList]:
+def get_all_units(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[AdministrativeUnitList], Optional[str]]:
     """Lấy tất cả các đơn vị hành chính."""
-    statement = select(AdministrativeUnitList).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    return get_page(session=session, model=AdministrativeUnitList, skip=skip, limit=limit, cursor=cursor)
 
 def delete_unit(*, session: Session, db_unit: AdministrativeUnitList) -> AdministrativeUnitList:
     """Xóa một đơn vị hành chính."""
@@ -398,10 +524,9 @@ def get_province(*, session: Session, province_code: str) -> Optional[ProvinceLi
     """Lấy một tỉnh/thành phố theo mã code."""
     return session.get(ProvinceList, province_code)
 
-def get_all_provinces(*, session: Session, skip: int = 0, limit: int = 100) -> List[ProvinceList]:
+def get_all_provinces(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[ProvinceList], Optional[str]]:
     """Lấy tất cả các tỉnh/thành phố."""
-    statement = select(ProvinceList).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    return get_page(session=session, model=ProvinceList, skip=skip, limit=limit, cursor=cursor)
 
 def delete_province(*, session: Session, db_province: ProvinceList) -> ProvinceList:
     """Xóa một tỉnh/thành phố."""
@@ -433,10 +558,9 @@ def get_ward(*, session: Session, ward_code: str) -> Optional[WardList]:
     """Lấy một phường/xã theo mã code."""
     return session.get(WardList, ward_code)
 
-def get_all_wards(*, session: Session, skip: int = 0, limit: int = 100) -> List[WardList]:
+def get_all_wards(*, session: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[WardList], Optional[str]]:
     """Lấy tất cả các phường/xã."""
-    statement = select(WardList).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    return get_page(session=session, model=WardList, skip=skip, limit=limit, cursor=cursor)
 
 def delete_ward(*, session: Session, db_ward: WardList) -> WardList:
     """Xóa một phường/xã."""
@@ -445,6 +569,12 @@ def delete_ward(*, session: Session, db_ward: WardList) -> WardList:
     return db_ward
 
 # ============================== DETAL ECO_RETREAT========================== ===
+# Thư mục (trong app/static) chứa ảnh chi tiết; tombstone lưu đường dẫn tương đối so với app/static
+DETAIL_IMAGE_FOLDER = "EcoRetreat/CHITIET"
+
+def detail_image_path(picture: str) -> str:
+    return f"{DETAIL_IMAGE_FOLDER}/{picture}"
+
 def get_detal_eco_retreat_by_id(session: Session, detal_id: uuid.UUID) -> Optional[DetalEcoRetreat]:
     """
     Lấy một bản ghi DetalEcoRetreat theo ID.
@@ -508,6 +638,21 @@ def create_detal_eco_retreat_record(session: Session, detal_in: DetalEcoRetreatC
     return detal_obj
 
 
+def create_detal_eco_retreat_records(session: Session, detals_in: List[DetalEcoRetreatCreate]) -> List[DetalEcoRetreat]:
+    """
+    Tạo nhiều bản ghi DetalEcoRetreat trong một giao dịch (một lần commit, INSERT theo lô).
+    Nạp lại các bản ghi bằng một câu SELECT thay vì refresh từng bản ghi.
+    """
+    detal_objs = [DetalEcoRetreat.model_validate(detal_in) for detal_in in detals_in]
+    if not detal_objs:
+        return []
+    ids = [detal_obj.id for detal_obj in detal_objs]
+    session.add_all(detal_objs)
+    session.commit()
+    session.exec(select(DetalEcoRetreat).where(DetalEcoRetreat.id.in_(ids))).all()
+    return detal_objs
+
+
 def update_detal_eco_retreat_record(
     session: Session, 
     db_detal: DetalEcoRetreat, 
@@ -518,6 +663,7 @@ def update_detal_eco_retreat_record(
     Chỉ cập nhật những trường có trong update_data.
     Yêu cầu ít nhất một trong description_vi hoặc description_en phải có giá trị (sau khi cập nhật).
     """
+    old_picture = db_detal.picture
     # sqlmodel_update sẽ chỉ cập nhật các trường có trong update_data.
     # Nếu một trường không có trong update_data, nó sẽ không bị thay đổi.
     db_detal.sqlmodel_update(update_data)
@@ -529,6 +675,9 @@ def update_detal_eco_retreat_record(
     if not temp_detal.description_vi and not temp_detal.description_en:
         raise ValueError("Sau khi cập nhật, phải có ít nhất một mô tả (tiếng Việt hoặc tiếng Anh).")
 
+    # Ảnh cũ bị thay: xoá file sau, cùng giao dịch với bản ghi
+    if old_picture and db_detal.picture != old_picture:
+        session.add(FileTombstone(path=detail_image_path(old_picture)))
     session.add(db_detal)
     session.commit()
     session.refresh(db_detal)
@@ -537,8 +686,10 @@ def update_detal_eco_retreat_record(
 
 def delete_detal_eco_retreat_record(session: Session, db_detal: DetalEcoRetreat) -> DetalEcoRetreat:
     """
-    Xóa một bản ghi DetalEcoRetreat.
+    Xóa một bản ghi DetalEcoRetreat; file ảnh được xoá nền (xem app.core.file_gc).
     """
+    if db_detal.picture:
+        session.add(FileTombstone(path=detail_image_path(db_detal.picture)))
     session.delete(db_detal)
     session.commit()
     return db_detal
@@ -551,9 +702,123 @@ def delete_detal_eco_retreat_records_by_ids(session: Session, detal_ids: List[uu
     if not detal_ids:
         return 0
     
-    # Sử dụng lệnh DELETE để xóa hàng loạt
-    statement = delete(DetalEcoRetreat).where(DetalEcoRetreat.id.in_(detal_ids))
-    
-    result = session.exec(statement)
+    # Sử dụng lệnh DELETE để xóa hàng loạt; file ảnh của các dòng đã xoá được ghi tombstone
+    # trong cùng giao dịch và xoá nền (xem app.core.file_gc)
+    statement = delete(DetalEcoRetreat).where(DetalEcoRetreat.id.in_(detal_ids)).returning(DetalEcoRetreat.picture)
+
+    pictures = session.execute(statement).scalars().all()
+    session.add_all(FileTombstone(path=detail_image_path(picture)) for picture in pictures if picture)
     session.commit()
-    return result.rowcount # Trả về số dòng đã bị ảnh hưởng (số bản ghi đã xóa)
\ No newline at end of file
+    return len(pictures) # Số bản ghi đã xóa
+
+
+# ============================== ASYNC (CHỈ ĐỌC) ==============================
+# Bản async của các hàm đọc dùng nhiều nhất, cho các route chạy trên AsyncSessionDep.
+# Các thao tác ghi vẫn dùng các hàm đồng bộ ở trên.
+
+async def get_project_list_async(*, session: AsyncSession, project_id: uuid.UUID) -> Optional[ProjectList]:
+    return await session.get(ProjectList, project_id)
+
+async def get_page_async(
+    *, session: AsyncSession, model: Any, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    statement = apply_keyset(select(model), model, skip=skip, limit=limit, cursor=cursor)
+    return split_page((await session.exec(statement)).all(), model, limit)
+
+async def get_all_project_lists_async(
+    *, session: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[ProjectList], Optional[str]]:
+    return await get_page_async(session=session, model=ProjectList, skip=skip, limit=limit, cursor=cursor)
+
+REQUEST_LISTING = "request"
+
+def _visible_requests(
+    statement: Any,
+    project_id: uuid.UUID,
+    viewer_rank: Optional[int],
+    *,
+    status: Optional[RequestStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Any:
+    """Điều kiện lọc Request của một dự án; `viewer_rank` None (superuser) thấy tất cả."""
+    statement = statement.where(Request.project_id == project_id)
+    if status is not None:
+        statement = statement.where(Request.status == status)
+    if created_from is not None:
+        statement = statement.where(Request.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Request.created_at < created_to)
+    if viewer_rank is not None:
+        # Chỉ thấy yêu cầu xin vai trò có rank thấp hơn (số lớn hơn) rank của mình
+        statement = statement.join(Role, Request.role_id == Role.id).where(Role.rank > viewer_rank)
+    return statement
+
+async def get_project_request_async(
+    *, session: AsyncSession, project_id: uuid.UUID, request_id: uuid.UUID, viewer_rank: Optional[int] = None
+) -> Optional[Request]:
+    statement = _visible_requests(select(Request), project_id, viewer_rank).where(Request.id == request_id)
+    return (await session.exec(statement)).first()
+
+async def get_project_requests_async(
+    *,
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    viewer_rank: Optional[int] = None,
+    status: Optional[RequestStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    count: CountMode = CountMode.exact,
+) -> Tuple[List[Request], Optional[int], Optional[str]]:
+    """
+    Yêu cầu mới nhất trước, sắp theo (created_at, id) và phân trang bằng `cursor` hoặc `skip`.
+    Tổng số được tính trong cùng truy vấn bằng `count(*) OVER()` (trước LIMIT/OFFSET); trang theo
+    cursor chỉ đếm khi được yêu cầu, bằng một COUNT(*) riêng. Không ước lượng được số dòng đã lọc:
+    `estimated` được coi như `exact`.
+    """
+    filters = dict(status=status, created_from=created_from, created_to=created_to)
+    windowed = count != CountMode.none and not cursor
+    columns = (Request, func.count().over().label("total")) if windowed else (Request,)
+    statement = _visible_requests(select(*columns), project_id, viewer_rank, **filters)
+    statement = statement.order_by(Request.created_at.desc(), Request.id.desc())
+    if cursor:
+        created_at, request_id = decode_key_cursor(REQUEST_LISTING, cursor, [datetime.fromisoformat, uuid.UUID])
+        statement = statement.where(tuple_(Request.created_at, Request.id) < tuple_(created_at, request_id))
+    elif skip:
+        statement = statement.offset(skip)
+    rows = (await session.exec(statement.limit(max(limit, 0) + 1))).all()
+
+    total: Optional[int] = None
+    if windowed:
+        requests = [row[0] for row in rows]
+        total = rows[0][1] if rows else None
+    else:
+        requests = list(rows)
+    if count != CountMode.none and total is None:
+        # Trang theo cursor, hoặc OFFSET vượt quá cuối danh sách (không còn dòng để đọc tổng)
+        counted = _visible_requests(select(Request.id), project_id, viewer_rank, **filters).subquery()
+        total = (await session.exec(select(func.count()).select_from(counted))).one()
+
+    next_cursor = None
+    if len(requests) > limit:
+        requests = requests[:max(limit, 0)]
+        if requests:
+            last = requests[-1]
+            next_cursor = encode_key_cursor(REQUEST_LISTING, [last.created_at.isoformat(), last.id])
+    return requests, total, next_cursor
+
+async def get_detal_eco_retreat_by_id_async(session: AsyncSession, detal_id: uuid.UUID) -> Optional[DetalEcoRetreat]:
+    return await session.get(DetalEcoRetreat, detal_id)
+
+async def get_all_detal_eco_retreats_by_ports_async(
+    session: AsyncSession, port: List[int], skip: int = 0, limit: int = 100
+) -> Tuple[List[DetalEcoRetreat], int]:
+    if not port:
+        return [], 0
+    condition = DetalEcoRetreat.port.in_(port)
+    total_count = (await session.exec(select(func.count()).where(condition))).one()
+    statement = select(DetalEcoRetreat).where(condition).offset(skip).limit(limit)
+    return (await session.exec(statement)).all(), total_count
@@ -1,14 +1,32 @@
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from fastapi.staticfiles import StaticFiles
+import logging
 import os
 
+from sqlmodel import Session
+
+from app.api.deps import subject_from_request
 from app.api.main import api_router
 from app.core.config import settings
-from app.core.mqtt import get_mqtt_client, mqtt_client
+from app.core.db import async_engine, engine, replica_router
+from app.core.file_gc import file_sweeper
+from app.core.image_cache import resized_image_cache
+from app.core.import_jobs import recover_import_jobs, shutdown_import_workers, start_stale_job_watch
+from app.core.invalidation import invalidation_bus
+from app.core.mqtt import light_scheduler, mqtt_service, start_mqtt_logging, stop_mqtt_logging
+from app.core.pagination import InvalidCursorError
+from app.core.password_hasher import PasswordHasherBusyError
+from app.core.renditions import image_renditions
+from app.core.replicas import READ_YOUR_WRITES_TOPIC, track_writes
+from app.core.security import password_hasher
+from app.core.static_assets import ImmutableStaticFiles, static_manifest
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -17,13 +35,43 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 # ✅ MQTT Lifespan handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Nghe thông báo làm mới bộ nhớ đệm từ các worker/node khác
+    invalidation_bus.start()
+    # Hash nội dung file static đã dựng sẵn (URL có fingerprint)
+    await run_in_threadpool(static_manifest.load)
+    # Đo độ trễ các replica chỉ đọc (nếu có cấu hình)
+    replica_router.start()
     # MQTT startup
-    get_mqtt_client()
+    start_mqtt_logging()
+    # Kết nối nền, không chờ broker trước khi nhận request
+    await mqtt_service.start()
+    await light_scheduler.start()
+    # Xoá nền các file ảnh đã có tombstone
+    file_sweeper.start()
+    # Tiếp tục/đánh dấu lỗi các job nhập Excel dở dang từ lần chạy trước
+    try:
+        with Session(engine) as session:
+            recover_import_jobs(session)
+    except Exception as e:
+        logger.error(f"❌ Không khôi phục được job nhập Excel: {e}")
+    # Job bị dừng giữa chừng (heartbeat còn mới lúc khởi động) được phát hiện sau
+    start_stale_job_watch(lambda: Session(engine))
     yield
-    # MQTT shutdown
-    if mqtt_client:
-        mqtt_client.loop_stop()
-        mqtt_client.disconnect()
+    shutdown_import_workers()
+    password_hasher.shutdown()
+    image_renditions.shutdown()
+    resized_image_cache.shutdown()
+    static_manifest.shutdown()
+    file_sweeper.stop()
+    invalidation_bus.stop()
+    # MQTT shutdown: gửi nốt lệnh đang gộp trước khi ngắt kết nối
+    await light_scheduler.stop()
+    await mqtt_service.stop()
+    # Ghi nốt các bản ghi MQTT còn trong hàng đợi
+    stop_mqtt_logging()
+    # Đóng pool của engine async trong chính event loop đã mở nó
+    await replica_router.stop()
+    await async_engine.dispose()
 
 
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
@@ -38,7 +86,8 @@ app = FastAPI(
 
 # Mount static files
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
-app.mount("/api/v1/static", StaticFiles(directory=STATIC_DIR), name="static")
+# URL có fingerprint (pk_3.<hash>.png) được cache vĩnh viễn phía client, xem app.core.static_assets
+app.mount("/api/v1/static", ImmutableStaticFiles(directory=STATIC_DIR, manifest=static_manifest), name="static")
 
 # Set all CORS enabled origins
 if settings.all_cors_origins:
@@ -51,5 +100,31 @@ if settings.all_cors_origins:
     )
 
 
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    # Request có commit của một user: các lần đọc tiếp theo của user đó (ở mọi worker) về primary
+    if not replica_router.enabled or request.method in SAFE_METHODS:
+        return await call_next(request)
+    with track_writes() as writes:
+        response = await call_next(request)
+    user_key = subject_from_request(request) if writes else None
+    if user_key:
+        await run_in_threadpool(invalidation_bus.publish, READ_YOUR_WRITES_TOPIC, user_key)
+    return response
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusyError) -> JSONResponse:
+    # Cao điểm đăng nhập: từ chối sớm để các endpoint khác không bị nghẽn theo
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError) -> JSONResponse:
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -3,10 +3,11 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr
-from sqlmodel import BigInteger, SQLModel, Field
+from sqlalchemy import Index
+from sqlmodel import JSON, BigInteger, DateTime, SQLModel, Field
 
 import pytz
 
@@ -75,7 +76,8 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    count: int | None  # null khi count=none; next_cursor: trang sau (phân trang keyset)
+    next_cursor: str | None = None
 
 # === SYSTEM ===
 class SystemBase(SQLModel):
@@ -100,7 +102,8 @@ class SystemPublic(SystemBase):
 
 class SystemsPublic(SQLModel):
     data: list[SystemPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 
 # === PROJECT ===
@@ -139,7 +142,8 @@ class ProjectPublic(ProjectBase):
 
 class ProjectsPublic(SQLModel):
     data: list[ProjectPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 
 # === ROLE ===
@@ -170,7 +174,8 @@ class RolePublic(RoleBase):
 
 class RolesPublic(SQLModel):
     data: list[RolePublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 
 # === USER-PROJECT-ROLE ===
@@ -208,6 +213,9 @@ class RequestStatus(str, Enum):
 
 
 class Request(SQLModel, table=True):
+    # Danh sách yêu cầu của dự án: lọc theo status, sắp xếp/lọc theo created_at
+    __table_args__ = (Index("ix_request_project_status_created", "project_id", "status", "created_at"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     project_id: uuid.UUID = Field(foreign_key="projectlist.id", index=True)
     role_id: uuid.UUID = Field(foreign_key="role.id", index=True)
@@ -247,7 +255,8 @@ class RequestPublic(SQLModel):
 
 class RequestsPublic(SQLModel):
     data: list[RequestPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 
 # === AUTH / COMMON SCHEMAS ===
@@ -297,7 +306,8 @@ class AdministrativeRegionPublic(AdministrativeRegionBase):
 
 class AdministrativeRegionsPublic(SQLModel):
     data: List[AdministrativeRegionPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 # ----------------------------------------------------
 # AdministrativeUnit - Đơn vị Hành chính
@@ -329,7 +339,8 @@ class AdministrativeUnitPublic(AdministrativeUnitBase):
 
 class AdministrativeUnitsPublic(SQLModel):
     data: List[AdministrativeUnitPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 # ----------------------------------------------------
 # Province - Tỉnh/Thành phố
@@ -356,7 +367,8 @@ class ProvincePublic(ProvinceBase):
 
 class ProvincesPublic(SQLModel):
     data: List[ProvincePublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 # ----------------------------------------------------
 # Ward - Phường/Xã
@@ -384,7 +396,8 @@ class WardPublic(WardBase):
 
 class WardsPublic(SQLModel):
     data: List[WardPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
     
 # ============================== DU AN: ECO_RETREAT========================== ===
 
@@ -449,6 +462,8 @@ class DetalEcoRetreatPublic(SQLModel):
     picture: Optional[str] = None
     description: Optional[str] = None
     image_url: Optional[str] = None
+    # Ảnh phái sinh theo định dạng: {"avif": "<url> 320w, <url> 640w", "webp": ...}; None khi chưa tạo xong
+    srcset: Optional[Dict[str, str]] = None
 
 class DetalEcoRetreatResponse(BaseModel):
     """
@@ -456,4 +471,66 @@ class DetalEcoRetreatResponse(BaseModel):
     Bao gồm danh sách các đối tượng ảnh và tổng số lượng.
     """
     items: List[DetalEcoRetreatPublic]  
-    total: int                         
+    total: int
+
+
+# === File tombstone ===
+class FileTombstone(SQLModel, table=True):
+    """File (đường dẫn trong thư mục static) chờ xoá; ghi cùng giao dịch xoá/thay bản ghi tham chiếu tới nó."""
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    path: str
+    created_at: datetime = Field(default_factory=now_vn, sa_type=DateTime(timezone=True))
+    # Lần xoá lỗi được thử lại sau thời điểm này
+    not_before: datetime = Field(default_factory=now_vn, sa_type=DateTime(timezone=True), index=True)
+    attempts: int = 0
+    last_error: Optional[str] = None
+
+
+# === Eco Park Import Job ===
+class ImportJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+class EcoparkImportJob(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    project_id: uuid.UUID = Field(foreign_key="projectlist.id", index=True)
+    created_by: Optional[uuid.UUID] = Field(default=None, foreign_key="user.id", nullable=True)
+    filename: str
+    staged_path: str
+    status: ImportJobStatus = Field(default=ImportJobStatus.queued, index=True)
+    total_rows: Optional[int] = None
+    processed_rows: int = 0
+    imported_rows: int = 0
+    failed_rows: int = 0
+    errors: List[str] = Field(default_factory=list, sa_type=JSON)
+    message: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    created_at: datetime = Field(default_factory=now_vn, sa_type=DateTime(timezone=True))
+    started_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+    heartbeat_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+    finished_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+class EcoparkImportJobPublic(SQLModel):
+    id: uuid.UUID
+    project_id: uuid.UUID
+    filename: str
+    status: ImportJobStatus
+    total_rows: Optional[int] = None
+    processed_rows: int
+    imported_rows: int
+    failed_rows: int
+    errors: List[str]
+    message: Optional[str] = None
+    attempts: int
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
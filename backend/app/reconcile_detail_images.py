@@ -0,0 +1,51 @@
+"""
+Tìm file trong thư mục ảnh chi tiết (static/EcoRetreat/CHITIET) không còn bản ghi DetalEcoRetreat nào
+tham chiếu, ví dụ do upload bị ngắt giữa lúc lưu file và ghi DB, cùng ảnh phái sinh (static/renditions)
+của các ảnh đã xoá/thay, rồi ghi tombstone để sweeper nền xoá.
+File mới hơn --grace-minutes phút được bỏ qua (có thể là upload đang xử lý).
+
+Chạy từ thư mục backend:
+
+    python -m app.reconcile_detail_images --dry-run
+    python -m app.reconcile_detail_images --grace-minutes 120
+    python -m app.reconcile_detail_images --sweep      # xoá ngay, không chờ worker API
+"""
+
+import argparse
+import logging
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.file_gc import file_sweeper, find_orphan_renditions, find_orphans, reconcile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grace-minutes", type=float, default=60.0)
+    parser.add_argument("--dry-run", action="store_true", help="chỉ liệt kê, không ghi tombstone")
+    parser.add_argument("--sweep", action="store_true", help="xoá các file có tombstone ngay sau khi đối chiếu")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        if args.dry_run:
+            grace = args.grace_minutes * 60
+            orphans = find_orphans(session, grace=grace) + find_orphan_renditions(session, grace=grace)
+            for relative in orphans:
+                logger.info(f"  {relative}")
+            logger.info(f"🔍 {len(orphans)} file mồ côi (dry run, chưa ghi tombstone)")
+            return
+        orphans = reconcile(session, grace=args.grace_minutes * 60)
+    logger.info(f"🪦 Đã ghi tombstone cho {len(orphans)} file mồ côi")
+
+    if args.sweep:
+        while file_sweeper.sweep_once() >= file_sweeper.batch_size:
+            pass
+        logger.info(f"🧹 Backlog còn {file_sweeper.measure_backlog()} file, {file_sweeper.stats()}")
+
+
+if __name__ == "__main__":
+    main()
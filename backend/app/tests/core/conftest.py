@@ -0,0 +1,38 @@
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.tests.utils.session import AwaitableSession
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line("markers", "sqlite_tables(models): bảng SQLModel tạo trong DB SQLite của test")
+
+
+@pytest.fixture
+def sqlite_engine(request: pytest.FixtureRequest) -> Generator[Engine, None, None]:
+    """
+    DB SQLite trong bộ nhớ với các bảng khai báo bằng `@pytest.mark.sqlite_tables([User, Role, ...])`
+    (trên test hoặc `pytestmark` của module). StaticPool: luồng khác (threadpool, sweeper) thấy cùng DB.
+    """
+    marker = request.node.get_closest_marker("sqlite_tables")
+    if marker is None:
+        raise pytest.UsageError("sqlite_engine cần @pytest.mark.sqlite_tables(...)")
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine, tables=[model.__table__ for model in marker.args[0]])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(sqlite_engine: Engine) -> Generator[Session, None, None]:
+    with Session(sqlite_engine) as session:
+        yield session
+
+
+@pytest.fixture
+def async_session(session: Session) -> AwaitableSession:
+    return AwaitableSession(session)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app import crud
+from app.models import ProjectList, Role, User, UserProjectRole
+
+
+pytestmark = pytest.mark.sqlite_tables([User, Role, ProjectList, UserProjectRole])
+
+
+def test_assignment_pages_filters_and_export(session: Session) -> None:
+    now = datetime.now(timezone.utc)
+    users = [User(email=f"u{i}@example.com", hashed_password="x", creation_time=now) for i in range(3)]
+    roles = [Role(name="manager", rank=2), Role(name="viewer", rank=4)]
+    projects = [ProjectList(name_en="P1", name_vi="DA1"), ProjectList(name_en="P2", name_vi="DA2")]
+    session.add_all([*users, *roles, *projects])
+    for user in users:
+        for project in projects:
+            session.add(UserProjectRole(user_id=user.id, project_id=project.id, role_id=roles[1].id))
+    session.commit()
+
+    seen = []
+    page, cursor = crud.get_assignments(session=session, lang="vi", limit=4)
+    seen.extend(page)
+    while cursor:
+        page, cursor = crud.get_assignments(session=session, lang="vi", limit=4, cursor=cursor)
+        seen.extend(page)
+    assert len({a["id"] for a in seen}) == 6
+    assert seen[0].keys() == {
+        "id", "user_id", "user_email", "project_id", "project_name", "role_id", "role_name", "role_rank"
+    }
+    assert {a["project_name"] for a in seen} == {"DA1", "DA2"}
+
+    page, _ = crud.get_assignments(session=session, project_id=projects[0].id, user_id=users[0].id)
+    assert [(a["user_email"], a["project_name"]) for a in page] == [("u0@example.com", "P1")]
+    assert crud.count_assignments(session=session, project_id=projects[0].id) == 3
+    assert crud.count_assignments(session=session) == 6
+
+    exported = list(crud.iter_assignments(session=session, lang="vi", batch_size=4))
+    assert exported == seen
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.core.db import create_db_engine
+from app.core.db_metrics import DbMetrics
+
+
+def test_pool_reports_waits_timeouts_and_slow_statements(tmp_path: Path) -> None:
+    metrics = DbMetrics(slow_query_ms=0)
+    engine = create_db_engine(
+        f"sqlite:///{tmp_path / 'db.sqlite'}",
+        metrics=metrics,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+        connect_args={"check_same_thread": False},
+    )
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 2"))
+
+    stats = metrics.stats()
+    assert stats["checkouts"] == 1 and stats["timeouts"] == 1
+    assert stats["max_wait_ms"] >= 50
+    assert sum(stats["wait_histogram"].values()) == 2
+    assert stats["statements"] == 2 and stats["slow_statements"] == 2
+    assert stats["recent_slow"][-1]["statement"] == "SELECT 2"
+    assert stats["pools"][0]["size"] == 1 and stats["pools"][0]["checked_out"] == 0
+
+    # dispose() tạo pool mới cùng lớp: vẫn báo về cùng metrics
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.stats()["checkouts"] == 2
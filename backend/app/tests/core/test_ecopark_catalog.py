@@ -0,0 +1,117 @@
+import pytest
+from sqlmodel import Session
+
+from app.core.ecopark_catalog import CatalogSnapshot, EcoparkCatalog
+from app.models import Ecopark
+
+pytestmark = pytest.mark.sqlite_tables([Ecopark])
+
+RECORDS = [
+    {"port": 1, "zone": "Z1", "zone_name_en": "Zone 1 Lakeside", "building_type_en": "Detached Villa", "amenity": "pool", "bedroom": 3, "price": 500},
+    {"port": 2, "zone": "Z1", "zone_name_en": "Zone 1 Lakeside", "building_type_en": "Semi-Detached Villa", "amenity": "gym", "bedroom": 4, "price": 900},
+    {"port": 3, "zone": "Z2", "zone_name_en": "Zone 2 Hill_Top", "building_type_en": "Shophouse", "amenity": None, "bedroom": 3, "price": 1500},
+    {"port": 4, "zone": "2", "zone_name_en": None, "building_type_en": "Townhouse", "amenity": "Pool bar", "bedroom": None, "price": None},
+]
+
+
+@pytest.fixture
+def session(session: Session) -> Session:
+    for record in RECORDS:
+        session.add(Ecopark(**record))
+    session.commit()
+    return session
+
+
+def ports(records: list[dict]) -> list[int]:
+    return [r["port"] for r in records]
+
+
+def test_snapshot_matches_ilike_equality_and_price_range() -> None:
+    snapshot = CatalogSnapshot([dict(r) for r in RECORDS], generation=0)
+
+    assert ports(snapshot.select([snapshot.ilike("building_type_en", "detached villa")])) == [1, 2]
+    assert ports(snapshot.select([snapshot.ilike("amenity", "POO")])) == [1, 4]
+    assert ports(snapshot.select([snapshot.ilike("amenity", "o")])) == [1, 4]
+    # Ký tự đại diện của LIKE: "_" khớp một ký tự bất kỳ, "\\_" khớp đúng dấu gạch dưới
+    assert ports(snapshot.select([snapshot.ilike("zone_name_en", "hill_t")])) == [3]
+    assert ports(snapshot.select([snapshot.ilike("zone_name_en", "lake_ide")])) == [1, 2]
+    assert ports(snapshot.select([snapshot.ilike("zone_name_en", "lake\\_ide")])) == []
+
+    assert ports(snapshot.select([snapshot.equals("bedroom", 3), snapshot.ilike("zone", "z")])) == [1, 3]
+    assert ports(snapshot.select([snapshot.equals("zone", 2)])) == [4]
+    assert ports(snapshot.select([snapshot.equals("port", "2")])) == [2]
+    assert ports(snapshot.select([snapshot.price_between(600, 1500)])) == [2, 3]
+    assert ports(snapshot.select([snapshot.price_between(None, 500)])) == [1]
+    assert ports(snapshot.select([])) == [1, 2, 3, 4]
+
+
+def test_catalog_is_rebuilt_after_invalidate_or_ttl(session: Session) -> None:
+    catalog = EcoparkCatalog(ttl=60)
+
+    first = catalog.snapshot(session)
+    assert len(first) == 4
+    assert catalog.snapshot(session) is first
+
+    session.add(Ecopark(port=5, zone="Z3"))
+    session.commit()
+    assert catalog.snapshot(session) is first
+    catalog.invalidate()
+    second = catalog.snapshot(session)
+    assert len(second) == 5
+
+    catalog.ttl = 0
+    assert catalog.snapshot(session) is not second
+    assert catalog.stats()["rebuilds"] == 3
+
+
+def legacy_translate(record: dict, lang: str, with_description: bool) -> dict:
+    item = dict(record)
+    for field in ("zone_name", "building_type", "amenity_type", "direction", "status"):
+        item[field] = item.get(f"{field}_{lang}")
+    if with_description:
+        item["description"] = item.get(f"description_{lang}")
+    for key in list(item.keys()):
+        if key.endswith("_vi") or key.endswith("_en"):
+            del item[key]
+    return item
+
+
+def test_projections_match_legacy_translation(session: Session) -> None:
+    snapshot = EcoparkCatalog().snapshot(session)
+
+    for lang in ("vi", "en"):
+        full = snapshot.projected(lang, "full")
+        summary = snapshot.projected(lang, "summary")
+        for record, full_item, summary_item in zip(snapshot.records, full, summary):
+            expected = legacy_translate(record, lang, with_description=True)
+            assert list(full_item.items()) == list(expected.items())
+            expected = legacy_translate(record, lang, with_description=False)
+            assert list(summary_item.items()) == list(expected.items())
+        assert snapshot.projected(lang, "full") is full
+
+    filtered = snapshot.projected("vi", "filter")[0]
+    assert list(filtered)[:7] == ["port", "building_name", "picture_name", "zone", "amenity", "bedroom", "price"]
+    # Thiếu bản tiếng Việt thì lấy bản tiếng Anh
+    assert filtered["zone_name"] == "Zone 1 Lakeside"
+
+
+def test_facet_counts_follow_other_active_filters() -> None:
+    snapshot = CatalogSnapshot([dict(r) for r in RECORDS], generation=0)
+
+    values = snapshot.facet_values("en")
+    assert values["bedroom"] == [3, 4]
+    assert values["building_type"] == ["Detached Villa", "Semi-Detached Villa", "Shophouse", "Townhouse"]
+
+    counts = snapshot.facet_counts("en")
+    assert counts["bedroom"] == {"3": 2, "4": 1}
+
+    active = {
+        "bedroom": snapshot.equals("bedroom", 3),
+        "price": snapshot.price_between(None, 1000),
+    }
+    counts = snapshot.facet_counts("en", active)
+    # Facet "bedroom" bỏ qua chính bộ lọc bedroom, chỉ áp dụng bộ lọc giá
+    assert counts["bedroom"] == {"3": 1, "4": 1}
+    assert counts["price"] == {"500": 1, "900": 0, "1500": 1}
+    assert counts["building_type"]["Detached Villa"] == 1
+    assert counts["building_type"]["Shophouse"] == 0
@@ -0,0 +1,142 @@
+import io
+from typing import Any
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from sqlalchemy.dialects import postgresql
+
+from app import crud
+from app.core.ecopark_import import (
+    ExcelBatchReader,
+    ImportFileError,
+    ImportResult,
+    import_ecopark_stream,
+    prepare_rows,
+    upsert_rows,
+)
+
+
+class RecordingSession:
+    def __init__(self) -> None:
+        self.statements: list[Any] = []
+        self.committed = False
+        self.rolled_back = False
+
+    def begin_nested(self) -> "RecordingSession":
+        return self
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def exec(self, statement: Any) -> None:
+        self.statements.append(statement)
+
+    def commit(self) -> None:
+        self.committed = True
+
+    def rollback(self) -> None:
+        self.rolled_back = True
+
+
+def _sheet(rows: list[list[Any]], sheet: str = "ECO PARK") -> io.BytesIO:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_prepare_rows_normalizes_columns_and_keeps_row_errors() -> None:
+    df = pd.DataFrame({
+        "port": [1, None, "abc", 4, 5, 6],
+        "zone": ["Z1", "Z2", "Z3", float("nan"), 7, "Z6"],
+        "bedroom": [2.0, 1, 1, None, 1, "x"],
+        "price": [1_000_000, 1, 1, 2.5, 1, 1],
+    })
+
+    rows, result = prepare_rows(df)
+
+    assert [(n, r["port"], r["zone"], r["bedroom"], r["price"]) for n, r in rows] == [
+        (2, 1, "Z1", 2, 1_000_000),
+        (5, 4, None, None, 2),
+    ]
+    assert all(r["building_name"] is None for _, r in rows)
+    assert result.failed_count == 4
+    assert result.errors[0] == "Hàng 3: Cột 'port' bị thiếu hoặc giá trị rỗng."
+    assert result.errors[1] == "Hàng 4: Cột 'port' ('abc') không phải là số nguyên hợp lệ."
+    assert result.errors[2].startswith("Hàng 6 (Port: 5): Lỗi - 1 validation error for EcoparkCreate")
+    assert result.errors[3] == "Hàng 7 (Port: 6): Lỗi - invalid literal for int() with base 10: 'x'"
+
+
+def test_upsert_rows_dedupes_ports_and_chunks() -> None:
+    rows = [(n + 2, {"port": port, "zone": f"Z{n}"}) for n, port in enumerate([1, 2, 1, 3, 4])]
+    session = RecordingSession()
+
+    result = upsert_rows(session, rows, chunk_size=2)  # type: ignore[arg-type]
+
+    assert result == ImportResult(processed_count=5)
+    assert len(session.statements) == 2
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (port) DO UPDATE SET" in sql
+    assert "id = excluded.id" not in sql and "zone = excluded.zone" in sql
+    params = session.statements[0].compile(dialect=postgresql.dialect()).params
+    # Port 1 xuất hiện hai lần: hàng sau ghi đè hàng trước
+    assert params["zone_m0"] == "Z2" and params["port_m1"] == 2
+
+
+def test_upsert_ecoparks_skips_empty_input() -> None:
+    session = RecordingSession()
+    crud.upsert_ecoparks(session=session, ecoparks=[])  # type: ignore[arg-type]
+    assert session.statements == []
+
+
+def test_excel_batch_reader_matches_read_excel_row_numbers() -> None:
+    rows = [["port", "zone", "extra"], [1, "Z1", "x"], [2, "Z2"], [None, None], ["abc", "Z4"], [5, 7]]
+    rows += [[None]] * 3  # hàng trống ở cuối sheet
+    content = _sheet(rows).getvalue()
+
+    with ExcelBatchReader(io.BytesIO(content), batch_rows=2) as reader:
+        batches = list(reader)
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert list(batches[0].columns) == ["port", "zone"]
+    streamed = ImportResult()
+    for batch in batches:
+        streamed.merge(prepare_rows(batch)[1])
+    _, expected = prepare_rows(pd.read_excel(io.BytesIO(content), sheet_name="ECO PARK"))
+    assert streamed.errors == expected.errors
+    assert streamed.errors[0] == "Hàng 4: Cột 'port' bị thiếu hoặc giá trị rỗng."
+
+
+def test_excel_batch_reader_rejects_missing_sheet_or_port() -> None:
+    with pytest.raises(ImportFileError, match="Không tìm thấy sheet 'ECO PARK'"):
+        ExcelBatchReader(_sheet([["port"]], sheet="Sheet1"))
+    with pytest.raises(ImportFileError, match="phải chứa cột 'port'"):
+        ExcelBatchReader(_sheet([["zone"]]))
+
+
+def test_import_ecopark_stream_stops_on_error_threshold() -> None:
+    rows = [["port", "zone"]] + [[n, "Z"] for n in range(1, 5)] + [["bad", "Z"]] * 4 + [[9, "Z"]] * 2
+    session = RecordingSession()
+
+    with ExcelBatchReader(_sheet(rows), batch_rows=4) as reader:
+        result = import_ecopark_stream(session, reader, max_failed_rows=3)  # type: ignore[arg-type]
+
+    assert session.rolled_back and not session.committed
+    assert result.rows_read == 8 and result.failed_count == 4 and result.processed_count == 0
+    assert result.as_response()["status"] == "failed"
+
+    session = RecordingSession()
+    with ExcelBatchReader(_sheet(rows), batch_rows=4) as reader:
+        result = import_ecopark_stream(session, reader, max_failed_ratio=0.5)  # type: ignore[arg-type]
+
+    assert session.committed and result.stopped_reason is None
+    assert (result.rows_read, result.processed_count, result.failed_count) == (10, 6, 4)
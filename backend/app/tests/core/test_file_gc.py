@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.file_gc import FileSweeper, find_orphan_renditions, find_orphans, reconcile
+from app.core.renditions import MANIFEST_FOLDER, RENDITIONS_FOLDER
+from app.crud import DETAIL_IMAGE_FOLDER
+from app.models import DetalEcoRetreat, Ecopark, FileTombstone
+
+pytestmark = pytest.mark.sqlite_tables([Ecopark, DetalEcoRetreat, FileTombstone])
+
+
+def make_images(static_dir: Path, names: list[str]) -> Path:
+    directory = static_dir / DETAIL_IMAGE_FOLDER
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b"x")
+    return directory
+
+
+def test_deletes_record_tombstones_and_sweeper_removes_files(sqlite_engine: Engine, tmp_path: Path) -> None:
+    directory = make_images(tmp_path, ["a.png", "b.png", "c.png"])
+    with Session(sqlite_engine) as session:
+        records = [DetalEcoRetreat(port=1, picture=name, description_vi="m") for name in ["a.png", "b.png", "c.png"]]
+        session.add_all(records)
+        session.commit()
+        ids = [record.id for record in records]
+
+        # Xoá bản ghi không đụng tới ổ đĩa; file chỉ có tombstone cùng giao dịch
+        assert crud.delete_detal_eco_retreat_records_by_ids(session, ids[:2]) == 2
+        crud.update_detal_eco_retreat_record(session, session.get(DetalEcoRetreat, ids[2]), {"picture": "d.png"})
+        paths = set(session.exec(select(FileTombstone.path)).all())
+    assert paths == {f"{DETAIL_IMAGE_FOLDER}/{name}" for name in ["a.png", "b.png", "c.png"]}
+    assert all((directory / name).exists() for name in ["a.png", "b.png", "c.png"])
+
+    sweeper = FileSweeper(lambda: Session(sqlite_engine), tmp_path, batch_size=2)
+    assert sweeper.measure_backlog() == 3
+    assert sweeper.sweep_once() == 2
+    assert sweeper.sweep_once() == 1
+    assert sweeper.sweep_once() == 0
+    assert not any((directory / name).exists() for name in ["a.png", "b.png", "c.png"])
+    assert sweeper.measure_backlog() == 0
+    stats = sweeper.stats()
+    assert stats["swept"] == 3 and stats["batches"] == 3 and stats["backlog"] == 0
+
+
+def test_failed_removal_is_retried_later(sqlite_engine: Engine, tmp_path: Path) -> None:
+    make_images(tmp_path, [])
+    # Thư mục không rỗng: unlink lỗi như khi ổ đĩa/quyền có vấn đề
+    (tmp_path / DETAIL_IMAGE_FOLDER / "stuck").mkdir()
+    (tmp_path / DETAIL_IMAGE_FOLDER / "stuck" / "f").write_bytes(b"x")
+    with Session(sqlite_engine) as session:
+        session.add(FileTombstone(path=f"{DETAIL_IMAGE_FOLDER}/stuck"))
+        session.commit()
+
+    sweeper = FileSweeper(lambda: Session(sqlite_engine), tmp_path, retry_after=3600)
+    assert sweeper.sweep_once() == 0
+    # Lùi lịch thử lại: lần quét kế tiếp không lấy lại tombstone này
+    assert sweeper.sweep_once() == 0
+    assert sweeper.stats()["failed"] == 1
+    with Session(sqlite_engine) as session:
+        tombstone = session.exec(select(FileTombstone)).one()
+    assert tombstone.attempts == 1 and tombstone.last_error
+    assert sweeper.measure_backlog() == 1
+
+
+def test_reconcile_tombstones_orphans_older_than_grace(sqlite_engine: Engine, tmp_path: Path) -> None:
+    directory = make_images(tmp_path, ["kept.png", "old.png", "fresh.png"])
+    hour_ago = time.time() - 3600
+    for name in ["kept.png", "old.png"]:
+        os.utime(directory / name, (hour_ago, hour_ago))
+    with Session(sqlite_engine) as session:
+        session.add(DetalEcoRetreat(port=1, picture="kept.png"))
+        session.commit()
+
+        # File mới (upload đang ghi, chưa insert bản ghi) nằm trong thời gian ân hạn
+        assert find_orphans(session, tmp_path, grace=600) == [f"{DETAIL_IMAGE_FOLDER}/old.png"]
+        assert reconcile(session, tmp_path, grace=600) == [f"{DETAIL_IMAGE_FOLDER}/old.png"]
+        # Đã có tombstone: không ghi trùng
+        assert find_orphans(session, tmp_path, grace=600) == []
+
+    assert FileSweeper(lambda: Session(sqlite_engine), tmp_path).sweep_once() == 1
+    assert sorted(os.listdir(directory)) == ["fresh.png", "kept.png"]
+
+
+def test_renditions_no_manifest_references_are_orphans(sqlite_engine: Engine, tmp_path: Path) -> None:
+    make_images(tmp_path, ["kept.png"])
+    renditions = tmp_path / RENDITIONS_FOLDER
+    manifests = renditions / MANIFEST_FOLDER / DETAIL_IMAGE_FOLDER
+    manifests.mkdir(parents=True)
+    for name, filename in [("kept.png", "h1-320.webp"), ("gone.png", "h2-320.webp")]:
+        (manifests / f"{name}.json").write_text(json.dumps({"hash": filename[:2], "renditions": {"webp": {"320": filename}}}))
+    for filename in ["h1-320.webp", "h2-320.webp", "h3-320.webp", "h4-320.webp"]:
+        (renditions / filename).write_bytes(b"x")
+    hour_ago = time.time() - 3600
+    for path in [*manifests.iterdir(), *renditions.glob("h[123]-*")]:
+        os.utime(path, (hour_ago, hour_ago))
+
+    with Session(sqlite_engine) as session:
+        # Ảnh gốc đã xoá: manifest và ảnh phái sinh của nó; h4 còn mới (manifest chưa kịp ghi)
+        assert reconcile(session, tmp_path, grace=600) == [
+            f"{RENDITIONS_FOLDER}/{MANIFEST_FOLDER}/{DETAIL_IMAGE_FOLDER}/gone.png.json",
+            f"{RENDITIONS_FOLDER}/h2-320.webp",
+            f"{RENDITIONS_FOLDER}/h3-320.webp",
+        ]
+        assert find_orphan_renditions(session, tmp_path, grace=600) == []
+
+    assert FileSweeper(lambda: Session(sqlite_engine), tmp_path).sweep_once() == 3
+    assert sorted(path.name for path in renditions.iterdir() if path.is_file()) == ["h1-320.webp", "h4-320.webp"]
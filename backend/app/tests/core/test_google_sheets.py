@@ -0,0 +1,109 @@
+import json
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+
+from app.core.google_sheets import (
+    GoogleSheetsError,
+    GoogleSheetsSink,
+    HttpxTransport,
+    StaticTokenProvider,
+)
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeSheetsHandler)
+        self.responses: list[int] = []
+        self.requests: list[dict[str, Any]] = []
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    server: FakeSheetsServer
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(
+            {"path": self.path, "auth": self.headers["Authorization"], "body": body}
+        )
+        status = self.server.responses.pop(0) if self.server.responses else 200
+        payload = json.dumps({"updates": {"updatedCells": 3 * len(body["values"])}}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def sheets_server() -> Generator[FakeSheetsServer, None, None]:
+    server = FakeSheetsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_sink(server: FakeSheetsServer, **kwargs: Any) -> GoogleSheetsSink:
+    host, port = server.server_address[:2]
+    return GoogleSheetsSink(
+        "sheet-id",
+        token_provider=StaticTokenProvider("token"),
+        transport=HttpxTransport(timeout=5),
+        base_url=f"http://{host}:{port}",
+        backoff_base=0.001,
+        **kwargs,
+    )
+
+
+def test_append_retries_on_429_and_5xx(sheets_server: FakeSheetsServer) -> None:
+    sheets_server.responses = [429, 503]
+    sink = make_sink(sheets_server)
+
+    result = sink.append_rows([["ts", "topic", "payload"]])
+
+    assert result["updates"]["updatedCells"] == 3
+    assert len(sheets_server.requests) == 3
+    request = sheets_server.requests[-1]
+    assert request["auth"] == "Bearer token"
+    assert request["path"].startswith("/v4/spreadsheets/sheet-id/values/Sheet1%21A1:append")
+    assert sink.stats()["retries"] == 2
+
+
+def test_append_gives_up_on_client_error(sheets_server: FakeSheetsServer) -> None:
+    sheets_server.responses = [400]
+    sink = make_sink(sheets_server)
+
+    with pytest.raises(GoogleSheetsError):
+        sink.append_rows([["ts", "topic", "payload"]])
+    assert len(sheets_server.requests) == 1
+    assert sink.stats()["failures"] == 1
+
+
+def test_concurrent_appends_are_coalesced(sheets_server: FakeSheetsServer) -> None:
+    sink = make_sink(sheets_server)
+    sink._flush_lock.acquire()  # simulate an append already in flight
+    threads = [
+        threading.Thread(target=sink.append_rows, args=([[str(i), "t", "p"]],))
+        for i in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while len(sink._pending) < 5:
+        pass
+    sink._flush_lock.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(sheets_server.requests) == 1
+    assert len(sheets_server.requests[0]["body"]["values"]) == 5
+    assert sink.stats()["coalesced_calls"] == 4
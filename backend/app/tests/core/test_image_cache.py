@@ -0,0 +1,90 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.core.image_cache import InvalidImageError, ResizedImageCache
+
+
+@pytest.fixture
+def static_dir(tmp_path: Path) -> Path:
+    static = tmp_path / "static"
+    (static / "EcoRetreat").mkdir(parents=True)
+    for name in ("a", "b", "c"):
+        Image.new("RGB", (1000, 500), "green").save(static / "EcoRetreat" / f"{name}.jpg")
+    return static
+
+
+def test_concurrent_requests_render_once_then_hit(static_dir: Path, tmp_path: Path) -> None:
+    cache = ResizedImageCache(static_dir, tmp_path / "cache", max_bytes=10**9)
+
+    async def scenario() -> list[Path]:
+        return await asyncio.gather(*(cache.get("EcoRetreat/a.jpg", 200, "png") for _ in range(10)))
+
+    paths = asyncio.run(scenario())
+    assert len(set(paths)) == 1
+    with Image.open(paths[0]) as image:
+        assert image.size == (200, 100) and image.format == "PNG"
+    asyncio.run(cache.get("EcoRetreat/a.jpg", 200, "png"))
+
+    stats = cache.stats()
+    assert (stats["renders"], stats["collapsed"], stats["hits"]) == (1, 9, 1)
+    assert stats["bytes"] == paths[0].stat().st_size
+
+    # Chỉ mục được nạp lại từ đĩa ở worker/lần chạy khác
+    other = ResizedImageCache(static_dir, tmp_path / "cache", max_bytes=10**9)
+    assert asyncio.run(other.get("EcoRetreat/a.jpg", 200, "png")) == paths[0]
+    assert other.stats()["hits"] == 1
+
+
+def test_cache_is_bounded_by_bytes(static_dir: Path, tmp_path: Path) -> None:
+    cache = ResizedImageCache(static_dir, tmp_path / "cache", max_bytes=1, evict_grace=0)
+
+    async def scenario() -> list[Path]:
+        return [await cache.get(f"EcoRetreat/{name}.jpg", 100, "jpeg") for name in ("a", "b", "c")]
+
+    first, _, last = asyncio.run(scenario())
+    assert not first.exists() and last.exists()
+    assert cache.stats()["evictions"] == 2 and cache.stats()["files"] == 1
+
+
+def test_evicted_files_stay_readable_during_grace(static_dir: Path, tmp_path: Path) -> None:
+    cache = ResizedImageCache(static_dir, tmp_path / "cache", max_bytes=1, evict_grace=60)
+
+    async def scenario() -> list[Path]:
+        return [await cache.get(f"EcoRetreat/{name}.jpg", 100, "jpeg") for name in ("a", "b", "a")]
+
+    # Request đang gửi "a" vẫn đọc được file; lấy lại "a" thì tạo lại và không bị lần dọn trễ xoá mất
+    first, second, again = asyncio.run(scenario())
+    assert first == again and first.exists() and second.exists()
+    assert cache.stats()["files"] == 1 and cache.stats()["pending_unlink"] == 1
+
+
+def test_rejects_paths_outside_static_and_unknown_formats(static_dir: Path, tmp_path: Path) -> None:
+    cache = ResizedImageCache(static_dir, tmp_path / "cache", max_bytes=10**9)
+    (tmp_path / "secret.jpg").write_bytes(b"x")
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(cache.get("../secret.jpg", 100, "jpeg"))
+    with pytest.raises(InvalidImageError):
+        asyncio.run(cache.get("EcoRetreat/a.jpg", 100, "gif"))
+    (static_dir / "EcoRetreat" / "broken.jpg").write_bytes(b"not an image")
+    with pytest.raises(InvalidImageError):
+        asyncio.run(cache.get("EcoRetreat/broken.jpg", 100, "jpeg"))
+
+
+def test_byte_bound_covers_files_of_other_workers(static_dir: Path, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    workers = [ResizedImageCache(static_dir, cache_dir, max_bytes=10**9, evict_grace=0, rescan_interval=0) for _ in range(2)]
+
+    async def scenario() -> None:
+        first = await workers[0].get("EcoRetreat/a.jpg", 100, "png")
+        for worker in workers:
+            worker.max_bytes = 2 * first.stat().st_size
+        await workers[1].get("EcoRetreat/b.jpg", 100, "png")
+        # Chỉ mục của worker 0 chưa có b: chỉ đối chiếu thư mục mới thấy đã vượt giới hạn
+        await workers[0].get("EcoRetreat/c.jpg", 100, "png")
+
+    asyncio.run(scenario())
+    assert len(list(cache_dir.glob("*/*.png"))) == 2
+    assert workers[0].stats()["rescans"] >= 1 and workers[0].stats()["evictions"] == 1
@@ -0,0 +1,107 @@
+import io
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+from sqlmodel import Session
+
+from app.core import import_jobs
+from app.core.import_jobs import ImportFileError, job_public, stage_upload, validate_workbook
+from app.models import EcoparkImportJob, ImportJobStatus, now_vn
+
+
+def _workbook(path: Path, sheet: str, header: list[str]) -> str:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet
+    ws.append(header)
+    ws.append([1] * len(header))
+    wb.save(path)
+    return str(path)
+
+
+def test_stage_upload_writes_file_atomically(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(import_jobs, "STAGING_DIR", str(tmp_path / "imports"))
+
+    path = stage_upload(io.BytesIO(b"xlsx-bytes"))
+
+    assert Path(path).read_bytes() == b"xlsx-bytes"
+    assert [p.name for p in (tmp_path / "imports").iterdir()] == [Path(path).name]
+
+
+def test_validate_workbook_checks_sheet_and_port_header(tmp_path: Path) -> None:
+    validate_workbook(_workbook(tmp_path / "ok.xlsx", "ECO PARK", ["port", "zone"]))
+
+    with pytest.raises(ImportFileError, match="Không tìm thấy sheet 'ECO PARK'"):
+        validate_workbook(_workbook(tmp_path / "sheet.xlsx", "Sheet1", ["port"]))
+    with pytest.raises(ImportFileError, match="phải chứa cột 'port'"):
+        validate_workbook(_workbook(tmp_path / "port.xlsx", "ECO PARK", ["zone"]))
+    (tmp_path / "broken.xlsx").write_bytes(b"not a workbook")
+    with pytest.raises(ImportFileError, match="Không thể đọc file Excel"):
+        validate_workbook(str(tmp_path / "broken.xlsx"))
+
+
+def test_job_public_reports_throughput_and_eta() -> None:
+    job = EcoparkImportJob(
+        project_id=uuid.uuid4(),
+        filename="eco.xlsx",
+        staged_path="/tmp/eco.xlsx",
+        status=ImportJobStatus.running,
+        total_rows=3000,
+        processed_rows=1000,
+        started_at=now_vn() - timedelta(seconds=10),
+    )
+
+    public = job_public(job)
+
+    assert public.rows_per_second == pytest.approx(100, rel=0.05)
+    assert public.eta_seconds == pytest.approx(20, rel=0.05)
+
+    queued = job_public(EcoparkImportJob(project_id=uuid.uuid4(), filename="a.xlsx", staged_path="/tmp/a.xlsx"))
+    assert queued.rows_per_second is None and queued.eta_seconds is None
+
+
+@pytest.mark.sqlite_tables([EcoparkImportJob])
+def test_requeue_stale_jobs_only_moves_jobs_without_recent_heartbeat(session: Session) -> None:
+    now = now_vn()
+
+    def running(heartbeat_age: float, attempts: int = 1) -> EcoparkImportJob:
+        return EcoparkImportJob(project_id=uuid.uuid4(), filename="a.xlsx", staged_path="/tmp/a.xlsx",
+                                status=ImportJobStatus.running, attempts=attempts,
+                                heartbeat_at=now - timedelta(seconds=heartbeat_age))
+
+    # Heartbeat còn mới (vừa deploy): chưa đụng tới, lần kiểm tra định kỳ sau mới đưa về hàng đợi
+    fresh, dead, exhausted = running(10), running(3600), running(3600, attempts=99)
+    session.add_all([fresh, dead, exhausted])
+    session.commit()
+    ids = fresh.id, dead.id, exhausted.id
+
+    assert import_jobs.requeue_stale_jobs(session) == [ids[1]]
+    assert import_jobs.requeue_stale_jobs(session) == []
+    statuses = [session.get(EcoparkImportJob, job_id).status for job_id in ids]
+    assert statuses == [ImportJobStatus.running, ImportJobStatus.queued, ImportJobStatus.failed]
+
+
+@pytest.mark.sqlite_tables([EcoparkImportJob])
+def test_resubmit_stale_queued_jobs_skips_recent_and_locally_pending(session: Session) -> None:
+    now = now_vn()
+
+    def queued(age: float) -> EcoparkImportJob:
+        return EcoparkImportJob(project_id=uuid.uuid4(), filename="a.xlsx", staged_path="/tmp/a.xlsx",
+                                created_at=now - timedelta(seconds=age))
+
+    # Worker chết giữa commit và submit_job: job "queued" không process nào nhận
+    fresh, lost, pending = queued(10), queued(3600), queued(3600)
+    session.add_all([fresh, lost, pending])
+    session.commit()
+    ids = fresh.id, lost.id, pending.id
+
+    import_jobs._pending_jobs.add(ids[2])
+    try:
+        assert import_jobs.resubmit_stale_queued_jobs(session) == [ids[1]]
+        # Vừa gửi lại: các worker khác (lần kiểm tra kế tiếp) không gửi trùng
+        assert import_jobs.resubmit_stale_queued_jobs(session) == []
+    finally:
+        import_jobs._pending_jobs.discard(ids[2])
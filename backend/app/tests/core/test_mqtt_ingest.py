@@ -0,0 +1,56 @@
+import threading
+
+from app.core.mqtt_ingest import MqttIngestPipeline, MqttMessage
+
+
+def test_pipeline_flushes_in_batches() -> None:
+    batches: list[list[MqttMessage]] = []
+    pipeline = MqttIngestPipeline(
+        sinks=[batches.append], batch_size=10, flush_interval=0.05
+    )
+    for i in range(25):
+        assert pipeline.enqueue(1735689600.0, "t", str(i))
+    pipeline.start()
+    pipeline.stop()
+
+    assert sum(len(b) for b in batches) == 25
+    assert all(len(b) <= 10 for b in batches)
+    assert [row[2] for b in batches for row in b] == [str(i) for i in range(25)]
+    stats = pipeline.stats()
+    assert stats["flushed_rows"] == 25
+    assert stats["queue_depth"] == 0
+    assert stats["dropped"] == 0
+
+
+def test_pipeline_drops_when_full() -> None:
+    pipeline = MqttIngestPipeline(sinks=[], max_queue_size=3)
+    results = [pipeline.enqueue(1735689600.0, "t", "p") for _ in range(5)]
+
+    assert results == [True, True, True, False, False]
+    stats = pipeline.stats()
+    assert stats["enqueued"] == 3
+    assert stats["dropped"] == 2
+    assert stats["queue_depth"] == 3
+
+
+def test_pipeline_failing_sink_does_not_block_others() -> None:
+    received: list[MqttMessage] = []
+    done = threading.Event()
+
+    def broken_sink(rows: list[MqttMessage]) -> None:
+        raise RuntimeError("boom")
+
+    def good_sink(rows: list[MqttMessage]) -> None:
+        received.extend(rows)
+        done.set()
+
+    pipeline = MqttIngestPipeline(
+        sinks=[broken_sink, good_sink], batch_size=5, flush_interval=0.05
+    )
+    pipeline.start()
+    pipeline.enqueue(1735689600.0, "t", "p")
+    assert done.wait(2)
+    pipeline.stop()
+
+    assert len(received) == 1
+    assert pipeline.stats()["sink_errors"] == 1
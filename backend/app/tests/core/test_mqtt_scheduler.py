@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import Any
+
+from app.core.mqtt_scheduler import PublishScheduler
+
+
+class RecordingPublisher:
+    def __init__(self) -> None:
+        self.messages: list[tuple[str, dict[str, Any]]] = []
+
+    def __call__(self, topic: str, payload: dict[str, Any]) -> None:
+        self.messages.append((topic, payload))
+
+
+def test_commands_within_window_are_coalesced() -> None:
+    async def scenario() -> RecordingPublisher:
+        publisher = RecordingPublisher()
+        scheduler = PublishScheduler(publisher, window=0.05, deltas=False)
+        await scheduler.start()
+
+        scheduler.submit("t", [1, 2])
+        await asyncio.to_thread(scheduler.submit, "t", [3, 2])
+        scheduler.submit("other", [9])
+        await asyncio.sleep(0.1)
+
+        stats = scheduler.stats()
+        assert stats["coalesced"] == 1 and stats["messages_saved"] == 1
+        assert stats["max_added_latency_ms"] >= 40
+        return publisher
+
+    publisher = asyncio.run(scenario())
+    assert publisher.messages == [
+        ("t", {"channels": [2, 3], "value": 1}),
+        ("other", {"channels": [9], "value": 1}),
+    ]
+
+
+def test_identical_state_is_skipped_and_changes_are_sent_as_deltas() -> None:
+    publisher = RecordingPublisher()
+    scheduler = PublishScheduler(publisher, deltas=True)
+
+    scheduler.submit("t", [1, 2, 3])
+    scheduler.submit("t", [3, 2, 1])
+    scheduler.submit("t", [2, 3, 4])
+
+    assert publisher.messages == [
+        ("t", {"channels": [1, 2, 3], "value": 1}),
+        ("t", {"channels": [1], "value": 0}),
+        ("t", {"channels": [4], "value": 1}),
+    ]
+    assert scheduler.stats()["deduplicated"] == 1
+
+
+def test_without_deltas_every_state_is_sent_in_full() -> None:
+    publisher = RecordingPublisher()
+    scheduler = PublishScheduler(publisher)
+
+    # Worker khác có thể đã đổi đèn: không bỏ qua trạng thái trùng với lần gửi trước của worker này
+    scheduler.submit("t", [1, 2])
+    scheduler.submit("t", [2, 1])
+    scheduler.submit("t", [])
+    assert publisher.messages == [("t", {"channels": [1, 2], "value": 1})] * 2
+    assert scheduler.stats()["messages_saved"] == 0
+
+
+def test_resync_sends_full_state_and_failed_publish_is_retried() -> None:
+    publisher = RecordingPublisher()
+    scheduler = PublishScheduler(publisher, deltas=True, resync_interval=0)
+
+    scheduler.submit("t", [1])
+    scheduler.submit("t", [1])
+    assert publisher.messages == [("t", {"channels": [1], "value": 1})] * 2
+    # Resync vẫn tắt các kênh đã bật trước đó, kể cả khi danh sách mới rỗng
+    scheduler.submit("t", [2])
+    scheduler.submit("t", [])
+    assert publisher.messages[2:] == [
+        ("t", {"channels": [1], "value": 0}),
+        ("t", {"channels": [2], "value": 1}),
+        ("t", {"channels": [2], "value": 0}),
+    ]
+    # Một lệnh thành hai tin (tắt + bật): số tin tiết kiệm không âm
+    assert scheduler.stats()["messages_saved"] == 0
+
+    failing = PublishScheduler(_fail_once(publisher), deltas=True)
+    failing.submit("u", [5])
+    failing.submit("u", [5])
+    assert publisher.messages[-1] == ("u", {"channels": [5], "value": 1})
+
+
+def _fail_once(publisher: RecordingPublisher) -> Any:
+    failed = threading.Event()
+
+    def publish(topic: str, payload: dict[str, Any]) -> None:
+        if not failed.is_set():
+            failed.set()
+            raise ConnectionError("broker down")
+        publisher(topic, payload)
+
+    return publish
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.core.mqtt_service import (
+    MQTT_ERR_NO_CONN,
+    MQTT_ERR_SUCCESS,
+    MqttQueueFullError,
+    MqttService,
+)
+
+
+class FakeClient:
+    """Giả lập paho Client: kết nối/ack được điều khiển từ test, callback gọi từ luồng khác."""
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.published: list[tuple[str, Any, int]] = []
+        self.subscriptions: list[str] = []
+        self.next_mid = 0
+
+    def reconnect_delay_set(self, min_delay: int, max_delay: int) -> None:
+        self.reconnect_delay = (min_delay, max_delay)
+
+    def connect_async(self, host: str, port: int, keepalive: int = 60) -> None:
+        self.address = (host, port)
+
+    def loop_start(self) -> None:
+        pass
+
+    def loop_stop(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        self.connected = False
+
+    def subscribe(self, topic: str, qos: int = 0) -> None:
+        self.subscriptions.append(topic)
+
+    def publish(self, topic: str, payload: Any, qos: int = 0) -> SimpleNamespace:
+        self.next_mid += 1
+        if not self.connected:
+            return SimpleNamespace(rc=MQTT_ERR_NO_CONN, mid=self.next_mid)
+        self.published.append((topic, payload, qos))
+        # Broker ack từ luồng mạng
+        threading.Thread(target=self.on_publish, args=(self, None, self.next_mid, 0, None)).start()
+        return SimpleNamespace(rc=MQTT_ERR_SUCCESS, mid=self.next_mid)
+
+    def simulate_connect(self) -> None:
+        self.connected = True
+        threading.Thread(target=self.on_connect, args=(self, None, {}, 0, None)).start()
+
+    def simulate_disconnect(self) -> None:
+        self.connected = False
+        threading.Thread(target=self.on_disconnect, args=(self, None, {}, 7, None)).start()
+
+
+def make_service(client: FakeClient, **kwargs: Any) -> MqttService:
+    return MqttService(
+        lambda: client,
+        "broker.test",
+        1883,
+        subscribe_topic="secure/topic",
+        shared_group="backend",
+        reconnect_min_delay=0.01,
+        **kwargs,
+    )
+
+
+def test_publish_is_held_until_connected_and_resubscribes_on_reconnect() -> None:
+    async def scenario() -> None:
+        client = FakeClient()
+        service = make_service(client)
+        await service.start()  # không chặn dù broker chưa kết nối
+
+        pending = asyncio.create_task(service.publish("a", "1", qos=1, timeout=2))
+        await asyncio.sleep(0.05)
+        assert not pending.done() and client.published == []
+
+        client.simulate_connect()
+        await pending
+        assert client.published == [("a", "1", 1)]
+        assert client.subscriptions == ["$share/backend/secure/topic"]
+
+        client.simulate_disconnect()
+        await asyncio.sleep(0.05)
+        pending = asyncio.create_task(service.publish("b", "2", timeout=2))
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        client.simulate_connect()
+        await pending
+        assert [topic for topic, _, _ in client.published] == ["a", "b"]
+        assert client.subscriptions == ["$share/backend/secure/topic"] * 2
+
+        stats = service.stats()
+        assert stats["connected"] and stats["connects"] == 2 and stats["published"] == 2
+        await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_publish_timeout_drops_message() -> None:
+    async def scenario() -> None:
+        client = FakeClient()
+        service = make_service(client)
+        await service.start()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await service.publish("a", "1", timeout=0.05)
+        client.simulate_connect()
+        await service.publish("b", "2", timeout=2)
+
+        assert [topic for topic, _, _ in client.published] == ["b"]
+        assert service.stats()["publish_timeouts"] == 1
+        await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_client_publish_error_fails_message_and_keeps_sending() -> None:
+    async def scenario() -> None:
+        client = FakeClient()
+        service = make_service(client)
+        await service.start()
+        client.simulate_connect()
+
+        publish = client.publish
+
+        def reject_wildcards(topic: str, payload: Any, qos: int = 0) -> SimpleNamespace:
+            if "#" in topic:
+                raise ValueError("Publish topic cannot contain wildcards.")
+            return publish(topic, payload, qos)
+
+        client.publish = reject_wildcards
+        with pytest.raises(ValueError):
+            await service.publish("bad/#", "1", timeout=2)
+        await service.publish("good", "2", timeout=2)
+
+        assert [topic for topic, _, _ in client.published] == ["good"]
+        assert service.stats()["publish_errors"] == 1
+        await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_queue_is_bounded_and_publish_nowait_is_threadsafe() -> None:
+    async def scenario() -> None:
+        client = FakeClient()
+        service = make_service(client, max_queue_size=2)
+        await service.start()
+
+        await asyncio.to_thread(service.publish_nowait, "a", "1")
+        service.publish_nowait("b", "2")
+        service.publish_nowait("c", "3")
+        await asyncio.sleep(0.05)
+        # "a" đang chờ kết nối trong luồng gửi, "b" và "c" lấp đầy hàng đợi
+        with pytest.raises(MqttQueueFullError):
+            await service.publish("d", "4")
+
+        client.simulate_connect()
+        for _ in range(100):
+            if len(client.published) == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert [topic for topic, _, _ in client.published] == ["a", "b", "c"]
+        await service.stop()
+
+    asyncio.run(scenario())
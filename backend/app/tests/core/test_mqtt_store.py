@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from app.core.mqtt_ingest import MqttRow
+from app.core.mqtt_store import MqttMessageStore, StoreExporter
+
+
+def test_store_query_by_time_and_topic(tmp_path: Path) -> None:
+    store = MqttMessageStore(str(tmp_path), segment_max_records=4)
+    store.append([(1000.0 + i, "a" if i % 2 else "b", f"p{i}") for i in range(10)])
+    # Rotation happens between batches, never inside one
+    assert store.stats()["segments"] == 1
+    store.append([(1010.0, "c", "last")])
+    store.append([(1011.0, "a", "rotated")])
+    assert store.stats()["segments"] == 2
+
+    everything = list(store.query())
+    assert [m.seq for m in everything] == list(range(12))
+
+    window = list(store.query(from_ms=1_003_000, to_ms=1_006_000))
+    assert [m.payload for m in window] == ["p3", "p4", "p5", "p6"]
+
+    topic_a = list(store.query(topic="a", from_ms=1_004_000))
+    assert [m.payload for m in topic_a] == ["p5", "p7", "p9", "rotated"]
+
+    assert list(store.query(topic="missing")) == []
+    assert len(list(store.query(limit=3))) == 3
+
+
+def test_store_keeps_timestamps_monotonic(tmp_path: Path) -> None:
+    store = MqttMessageStore(str(tmp_path))
+    store.append([(2000.0, "t", "x"), (1999.0, "t", "y")])
+
+    assert [m.timestamp_ms for m in store.query()] == [2_000_000, 2_000_000]
+
+
+def test_store_retention_and_exporter_cursor(tmp_path: Path) -> None:
+    store = MqttMessageStore(str(tmp_path), segment_max_records=2, max_segments=2)
+    for i in range(4):
+        store.append([(1000.0 + 2 * i, "t", f"{i}a"), (1001.0 + 2 * i, "t", f"{i}b")])
+    assert store.stats()["segments"] == 2
+    assert [m.payload for m in store.query()] == ["2a", "2b", "3a", "3b"]
+
+    exported: list[MqttRow] = []
+    exporter = StoreExporter(store, exported.extend, "test", batch_size=3)
+    assert exporter.export_once() == 3
+    assert exporter.export_once() == 1
+    assert exporter.export_once() == 0
+    assert [row[2] for row in exported] == ["2a", "2b", "3a", "3b"]
+    assert exporter.stats()["lag"] == 0
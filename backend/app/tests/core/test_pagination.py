@@ -0,0 +1,57 @@
+import pytest
+from sqlmodel import Session
+
+from app import crud
+from app.core.pagination import CountMode, InvalidCursorError, count_rows, encode_cursor
+from app.models import ProvinceList, Role
+
+pytestmark = pytest.mark.sqlite_tables([Role, ProvinceList])
+
+
+@pytest.fixture
+def session(session: Session) -> Session:
+    session.add_all(Role(name=f"role-{i}", rank=i) for i in range(7))
+    session.add_all(ProvinceList(code=f"{i:02d}", name_vi=f"Tỉnh {i}", full_name_vi=f"Tỉnh {i}") for i in range(5))
+    session.commit()
+    return session
+
+
+def test_cursor_pages_cover_every_row_once_in_key_order(session: Session) -> None:
+    seen = []
+    page, cursor = crud.get_roles(session=session, limit=3)
+    seen.extend(page)
+    while cursor:
+        page, cursor = crud.get_roles(session=session, limit=3, cursor=cursor)
+        seen.extend(page)
+
+    ids = [role.id for role in seen]
+    assert len(ids) == 7
+    assert ids == sorted(ids)
+    # skip/limit cũ trả cùng thứ tự
+    offset_page, _ = crud.get_roles(session=session, skip=3, limit=3)
+    assert [role.id for role in offset_page] == ids[3:6]
+    # limit=0: trang rỗng, không có cursor
+    assert crud.get_roles(session=session, limit=0) == ([], None)
+
+
+def test_last_full_page_has_no_cursor_and_string_keys_round_trip(session: Session) -> None:
+    page, cursor = crud.get_all_provinces(session=session, limit=5)
+    assert len(page) == 5 and cursor is None
+
+    page, cursor = crud.get_all_provinces(session=session, limit=2, cursor=encode_cursor(ProvinceList, "01"))
+    assert [p.code for p in page] == ["02", "03"]
+    assert cursor is not None
+
+
+def test_invalid_or_foreign_cursor_is_rejected(session: Session) -> None:
+    with pytest.raises(InvalidCursorError):
+        crud.get_roles(session=session, cursor="not-a-cursor")
+    with pytest.raises(InvalidCursorError):
+        crud.get_roles(session=session, cursor=encode_cursor(ProvinceList, "01"))
+
+
+def test_count_modes(session: Session) -> None:
+    assert count_rows(session, Role, CountMode.exact) == 7
+    # Không phải Postgres (không có pg_class): ước lượng quay về đếm chính xác
+    assert count_rows(session, Role, CountMode.estimated) == 7
+    assert count_rows(session, Role, CountMode.none) is None
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from app.core.password_hasher import PasswordHasher, PasswordHasherBusyError
+
+
+def test_verify_and_update_rehashes_when_rounds_change() -> None:
+    old = PasswordHasher(rounds=4, workers=0)
+    hashed = old.hash("secret")
+    assert hashed.startswith("$2b$04$")
+
+    new = PasswordHasher(rounds=5, workers=0)
+    verified, new_hash = new.verify_and_update("secret", hashed)
+    assert verified and new_hash is not None and new_hash.startswith("$2b$05$")
+    assert new.verify_and_update("secret", new_hash) == (True, None)
+    assert new.verify_and_update("wrong", hashed) == (False, None)
+    assert new.stats()["rehashed"] == 1
+
+
+def test_admission_rejects_when_all_slots_are_busy() -> None:
+    hasher = PasswordHasher(rounds=4, workers=0, max_concurrency=1, admission_timeout=0.05)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(*_: object) -> str:
+        started.set()
+        release.wait(5)
+        return "done"
+
+    worker = threading.Thread(target=hasher._run, args=(slow,))
+    worker.start()
+    started.wait(5)
+    with pytest.raises(PasswordHasherBusyError):
+        hasher.hash("secret")
+    release.set()
+    worker.join()
+
+    stats = hasher.stats()
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
+    assert hasher.verify("secret", hasher.hash("secret"))
+
+
+def test_process_pool_hashes_out_of_process() -> None:
+    hasher = PasswordHasher(rounds=4, workers=1)
+    try:
+        hashed = hasher.hash("secret")
+        assert hasher.verify("secret", hashed)
+        assert hasher.stats()["submitted"] == 2
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from app.core import invalidation
+from app.core.invalidation import InProcessInvalidationBus, PostgresInvalidationBus, publish_on_commit
+from app.core.principal_cache import PRINCIPAL_TOPIC, PrincipalCache
+from app.models import User
+
+pytestmark = pytest.mark.sqlite_tables([User])
+
+
+@pytest.fixture
+def bus(monkeypatch: pytest.MonkeyPatch) -> InProcessInvalidationBus:
+    bus = InProcessInvalidationBus()
+    monkeypatch.setattr(invalidation, "invalidation_bus", bus)
+    return bus
+
+
+@pytest.fixture
+def session(session: Session) -> Session:
+    session.add(User(
+        email="a@example.com", hashed_password="x", is_active=True, creation_time=datetime.now(timezone.utc)
+    ))
+    session.commit()
+    return session
+
+
+def test_principal_cache_hits_until_user_row_changes(bus: InProcessInvalidationBus, session: Session) -> None:
+    cache = PrincipalCache(ttl=60)
+    bus.subscribe(PRINCIPAL_TOPIC, cache.invalidate)
+    user = session.exec(select(User)).one()
+    user_id = str(user.id)
+    loads: list[int] = []
+
+    def load() -> User | None:
+        loads.append(1)
+        return session.get(User, user.id)
+
+    assert cache.get_or_load(user_id, load).is_active
+    assert cache.get_or_load(user_id, load).email == "a@example.com"
+    assert len(loads) == 1
+
+    db_user = session.get(User, user.id)
+    db_user.is_active = False
+    session.add(db_user)
+    session.flush()
+    # Chưa commit: cache giữ nguyên
+    assert cache.get_or_load(user_id, load).is_active and len(loads) == 1
+    session.commit()
+
+    assert not cache.get_or_load(user_id, load).is_active
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 2 and cache.stats()["invalidations"] == 1
+
+
+def test_publish_on_commit_is_dropped_on_rollback(bus: InProcessInvalidationBus, session: Session) -> None:
+    received: list[str] = []
+    bus.subscribe("topic", received.append)
+
+    session.connection()  # như khi được gọi trong after_flush: transaction đang mở
+    publish_on_commit(session, "topic", "k1")
+    session.rollback()
+    session.commit()
+    assert received == []
+
+    publish_on_commit(session, "topic", "k2")
+    session.commit()
+    assert received == ["k2"]
+
+
+def test_load_racing_with_invalidation_is_not_cached() -> None:
+    cache = PrincipalCache(ttl=60)
+    user = User(email="b@example.com", hashed_password="x")
+
+    def load() -> User:
+        cache.invalidate(str(user.id))
+        return user
+
+    cache.get_or_load(str(user.id), load)
+    assert cache.stats()["entries"] == 0
+
+
+def test_postgres_bus_skips_own_notifications() -> None:
+    bus = PostgresInvalidationBus("postgresql://unused")
+    received: list[str] = []
+    bus.subscribe("topic", received.append)
+
+    bus._handle(json.dumps({"origin": bus.origin, "topic": "topic", "key": "mine"}))
+    bus._handle(json.dumps({"origin": "other", "topic": "topic", "key": "theirs"}))
+
+    assert received == ["theirs"] and bus.stats()["received"] == 1
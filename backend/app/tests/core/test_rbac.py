@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.core import invalidation
+from app.core.invalidation import InProcessInvalidationBus
+from app.core.rbac import RBAC_TOPIC, ProjectRankCache
+from app.models import ProjectList, Role, User, UserProjectRole
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> ProjectRankCache:
+    bus = InProcessInvalidationBus()
+    monkeypatch.setattr(invalidation, "invalidation_bus", bus)
+    cache = ProjectRankCache(ttl=60)
+    bus.subscribe(RBAC_TOPIC, cache.invalidate)
+    return cache
+
+
+pytestmark = pytest.mark.sqlite_tables([User, Role, ProjectList, UserProjectRole])
+
+
+def test_ranks_are_cached_and_invalidated_on_assignment_changes(cache: ProjectRankCache, session: Session) -> None:
+    user = User(email="u@example.com", hashed_password="x", creation_time=datetime.now(timezone.utc))
+    manager, viewer = Role(name="manager", rank=2), Role(name="viewer", rank=4)
+    p1, p2 = ProjectList(name_en="P1"), ProjectList(name_en="P2")
+    session.add_all([user, manager, viewer, p1, p2])
+    session.add(UserProjectRole(user_id=user.id, project_id=p1.id, role_id=viewer.id))
+    session.add(UserProjectRole(user_id=user.id, project_id=p1.id, role_id=manager.id))
+    session.commit()
+    user_id, p1_id, p2_id, viewer_id = user.id, p1.id, p2.id, viewer.id
+
+    queries: list[str] = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    assert cache.ranks(session, user_id) == {p1_id: 2}
+    assert cache.rank_in_project(session, user_id, p1_id) == 2
+    assert cache.rank_in_project(session, user_id, p2_id) is None
+    assert len(queries) == 1
+
+    session.add(UserProjectRole(user_id=user_id, project_id=p2_id, role_id=viewer_id))
+    session.commit()
+    assert cache.rank_in_project(session, user_id, p2_id) == 4
+
+    viewer.rank = 3  # sửa rank của Role: làm mới toàn bộ
+    session.add(viewer)
+    session.commit()
+    assert cache.rank_in_project(session, user_id, p2_id) == 3
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3 and stats["invalidations"] == 3
+
+
+def test_load_racing_with_invalidation_is_not_cached(cache: ProjectRankCache, session: Session) -> None:
+    user_id = uuid.uuid4()
+    event.listen(
+        session.get_bind(), "before_cursor_execute", lambda *args: cache.invalidate(str(user_id))
+    )
+
+    assert cache.ranks(session, user_id) == {}
+    assert cache.stats()["entries"] == 0
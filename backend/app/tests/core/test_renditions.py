@@ -0,0 +1,55 @@
+import asyncio
+from pathlib import Path
+
+from PIL import Image
+
+from app.core.renditions import RENDITIONS_FOLDER, ImageRenditions, manifest_path
+
+
+def test_renditions_are_content_addressed_and_exposed_as_srcset(tmp_path: Path) -> None:
+    detail_dir = tmp_path / "EcoRetreat" / "CHITIET"
+    detail_dir.mkdir(parents=True)
+    source = detail_dir / "a.png"
+    Image.new("RGBA", (800, 400), (255, 0, 0, 128)).save(source)
+    renditions = ImageRenditions(tmp_path, widths=[320, 640, 1280], formats=["webp"], workers=0)
+
+    # Chưa tạo: không có srcset (và được nhớ tạm)
+    assert renditions.srcset(source, "http://x/api/v1/static") is None
+
+    renditions.submit(source)
+    manifest = renditions.manifest(source)
+    # Không phóng to quá chiều rộng gốc
+    assert manifest["renditions"]["webp"].keys() == {"320", "640"}
+    filename = manifest["renditions"]["webp"]["320"]
+    assert filename.startswith(manifest["hash"])
+    with Image.open(tmp_path / RENDITIONS_FOLDER / filename) as image:
+        assert image.size == (320, 160) and image.format == "WEBP"
+
+    srcset = renditions.srcset(source, "http://x/api/v1/static")
+    assert srcset == {
+        "webp": f"http://x/api/v1/static/renditions/{filename} 320w, "
+        f"http://x/api/v1/static/renditions/{manifest['renditions']['webp']['640']} 640w"
+    }
+
+    # Cùng nội dung dưới tên khác dùng lại đúng các file đã có
+    copy = detail_dir / "b.png"
+    copy.write_bytes(source.read_bytes())
+    assert renditions.render(copy)["renditions"] == manifest["renditions"]
+    assert manifest_path(tmp_path, copy).exists()
+    assert renditions.stats()["rendered"] == 2
+
+
+def test_preload_reads_missing_manifests_once_off_the_loop(tmp_path: Path) -> None:
+    detail_dir = tmp_path / "EcoRetreat" / "CHITIET"
+    detail_dir.mkdir(parents=True)
+    sources = [detail_dir / "a.png", detail_dir / "b.png"]
+    Image.new("RGB", (800, 400), "blue").save(sources[0])
+    renditions = ImageRenditions(tmp_path, widths=[320], formats=["webp"], workers=0)
+    renditions.submit(sources[0])
+    renditions._cache.clear()
+
+    asyncio.run(renditions.preload(sources * 2))
+    # Sau khi nạp trước: cả ảnh có lẫn chưa có ảnh phái sinh đều lấy từ bộ nhớ đệm
+    assert renditions.srcset(sources[0], "http://x") is not None
+    assert renditions.srcset(sources[1], "http://x") is None
+    assert (renditions.hits, renditions.misses) == (2, 0)
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from app.core.replicas import ReplicaRouter, track_writes
+from app.models import Ecopark
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+def make_router(clock: Clock, lags: dict[str, float | Exception]) -> ReplicaRouter:
+    async def probe(engine: str) -> float:
+        lag = lags[engine]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    return ReplicaRouter(
+        "primary", list(lags), max_lag=5, sticky_for=3, retry_after=30, probe=probe, clock=clock
+    )
+
+
+def test_reads_balance_over_fresh_replicas_and_skip_lagging_ones(clock: Clock) -> None:
+    lags: dict[str, float | Exception] = {"r1": 0.2, "r2": 0.0}
+    router = make_router(clock, lags)
+
+    # Chưa đo độ trễ: chưa tin replica nào
+    assert router.engine_for_read() == "primary"
+
+    asyncio.run(router.check_replicas())
+    assert {router.engine_for_read() for _ in range(4)} == {"r1", "r2"}
+
+    lags["r1"] = 12.0
+    asyncio.run(router.check_replicas())
+    assert {router.engine_for_read() for _ in range(4)} == {"r2"}
+
+    lags["r2"] = 9.0
+    asyncio.run(router.check_replicas())
+    assert router.engine_for_read() == "primary"
+    assert router.stats()["fallbacks"] == 2
+
+
+def test_failed_replica_is_skipped_until_retry(clock: Clock) -> None:
+    lags: dict[str, float | Exception] = {"r1": 0.0}
+    router = make_router(clock, lags)
+    asyncio.run(router.check_replicas())
+    assert router.engine_for_read() == "r1"
+
+    router.report_failure("r1", ConnectionError("connection refused"))
+    assert router.engine_for_read() == "primary"
+
+    clock.now += 31
+    assert router.engine_for_read() == "r1"
+
+    lags["r1"] = ConnectionError("connection refused")
+    asyncio.run(router.check_replicas())
+    assert router.engine_for_read() == "primary"
+    assert router.stats()["replicas"][0]["failures"] == 2
+
+
+def test_user_reads_own_writes_from_primary(clock: Clock) -> None:
+    router = make_router(clock, {"r1": 0.0})
+    asyncio.run(router.check_replicas())
+
+    router.mark_write("alice")
+    # Thời gian bám primary không nhỏ hơn max_lag của replica
+    assert router.sticky_for == 5
+    assert router.engine_for_read("alice") == "primary"
+    assert router.engine_for_read("bob") == "r1"
+    assert router.engine_for_read() == "r1"
+
+    clock.now += 6
+    assert router.engine_for_read("alice") == "r1"
+    router.mark_write("bob")
+    assert router.stats()["sticky_users"] == 1
+
+
+@pytest.mark.sqlite_tables([Ecopark])
+def test_track_writes_sees_commits_from_threadpool_routes(sqlite_engine: Engine) -> None:
+    app = FastAPI()
+    seen: dict[str, bool] = {}
+
+    @app.middleware("http")
+    async def middleware(request: Request, call_next):
+        with track_writes() as writes:
+            response = await call_next(request)
+        seen[request.url.path] = bool(writes)
+        return response
+
+    @app.post("/write")
+    def write() -> dict:
+        with Session(sqlite_engine) as session:
+            session.add(Ecopark(port=1))
+            session.commit()
+        return {}
+
+    @app.post("/read")
+    def read() -> dict:
+        with Session(sqlite_engine) as session:
+            session.exec(select(Ecopark)).all()
+        return {}
+
+    with TestClient(app) as client:
+        client.post("/write")
+        client.post("/read")
+    assert seen == {"/write": True, "/read": False}
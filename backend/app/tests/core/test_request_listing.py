@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from sqlmodel import Session
+
+from app import crud
+from app.core.pagination import CountMode
+from app.models import ProjectList, Request, RequestStatus, Role, User
+from app.tests.utils.session import AwaitableSession
+
+
+pytestmark = pytest.mark.sqlite_tables([User, Role, ProjectList, Request])
+
+
+def test_windowed_listing_pages_filters_and_counts(session: Session, async_session: AwaitableSession) -> None:
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    user = User(email="u@example.com", hashed_password="x", creation_time=start)
+    role, project = Role(name="viewer", rank=4), ProjectList(name_en="P1")
+    session.add_all([user, role, project])
+    for i in range(7):
+        status = RequestStatus.pending if i % 2 else RequestStatus.approved
+        session.add(Request(project_id=project.id, role_id=role.id, requester_id=user.id,
+                            status=status, created_at=start + timedelta(hours=i)))
+    session.commit()
+
+    def listing(**kwargs: Any) -> Any:
+        return asyncio.run(crud.get_project_requests_async(session=async_session, project_id=project.id, **kwargs))
+
+    # Trang đầu: một truy vấn trả cả dữ liệu lẫn tổng số
+    page, total, cursor = listing(limit=3)
+    assert async_session.calls == 1
+    assert total == 7 and cursor is not None
+    seen = [r.created_at for r in page]
+    while cursor:
+        page, total, cursor = listing(limit=3, cursor=cursor)
+        seen.extend(r.created_at for r in page)
+        assert total == 7
+    assert seen == sorted(seen, reverse=True) and len(seen) == 7
+
+    page, total, _ = listing(status=RequestStatus.pending, created_from=start + timedelta(hours=2))
+    assert total == 2 and all(r.status == RequestStatus.pending for r in page)
+
+    # OFFSET vượt quá cuối danh sách vẫn trả tổng số đúng
+    assert listing(skip=10)[:2] == ([], 7)
+    calls = async_session.calls
+    assert listing(count=CountMode.none)[1] is None
+    assert async_session.calls == calls + 1
+
+    # limit=0: trang rỗng, không có cursor
+    assert listing(limit=0) == ([], 7, None)
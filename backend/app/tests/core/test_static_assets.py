@@ -0,0 +1,71 @@
+import os
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.static_assets import IMMUTABLE, MANIFEST_NAME, ImmutableStaticFiles, StaticManifest
+
+
+def make_client(static_dir: Path, manifest: StaticManifest) -> TestClient:
+    app = FastAPI()
+    app.mount("/static", ImmutableStaticFiles(directory=static_dir, manifest=manifest), name="static")
+    return TestClient(app)
+
+
+def test_fingerprinted_urls_are_immutable_with_strong_etags(tmp_path: Path) -> None:
+    (tmp_path / "DUAN").mkdir()
+    image = tmp_path / "DUAN" / "pk_3.png"
+    image.write_bytes(b"\x89PNG fake image")
+    manifest = StaticManifest(tmp_path)
+    client = make_client(tmp_path, manifest)
+
+    # Chưa hash: URL tên gốc, phải xác thực lại
+    assert manifest.url_path("DUAN/pk_3.png") == "DUAN/pk_3.png"
+    response = client.get("/static/DUAN/pk_3.png")
+    assert response.headers["cache-control"] == "no-cache"
+
+    asset = manifest.current("DUAN/pk_3.png")
+    url = manifest.url_path("DUAN/pk_3.png")
+    assert url == f"DUAN/pk_3.{asset.fingerprint}.png"
+
+    response = client.get(f"/static/{url}")
+    assert response.status_code == 200 and response.content == image.read_bytes()
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["etag"] == f'"{asset.digest}"'
+    assert response.headers["content-type"] == "image/png"
+    assert client.get(f"/static/{url}", headers={"If-None-Match": asset.etag()}).status_code == 304
+
+    # Thay nội dung: URL cũ không còn phục vụ (không trả nội dung mới dưới URL bất biến cũ)
+    image.write_bytes(b"\x89PNG another image")
+    os.utime(image, ns=(asset.mtime_ns + 10**9, asset.mtime_ns + 10**9))
+    assert client.get(f"/static/{url}").status_code == 404
+    assert manifest.current("DUAN/pk_3.png").fingerprint != asset.fingerprint
+
+
+def test_build_precompresses_text_assets_and_reloads(tmp_path: Path) -> None:
+    (tmp_path / "app.css").write_text("body { color: red; }\n" * 200)
+    (tmp_path / "renditions").mkdir()
+    (tmp_path / "renditions" / "abc-320.webp").write_bytes(b"RIFF")
+    entries = StaticManifest(tmp_path).build()
+
+    assert set(entries) == {"app.css"}
+    assert "gzip" in entries["app.css"]["encodings"] and (tmp_path / "app.css.gz").is_file()
+    assert (tmp_path / MANIFEST_NAME).is_file()
+
+    manifest = StaticManifest(tmp_path)
+    assert manifest.load() == 1
+    url = manifest.url_path("app.css")
+    client = make_client(tmp_path, manifest)
+
+    response = client.get(f"/static/{url}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == (tmp_path / "app.css").read_text()
+    assert response.headers["etag"].endswith('-gzip"')
+
+    identity = client.get(f"/static/{url}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    # Ảnh phái sinh đã đặt tên theo hash: cache vĩnh viễn ngay cả với tên gốc
+    assert client.get("/static/renditions/abc-320.webp").headers["cache-control"] == IMMUTABLE
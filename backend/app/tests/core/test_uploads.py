@@ -0,0 +1,52 @@
+import asyncio
+import io
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from app.core.uploads import gather_bounded, remove_file, save_upload
+
+
+def test_save_upload_writes_in_chunks_and_leaves_no_part_file(tmp_path: Path) -> None:
+    payload = bytes(range(256)) * 1000
+    upload = UploadFile(io.BytesIO(payload), filename="a.jpg")
+    target = tmp_path / "a.jpg"
+
+    asyncio.run(save_upload(upload, target, chunk_size=4096))
+
+    assert target.read_bytes() == payload
+    assert [p.name for p in tmp_path.iterdir()] == ["a.jpg"]
+    assert asyncio.run(remove_file(target)) is True
+    assert asyncio.run(remove_file(target)) is False
+
+
+def test_failed_upload_removes_part_file(tmp_path: Path) -> None:
+    upload = UploadFile(io.BytesIO(b"x" * 10), filename="a.jpg")
+    target = tmp_path / "missing" / "a.jpg"
+
+    try:
+        asyncio.run(save_upload(upload, target))
+    except FileNotFoundError:
+        pass
+    assert not (tmp_path / "missing").exists()
+
+
+def test_gather_bounded_limits_concurrency_and_keeps_order() -> None:
+    running = peak = 0
+
+    async def handle(i: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if i == 3:
+            raise ValueError("bad file")
+        return i * 10
+
+    results = asyncio.run(gather_bounded(range(8), handle, limit=3))
+
+    assert peak == 3
+    assert results[:3] == [0, 10, 20]
+    assert isinstance(results[3], ValueError)
+    assert results[7] == 70
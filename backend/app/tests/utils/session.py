@@ -0,0 +1,17 @@
+import asyncio
+from typing import Any
+
+from sqlmodel import Session
+
+
+class AwaitableSession:
+    """Bọc Session đồng bộ (SQLite) thành giao diện `await session.exec(...)` của AsyncSession."""
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.calls = 0
+
+    async def exec(self, statement: Any) -> Any:
+        self.calls += 1
+        await asyncio.sleep(0.01)  # nhường event loop như một truy vấn thật
+        return self.session.exec(statement)
@@ -0,0 +1,126 @@
+"""
+So sánh thông lượng route đọc đồng bộ (`def` + SessionDep, chạy trong threadpool 40 luồng của
+AnyIO) với route async (`async def` + AsyncSessionDep) khi có `--concurrency` client cùng gọi.
+Mỗi request chạy một truy vấn giữ kết nối `--hold` giây (pg_sleep) qua engine của app.core.db,
+hai engine dùng cùng kích thước pool để chỉ khác nhau ở cách chờ I/O.
+In ra request/s, p50/p95 cho từng mức đồng thời.
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.async_reads --concurrency 50 100 200 500
+    python -m benchmarks.async_reads --pool-size 20 --max-overflow 0 --hold 0.02
+    python -m benchmarks.async_reads --no-db     # không cần Postgres: thay truy vấn bằng sleep
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import create_async_db_engine, create_db_engine
+from app.core.db_metrics import DbMetrics
+
+
+def build_app(args: argparse.Namespace) -> tuple[FastAPI, list]:
+    url = str(settings.SQLALCHEMY_DATABASE_URI)
+    pool = dict(metrics=DbMetrics(), pool_size=args.pool_size, max_overflow=args.max_overflow, pool_timeout=60)
+    engines: list = []
+    app = FastAPI()
+
+    if args.no_db:
+        @app.get("/sync")
+        def read_sync() -> dict:
+            time.sleep(args.hold)
+            return {"ok": True}
+
+        @app.get("/async")
+        async def read_async() -> dict:
+            await asyncio.sleep(args.hold)
+            return {"ok": True}
+
+        return app, engines
+
+    engine = create_db_engine(url, **pool)
+    async_engine = create_async_db_engine(url, **pool)
+    engines.extend([engine, async_engine])
+    query = text("SELECT pg_sleep(:s)")
+
+    @app.get("/sync")
+    def read_sync() -> dict:
+        with Session(engine) as session:
+            session.execute(query, {"s": args.hold})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def read_async() -> dict:
+        async with AsyncSession(async_engine) as session:
+            await session.execute(query, {"s": args.hold})
+        return {"ok": True}
+
+    return app, engines
+
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int, total: int) -> dict:
+    latencies: list[float] = []
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    app, engines = build_app(args)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/sync")
+        await client.get("/async")
+        source = "sleep" if args.no_db else f"pg_sleep, pool {args.pool_size}+{args.max_overflow}"
+        print(f"{source}, giữ {args.hold * 1000:.0f}ms/request")
+        print(f"{'đồng thời':>10} {'route':>6} {'request/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for concurrency in args.concurrency:
+            total = max(args.requests, concurrency * 4)
+            for path in ("/sync", "/async"):
+                result = await run_level(client, path, concurrency, total)
+                print(f"{concurrency:>10} {path[1:]:>6} {result['rps']:>10.0f} {result['p50']:>8.1f} {result['p95']:>8.1f}")
+    for engine in engines:
+        result = engine.dispose()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--requests", type=int, default=1000, help="số request tối thiểu mỗi mức")
+    parser.add_argument("--hold", type=float, default=0.01, help="giây mỗi truy vấn")
+    parser.add_argument("--pool-size", type=int, default=settings.DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=settings.DB_MAX_OVERFLOW)
+    parser.add_argument("--no-db", action="store_true", help="thay truy vấn bằng sleep, không cần Postgres")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Tái hiện cạn pool kết nối: `--threads` luồng (như threadpool 40 luồng của một worker) cùng giữ
+kết nối `--hold` giây mỗi request, với pool `--pool-size` + `--max-overflow`.
+In ra thông lượng, số request hết `--pool-timeout` và histogram thời gian chờ lấy kết nối
+để so sánh các cấu hình DB_POOL_*.
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.db_pool_exhaustion --threads 40 --pool-size 5 --max-overflow 10
+    python -m benchmarks.db_pool_exhaustion --threads 40 --pool-size 5 --max-overflow 0 --pool-timeout 1
+    python -m benchmarks.db_pool_exhaustion --sqlite      # không cần Postgres, giữ kết nối bằng sleep
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.core.db import create_db_engine
+from app.core.db_metrics import DbMetrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--hold", type=float, default=0.05, help="giây giữ kết nối mỗi request")
+    parser.add_argument("--pool-size", type=int, default=settings.DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=settings.DB_MAX_OVERFLOW)
+    parser.add_argument("--pool-timeout", type=float, default=settings.DB_POOL_TIMEOUT)
+    parser.add_argument("--sqlite", action="store_true", help="dùng SQLite tạm thay cho Postgres")
+    args = parser.parse_args()
+
+    metrics = DbMetrics(slow_query_ms=args.hold * 1000 * 4)
+    options = dict(
+        metrics=metrics,
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+        pool_timeout=args.pool_timeout,
+    )
+    if args.sqlite:
+        path = os.path.join(tempfile.mkdtemp(), "pool.sqlite")
+        engine = create_db_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, **options)
+    else:
+        engine = create_db_engine(str(settings.SQLALCHEMY_DATABASE_URI), **options)
+
+    def handle(_: int) -> bool:
+        try:
+            with engine.connect() as conn:
+                if args.sqlite:
+                    conn.execute(text("SELECT 1"))
+                    time.sleep(args.hold)
+                else:
+                    conn.execute(text("SELECT pg_sleep(:s)"), {"s": args.hold})
+            return True
+        except PoolTimeoutError:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(handle, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    stats = metrics.stats()
+    print(f"pool {args.pool_size}+{args.max_overflow}, {args.threads} luồng, giữ {args.hold * 1000:.0f}ms/request")
+    print(f"thành công {sum(results)}/{args.requests}, hết thời gian chờ {results.count(False)}, "
+          f"{args.requests / elapsed:.0f} request/s")
+    print(f"chờ kết nối: trung bình {stats['avg_wait_ms']}ms, tối đa {stats['max_wait_ms']}ms")
+    print(json.dumps(stats["wait_histogram"], ensure_ascii=False))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
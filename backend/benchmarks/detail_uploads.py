@@ -0,0 +1,124 @@
+"""
+So sánh cách lưu ảnh chi tiết khi upload nhiều file trong một request: cách cũ
+(`open(...).write(await file.read())` tuần tự trong event loop) với `app.core.uploads`
+(ghi theo khối trong threadpool, file tạm + đổi tên, tối đa UPLOAD_CONCURRENCY file cùng lúc).
+Chỉ đo phần lưu file trong handler (không ghi DB, không tính lúc nhận body multipart). Trong lúc
+lưu, một tác vụ nền đo độ trễ event loop: "max_stall" là lần bị chặn lâu nhất, tức thời gian các
+request khác của worker phải chờ; "peak_py" là đỉnh cấp phát Python (tracemalloc).
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.detail_uploads --files 50 --size-mb 5
+    python -m benchmarks.detail_uploads --files 20 --size-mb 5 --concurrency 1 8
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import List
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.core.config import settings
+from app.core.uploads import gather_bounded, save_upload
+
+
+class Measure:
+    """Đo phần lưu file bên trong handler (sau khi Starlette đã nhận xong body multipart)."""
+
+    def __init__(self) -> None:
+        self.result: dict = {}
+
+    async def __aenter__(self) -> "Measure":
+        self._stop = asyncio.Event()
+        self._watcher = asyncio.create_task(watch_loop(self._stop))
+        await asyncio.sleep(0)
+        tracemalloc.start()
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        elapsed = time.perf_counter() - self._started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._stop.set()
+        stall = await self._watcher
+        self.result = {"seconds": elapsed, "max_stall_ms": stall * 1000, "peak_mb": peak / 2**20}
+
+
+def build_app(directory: Path, concurrency: int, measure: Measure) -> FastAPI:
+    app = FastAPI()
+
+    @app.put("/legacy")
+    async def legacy(files: List[UploadFile] = File(...)) -> dict:
+        async with measure:
+            for file in files:
+                with open(directory / f"{uuid.uuid4()}.jpg", "wb") as buffer:
+                    content = await file.read()
+                    buffer.write(content)
+        return {"saved": len(files)}
+
+    @app.put("/chunked")
+    async def chunked(files: List[UploadFile] = File(...)) -> dict:
+        async def save_one(file: UploadFile) -> Path:
+            return await save_upload(file, directory / f"{uuid.uuid4()}.jpg")
+
+        async with measure:
+            results = await gather_bounded(files, save_one, limit=concurrency)
+        return {"saved": sum(not isinstance(r, BaseException) for r in results)}
+
+    return app
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(path: str, app: FastAPI, payload: list, measure: Measure) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.put(path, files=payload)
+    response.raise_for_status()
+    return measure.result
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    image = os.urandom(args.size_mb * 2**20)
+    payload = [("files", (f"{i}.jpg", image, "image/jpeg")) for i in range(args.files)]
+    print(f"{args.files} file × {args.size_mb} MB, khối {settings.UPLOAD_CHUNK_SIZE // 1024} KB")
+    print(f"{'cách lưu':>14} {'giây':>7} {'max_stall ms':>13} {'peak_py MB':>11}")
+    for concurrency in [None, *args.concurrency]:
+        directory = Path(tempfile.mkdtemp(prefix="upload-bench-"))
+        try:
+            measure = Measure()
+            app = build_app(directory, concurrency or 1, measure)
+            path = "/legacy" if concurrency is None else "/chunked"
+            result = await run(path, app, payload, measure)
+            label = "legacy" if concurrency is None else f"chunked ×{concurrency}"
+            print(f"{label:>14} {result['seconds']:>7.2f} {result['max_stall_ms']:>13.1f} {result['peak_mb']:>11.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, settings.UPLOAD_CONCURRENCY])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Đo thời gian nhập sheet "ECO PARK" tổng hợp (10k / 100k hàng): cách cũ (iterrows + get_by_port
++ create/update commit từng hàng) và cách mới (chuẩn hoá theo cột + INSERT ... ON CONFLICT theo khối).
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.ecopark_import --sizes 10000 100000
+    python -m benchmarks.ecopark_import --sizes 10000 --database   # cần Postgres theo cấu hình .env
+
+Với --database, mọi thay đổi nằm trong một transaction bao ngoài và được rollback khi kết thúc.
+"""
+
+import argparse
+import io
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pandas as pd
+from openpyxl import Workbook
+from sqlmodel import Session
+
+from app import crud
+from app.core.ecopark_import import IMPORT_COLUMNS, prepare_rows, upsert_rows
+from app.models import EcoparkCreate, EcoparkUpdate
+
+
+def make_workbook(count: int, description_chars: int = 0) -> bytes:
+    rng = random.Random(count)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("ECO PARK")
+    ws.append(IMPORT_COLUMNS)
+    for port in range(1, count + 1):
+        zone = rng.randint(1, 9)
+        values = {
+            "port": port,
+            "building_name": f"B{port}",
+            "picture_name": f"pic_{port}",
+            "building_type_vi": "Biệt Thự Đơn Lập",
+            "building_type_en": "Detached Villa",
+            "zone_name_vi": f"Phân Khu {zone}",
+            "zone_name_en": f"Zone {zone}",
+            "zone": f"Z{zone}",
+            "bedroom": rng.randint(1, 5) if port % 7 else None,
+            "price": rng.randint(1, 100) * 1_000_000,
+            "status_vi": "Còn trống",
+            "status_en": "Available",
+        }
+        if description_chars:
+            values["description_vi"] = f"Mô tả căn {port} " + "x" * description_chars
+            values["description_en"] = f"Unit {port} " + "y" * description_chars
+        ws.append([values.get(name) for name in IMPORT_COLUMNS])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_rows(df: pd.DataFrame) -> list[EcoparkCreate]:
+    """Phần chuẩn hoá theo từng hàng của cách cũ (không gồm DB)."""
+    rows = []
+    for _, row in df.iterrows():
+        data = {
+            name: row.get(name) if name in row and not pd.isna(row.get(name)) else None
+            for name in IMPORT_COLUMNS if name not in ("port", "bedroom", "price")
+        }
+        rows.append(EcoparkCreate(
+            port=int(row["port"]),
+            bedroom=int(row["bedroom"]) if "bedroom" in row and not pd.isna(row.get("bedroom")) else None,
+            price=int(row["price"]) if "price" in row and not pd.isna(row.get("price")) else None,
+            **data,
+        ))
+    return rows
+
+
+def legacy_import(session: Session, df: pd.DataFrame) -> None:
+    for ecopark_data in legacy_rows(df):
+        existing_ecopark = crud.get_by_port(session=session, port=ecopark_data.port)
+        if existing_ecopark:
+            ecopark_update_data = EcoparkUpdate(**ecopark_data.dict(exclude={"port"}))
+            crud.update_ecopark(session=session, db_ecopark=existing_ecopark, ecopark_in=ecopark_update_data)
+        else:
+            crud.create_ecopark(session=session, ecopark_in=ecopark_data)
+
+
+def bulk_import(session: Session, df: pd.DataFrame) -> None:
+    rows, _ = prepare_rows(df)
+    upsert_rows(session, rows)
+    session.commit()
+
+
+def timed(func: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def in_rolled_back_session(func: Callable[[Session], None]) -> float:
+    from app.core.db import engine
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # commit() trong crud chỉ giải phóng savepoint; transaction ngoài bị rollback
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+            elapsed = timed(lambda: func(session))
+        transaction.rollback()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--database", action="store_true", help="đo cả phần ghi vào Postgres")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        content = make_workbook(size)
+        df = None
+
+        def read() -> None:
+            nonlocal df
+            df = pd.read_excel(io.BytesIO(content), sheet_name="ECO PARK")
+
+        print(f"--- {size} hàng ({len(content) / 1e6:.1f} MB)")
+        print(f"read_excel:               {timed(read):10.1f} ms")
+        print(f"chuẩn hoá cũ (iterrows):  {timed(lambda: legacy_rows(df)):10.1f} ms")
+        print(f"chuẩn hoá mới (theo cột): {timed(lambda: prepare_rows(df)):10.1f} ms")
+        if args.database:
+            print(f"nhập mới (upsert theo khối): {in_rolled_back_session(lambda s: bulk_import(s, df)):10.1f} ms")
+            print(f"nhập cũ (từng hàng):         {in_rolled_back_session(lambda s: legacy_import(s, df)):10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
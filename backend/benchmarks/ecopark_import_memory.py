@@ -0,0 +1,76 @@
+"""
+Đo bộ nhớ khi đọc + chuẩn hoá sheet "ECO PARK" có mô tả dài: `pd.read_excel` cả sheet
+so với `ExcelBatchReader` (openpyxl read-only, theo lô). Mỗi phép đo chạy trong một process
+riêng để số liệu không ảnh hưởng lẫn nhau.
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.ecopark_import_memory --sizes 10000 50000 --description-chars 2000
+
+"peak_py" là đỉnh cấp phát Python (tracemalloc), "maxrss" là RSS tối đa của process.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.core.ecopark_import import ExcelBatchReader, prepare_rows
+from benchmarks.ecopark_import import make_workbook
+
+
+def read_whole(path: str, batch_rows: int) -> int:
+    df = pd.read_excel(path, sheet_name="ECO PARK")
+    rows, _ = prepare_rows(df)
+    return len(rows)
+
+
+def read_streaming(path: str, batch_rows: int) -> int:
+    count = 0
+    with ExcelBatchReader(path, batch_rows=batch_rows) as reader:
+        for df in reader:
+            rows, _ = prepare_rows(df)
+            count += len(rows)
+    return count
+
+
+def measure(name: str, path: str, batch_rows: int) -> tuple[int, float, float, float]:
+    func = {"read_excel": read_whole, "streaming": read_streaming}[name]
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func(path, batch_rows)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss: KB trên Linux
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return count, elapsed * 1000, peak / 1e6, maxrss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--description-chars", type=int, default=2000)
+    parser.add_argument("--batch-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ecopark.xlsx")
+            with open(path, "wb") as f:
+                f.write(make_workbook(size, description_chars=args.description_chars))
+            print(f"--- {size} hàng ({os.path.getsize(path) / 1e6:.1f} MB)")
+            for name in ("read_excel", "streaming"):
+                with context.Pool(1) as pool:
+                    count, ms, peak, maxrss = pool.apply(measure, (name, path, args.batch_rows))
+                print(f"{name:<12} {count:>8} hàng {ms:10.1f} ms   peak_py {peak:8.1f} MB   maxrss {maxrss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
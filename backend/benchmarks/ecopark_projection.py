@@ -0,0 +1,112 @@
+"""
+So sánh thời gian CPU mỗi request của route search ecopark: cách cũ (model_dump + EcoparkPublic
++ dịch/xoá khoá cho từng dòng) và cách mới (projection dựng sẵn trong CatalogSnapshot).
+
+Chạy từ thư mục backend:
+
+    python -m benchmarks.ecopark_projection --sizes 1000 10000 100000
+"""
+
+import argparse
+import random
+import time
+import uuid
+from typing import Any
+
+from app.core.ecopark_catalog import CatalogSnapshot
+from app.models import Ecopark, EcoparkPublic
+
+BASE_URL = "http://localhost:8000"
+
+
+def make_rows(count: int) -> list[Ecopark]:
+    rng = random.Random(count)
+    rows = []
+    for port in range(1, count + 1):
+        zone = rng.randint(1, 9)
+        rows.append(Ecopark(
+            id=uuid.uuid4(),
+            port=port,
+            building_name=f"B{port}",
+            picture_name=f"pic_{port}" if port % 3 else None,
+            building_type_vi="Biệt Thự Đơn Lập",
+            building_type_en="Detached Villa",
+            amenity_type_vi="Hồ bơi",
+            amenity_type_en="Pool",
+            zone_name_vi=f"Phân Khu {zone}",
+            zone_name_en=f"Zone {zone}",
+            zone=f"Z{zone}",
+            amenity="pool",
+            direction_vi="Đông",
+            direction_en="East",
+            bedroom=rng.randint(1, 5),
+            price=rng.randint(1, 100) * 1_000_000,
+            status_vi="Còn trống",
+            status_en="Available",
+            description_vi="Mô tả " * 20,
+            description_en="Description " * 20,
+        ))
+    return rows
+
+
+def legacy_request(rows: list[Ecopark], lang: str) -> list[dict[str, Any]]:
+    results = [item.model_dump() for item in rows]
+    items = []
+    for r in results:
+        translated_item = EcoparkPublic(**r).model_dump()
+        translated_item["zone_name"] = translated_item.get(f"zone_name_{lang}")
+        translated_item["building_type"] = translated_item.get(f"building_type_{lang}")
+        translated_item["amenity_type"] = translated_item.get(f"amenity_type_{lang}")
+        translated_item["direction"] = translated_item.get(f"direction_{lang}")
+        translated_item["status"] = translated_item.get(f"status_{lang}")
+        for key in list(translated_item.keys()):
+            if key.endswith("_vi") or key.endswith("_en"):
+                del translated_item[key]
+        picture_name = translated_item.get("picture_name")
+        translated_item["image_url"] = (
+            f"{BASE_URL}/api/v1/static/EcoRetreat/{picture_name}.png" if picture_name else None
+        )
+        items.append(translated_item)
+    return items
+
+
+def projected_request(snapshot: CatalogSnapshot, lang: str) -> list[dict[str, Any]]:
+    return [
+        {
+            **item,
+            "image_url": f"{BASE_URL}/api/v1/static/EcoRetreat/{item['picture_name']}.png"
+            if item["picture_name"] else None,
+        }
+        for item in snapshot.select_projected([], lang, "summary")
+    ]
+
+
+def cpu_ms(func: Any, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy ms':>12} {'projected ms':>14} {'speedup':>8} {'build ms':>10}")
+    for size in args.sizes:
+        rows = make_rows(size)
+        started = time.process_time()
+        snapshot = CatalogSnapshot([row.model_dump() for row in rows], generation=0)
+        snapshot.projected("en", "summary")
+        build_ms = (time.process_time() - started) * 1000
+
+        assert projected_request(snapshot, "en") == legacy_request(rows, "en")
+        legacy = cpu_ms(lambda: legacy_request(rows, "en"), args.repeat)
+        projected = cpu_ms(lambda: projected_request(snapshot, "en"), args.repeat)
+        print(f"{size:>8} {legacy:>12.2f} {projected:>14.2f} {legacy / projected:>7.1f}x {build_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Đếm số truy vấn DB mỗi request cho phần xác thực + phân quyền theo dự án
+(`get_current_user` + `get_current_user_role_in_project`): cách cũ (User + UserProjectRole JOIN Role
+mỗi request) so với cách mới (principal_cache + project_rank_cache).
+
+Dùng SQLite trong bộ nhớ, nhiều luồng gọi đồng thời như threadpool của FastAPI.
+Chạy từ thư mục backend:
+
+    python -m benchmarks.rbac_queries --users 200 --projects 20 --requests 20000 --threads 16
+"""
+
+import argparse
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.api import deps
+from app.core import security
+from app.core.principal_cache import principal_cache
+from app.core.rbac import project_rank_cache
+from app.models import ProjectList, Role, User, UserProjectRole, now_vn
+
+
+def setup(engine, users: int, projects: int) -> list[tuple[str, uuid.UUID]]:
+    """Tạo dữ liệu bằng Core insert (không qua ORM nên không phát thông báo làm mới)."""
+    tables = [User.__table__, Role.__table__, ProjectList.__table__, UserProjectRole.__table__]
+    SQLModel.metadata.create_all(engine, tables=tables)
+    rng = random.Random(0)
+    roles = [{"id": uuid.uuid4(), "name": f"rank{rank}", "rank": rank} for rank in range(2, 6)]
+    project_ids = [uuid.uuid4() for _ in range(projects)]
+    user_rows = [
+        {"id": uuid.uuid4(), "email": f"user{i}@example.com", "hashed_password": "x",
+         "is_active": True, "is_superuser": False, "creation_time": now_vn(), "system_rank": 3}
+        for i in range(users)
+    ]
+    assignments = []
+    targets = []
+    for user in user_rows:
+        for project_id in rng.sample(project_ids, k=min(3, projects)):
+            assignments.append({"id": uuid.uuid4(), "user_id": user["id"], "project_id": project_id,
+                                "role_id": rng.choice(roles)["id"]})
+            token = security.create_access_token(user["id"], expires_delta=timedelta(hours=1))
+            targets.append((token, project_id))
+    with engine.begin() as conn:
+        conn.execute(insert(Role), roles)
+        conn.execute(insert(ProjectList), [{"id": project_id} for project_id in project_ids])
+        conn.execute(insert(User), user_rows)
+        conn.execute(insert(UserProjectRole), assignments)
+    return targets
+
+
+def legacy_request(session: Session, token: str, project_id: uuid.UUID) -> int:
+    token_data = deps.decode_token(token)
+    user = session.get(User, uuid.UUID(token_data.sub))
+    result = session.exec(
+        select(UserProjectRole.role_id, Role.rank)
+        .join(Role, Role.id == UserProjectRole.role_id)
+        .where(UserProjectRole.user_id == user.id, UserProjectRole.project_id == project_id)
+    ).first()
+    return result.rank
+
+
+def cached_request(session: Session, token: str, project_id: uuid.UUID) -> int:
+    principal = deps.get_current_principal(session, token)
+    return deps.get_current_user_role_in_project(project_id, session, principal)[2]
+
+
+def run(engine, func, targets, requests: int, threads: int) -> tuple[float, float]:
+    counter = {"queries": 0}
+    lock = threading.Lock()
+
+    def count(*_):
+        with lock:
+            counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    rng = random.Random(1)
+    picks = [rng.choice(targets) for _ in range(requests)]
+
+    def handle(target):
+        with Session(engine) as session:
+            func(session, *target)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(handle, picks))
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", count)
+    return counter["queries"] / requests, requests / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    targets = setup(engine, args.users, args.projects)
+
+    for name, func in (("cũ (mỗi request đọc DB)", legacy_request), ("mới (cache)", cached_request)):
+        per_request, throughput = run(engine, func, targets, args.requests, args.threads)
+        print(f"{name:<26} {per_request:6.3f} truy vấn/request {throughput:10.0f} request/s")
+    print(f"principal_cache: {principal_cache.stats()}")
+    print(f"rbac:            {project_rank_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()